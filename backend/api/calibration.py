@@ -4,13 +4,17 @@ Sensor calibration API endpoints
 from fastapi import APIRouter, Header, HTTPException
 from typing import Optional
 from sqlalchemy import select
-from database.database import AsyncSessionLocal
+from database.database import ReadSessionLocal
 from database.models import SystemSettings
+from hardware.calibration import DEFAULT_CALIBRATION
+from services.db_writer import db_writer, upsert_setting
 import logging
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+CALIBRATION_DESCRIPTION = "Sensor calibration parameters"
+
 
 def verify_password(password: Optional[str]):
     """Simple password verification"""
@@ -24,7 +28,7 @@ async def get_calibration(password: Optional[str] = Header(None)):
     """Get sensor calibration settings"""
     verify_password(password)
 
-    async with AsyncSessionLocal() as session:
+    async with ReadSessionLocal() as session:
         try:
             result = await session.execute(
                 select(SystemSettings).where(SystemSettings.key == "sensor_calibration")
@@ -35,14 +39,7 @@ async def get_calibration(password: Optional[str] = Header(None)):
                 return setting.value
 
             # Return defaults if not set
-            return {
-                "fuel_tank": {"min": 0, "max": 4095, "offset": 0, "scale": 1},
-                "water_tank": {"min": 0, "max": 4095, "offset": 0, "scale": 1},
-                "waste_tank": {"min": 0, "max": 4095, "offset": 0, "scale": 1},
-                "oil_pressure": {"offset": 0, "scale": 1},
-                "coolant_temp": {"offset": 0, "scale": 1},
-                "engine_rpm": {"pulses_per_rev": 1.0}  # Digital frequency input
-            }
+            return DEFAULT_CALIBRATION
 
         except Exception as e:
             logger.error(f"Error getting calibration: {e}", exc_info=True)
@@ -57,30 +54,20 @@ async def update_calibration(
     """Update sensor calibration settings"""
     verify_password(password)
 
-    async with AsyncSessionLocal() as session:
-        try:
-            # Get existing setting or create new
-            result = await session.execute(
-                select(SystemSettings).where(SystemSettings.key == "sensor_calibration")
-            )
-            setting = result.scalar_one_or_none()
-
-            if setting:
-                setting.value = calibration
-            else:
-                setting = SystemSettings(
-                    key="sensor_calibration",
-                    value=calibration,
-                    description="Sensor calibration parameters"
-                )
-                session.add(setting)
+    try:
+        await db_writer.write(upsert_setting("sensor_calibration", calibration, CALIBRATION_DESCRIPTION))
+        logger.info(f"Calibration updated: {calibration}")
 
-            await session.commit()
-            logger.info(f"Calibration updated: {calibration}")
+        # Hot-swap the compiled converters used by the poll loop, with the same
+        # precedence as a restart (per-sensor rows over this setting)
+        from main import sensor_manager, acquisition
+        if sensor_manager:
+            applied = await sensor_manager.calibration.load()
+            if acquisition:
+                acquisition.send("calibration", applied)
 
-            return {"status": "success", "calibration": calibration}
+        return {"status": "success", "calibration": calibration}
 
-        except Exception as e:
-            logger.error(f"Error updating calibration: {e}", exc_info=True)
-            await session.rollback()
-            raise HTTPException(status_code=500, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error updating calibration: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,65 @@
+"""
+Diagnostics API endpoints - event loop lag, stalls and the sampling profiler
+"""
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+import logging
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+
+def _get_monitor():
+    from main import loop_monitor
+
+    if not loop_monitor:
+        raise HTTPException(status_code=503, detail="Loop monitor not enabled")
+    return loop_monitor
+
+
+@router.get("/loop")
+async def get_loop_status():
+    """Event loop lag statistics and recent stalls (with the blocking stack)"""
+    return _get_monitor().status()
+
+
+@router.delete("/loop/incidents")
+async def clear_loop_incidents():
+    """Clear the recorded stalls"""
+    _get_monitor().clear_incidents()
+    return {"status": "ok"}
+
+
+@router.post("/profiler/start")
+async def start_profiler(
+    interval: float = Query(0.005, ge=0.001, le=1.0),
+    duration: float = Query(30.0, gt=0, le=300.0)
+):
+    """Start sampling the event loop thread's stack"""
+    monitor = _get_monitor()
+    try:
+        monitor.start_profiler(interval, duration)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    logger.info(f"Loop profiler started ({interval}s interval, {duration}s)")
+    return {"status": "ok", "interval": interval, "duration": duration}
+
+
+@router.post("/profiler/stop")
+async def stop_profiler():
+    """Stop the profiler (results stay available)"""
+    monitor = _get_monitor()
+    monitor.profiler.stop()
+    return monitor.profiler.report()
+
+
+@router.get("/profiler")
+async def get_profile(
+    limit: int = Query(50, ge=1, le=1000),
+    format: str = Query("json", pattern="^(json|collapsed)$")
+):
+    """Profiler results: top stacks as JSON, or all stacks in flamegraph collapsed format"""
+    profiler = _get_monitor().profiler
+    if format == "collapsed":
+        return PlainTextResponse(profiler.collapsed())
+    return profiler.report(limit)
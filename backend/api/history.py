@@ -1,61 +1,253 @@
 """
 Historical data API endpoints
 """
-from fastapi import APIRouter, Query, HTTPException
-from typing import Optional
-from datetime import datetime, timedelta
-from sqlalchemy import select, func, and_
-from database.database import AsyncSessionLocal
-from database.models import SensorReading, VictronReading
+from fastapi import APIRouter, Query, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator, Iterator, List, Optional, Tuple
+from datetime import datetime
+from itertools import islice
+from database.archive import from_micros, open_segment, to_micros
+from database.database import run_read
+from database.partitions import TIMESTAMP_FORMAT, attached, history_groups
+from services.history_cache import history_cache
+from services.response_cache import cached_response
+from api.jobs import submit_job
+import json
 import logging
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+STREAM_CHUNK = 5000  # Readings per chunk of a streamed response
+
+# (stored timestamp, id) of the last reading of a page; id None = past every reading at that time
+Cursor = Tuple[str, Optional[int]]
+
+
+def _parse_date(value: Optional[str]) -> Optional[datetime]:
+    # Stored timestamps are naive UTC
+    return datetime.fromisoformat(value.replace('Z', '+00:00')).replace(tzinfo=None) if value else None
+
+
+def _parse_cursor(value: Optional[str]) -> Optional[Cursor]:
+    """A page cursor: "<timestamp>,<id>", or "<timestamp>" for every reading at that time"""
+    if not value:
+        return None
+    try:
+        timestamp, _, row_id = value.partition(",")
+        return datetime.fromisoformat(timestamp).strftime(TIMESTAMP_FORMAT), int(row_id) if row_id else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {value}")
+
+
+def _format_cursor(timestamp: datetime, row_id: Optional[int]) -> str:
+    return timestamp.isoformat() if row_id is None else f"{timestamp.isoformat()},{row_id}"
+
+
+def _past(row: tuple, cursor: Optional[Cursor], newest_first: bool) -> bool:
+    """Whether a (timestamp, id, ...) row comes after the cursor in keyset order"""
+    if cursor is None:
+        return True
+    timestamp, row_id = cursor
+    if row[0] != timestamp:
+        return row[0] < timestamp if newest_first else row[0] > timestamp
+    return row_id is not None and (row[1] < row_id if newest_first else row[1] > row_id)
+
+
+def _archived_readings(
+    group,
+    sensor_id: str,
+    start: Optional[datetime],
+    end: Optional[datetime],
+    cursor: Optional[Cursor],
+    newest_first: bool
+) -> Iterator[tuple]:
+    """The group's sealed readings of a sensor in keyset order, decoded as they are consumed (id 0)"""
+    low = to_micros(start) if start else None
+    high = to_micros(end) + 1 if end else None
+    if cursor:
+        at = to_micros(datetime.fromisoformat(cursor[0]))
+        if newest_first:
+            high = min(high, at + 1) if high is not None else at + 1
+        else:
+            low = max(low, at) if low is not None else at
+    for _, path in group.segments[::-1] if newest_first else group.segments:
+        for timestamp, _, _, value, unit in open_segment(path).ordered([sensor_id], None, low, high, newest_first):
+            row = (from_micros(timestamp).strftime(TIMESTAMP_FORMAT), 0, value, unit)
+            if _past(row, cursor, newest_first):
+                yield row
+
+
+def _readings_page(
+    db,
+    sensor_id: str,
+    start: Optional[datetime],
+    end: Optional[datetime],
+    cursor: Optional[Cursor],
+    limit: int,
+    newest_first: bool = True
+) -> List[tuple]:
+    """
+    Up to `limit` (timestamp, id, value, unit) readings of a sensor in
+    [start, end] after `cursor`, ordered by (timestamp, id): newest first,
+    or oldest first for streaming
+    """
+    condition = "sensor_type = ?"
+    params: list = [sensor_id]
+    if start:
+        condition += " AND timestamp >= ?"
+        params.append(start.strftime(TIMESTAMP_FORMAT))
+    if end:
+        condition += " AND timestamp <= ?"
+        params.append(end.strftime(TIMESTAMP_FORMAT))
+
+    # Only the partitions on the far side of the cursor need reading
+    plan_start, plan_end = start, end
+    if cursor:
+        timestamp, row_id = cursor
+        compare = "<" if newest_first else ">"
+        if row_id is None:
+            condition += f" AND timestamp {compare} ?"
+            params.append(timestamp)
+        else:
+            condition += f" AND (timestamp {compare} ? OR (timestamp = ? AND id {compare} ?))"
+            params.extend([timestamp, timestamp, row_id])
+        at = datetime.fromisoformat(timestamp)
+        if newest_first:
+            plan_end = min(end, at) if end else at
+        else:
+            plan_start = max(start, at) if start else at
+
+    order = "DESC" if newest_first else "ASC"
+    rows: List[tuple] = []
+    for group in history_groups(db, plan_start, plan_end, newest_first):
+        remaining = limit - len(rows)
+        if remaining <= 0:
+            break
+        # Ordered and limited per database, so each arm can walk its timestamp index
+        arms = group.arms("sensor_readings")
+        query = " UNION ALL ".join(
+            f"SELECT * FROM (SELECT timestamp, id, value, unit FROM {arm} WHERE {condition} "
+            f"ORDER BY timestamp {order}, id {order} LIMIT ?)"
+            for arm in arms
+        )
+        with attached(db, group):
+            db_cursor = db.cursor()
+            try:
+                db_cursor.execute(
+                    f"SELECT * FROM ({query}) ORDER BY timestamp {order}, id {order} LIMIT ?",
+                    [*params, remaining] * len(arms) + [remaining]
+                )
+                group_rows = db_cursor.fetchall()
+            finally:
+                db_cursor.close()
+        if group.segments:
+            # Sealed months are read from their archive segments
+            archived = list(islice(_archived_readings(group, sensor_id, start, end, cursor, newest_first), remaining))
+            group_rows = sorted(group_rows + archived, key=lambda row: row[:2], reverse=newest_first)[:remaining]
+        rows.extend(group_rows)
+    return rows
+
 
 @router.get("/sensors/{sensor_id}")
 async def get_sensor_history(
+    request: Request,
     sensor_id: str,
     start_date: Optional[str] = Query(None),
     end_date: Optional[str] = Query(None),
-    limit: Optional[int] = Query(1000, le=10000)
+    limit: Optional[int] = Query(1000, le=10000),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page")
 ):
-    """Get historical sensor data"""
-    async with AsyncSessionLocal() as session:
-        try:
-            query = select(SensorReading).where(
-                SensorReading.sensor_type == sensor_id
-            ).order_by(SensorReading.timestamp.desc()).limit(limit)
+    """Get historical sensor data: the newest `limit` readings, then older pages through next_cursor"""
+    try:
+        start, end = _parse_date(start_date), _parse_date(end_date)
+        position = _parse_cursor(cursor)
 
-            if start_date:
-                start = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
-                query = query.where(SensorReading.timestamp >= start)
-
-            if end_date:
-                end = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
-                query = query.where(SensorReading.timestamp <= end)
-
-            result = await session.execute(query)
-            readings = result.scalars().all()
+        async def sensor_history():
+            # The first page of recent readings comes from memory, anything older from the database
+            cached = history_cache.latest(sensor_id, start, end, limit) if history_cache and not position else None
+            if cached is not None:
+                readings = [(timestamp, None, value, unit) for timestamp, value, unit in cached]
+            else:
+                rows = await run_read(_readings_page, sensor_id, start, end, position, limit)
+                readings = [(datetime.fromisoformat(timestamp), row_id, value, unit) for timestamp, row_id, value, unit in rows]
 
             data = [
                 {
-                    "timestamp": r.timestamp.isoformat(),
-                    "value": r.value,
-                    "unit": r.unit
+                    "timestamp": timestamp.isoformat(),
+                    "value": value,
+                    "unit": unit
                 }
-                for r in reversed(readings)  # Return in chronological order
+                for timestamp, _, value, unit in reversed(readings)  # Return in chronological order
             ]
 
             return {
                 "sensor_id": sensor_id,
                 "total": len(data),
-                "data": data
+                "data": data,
+                # A full page may have older readings behind it
+                "next_cursor": _format_cursor(*readings[-1][:2]) if readings and len(readings) == limit else None
             }
 
-        except Exception as e:
-            logger.error(f"Error fetching sensor history: {e}", exc_info=True)
-            raise HTTPException(status_code=500, detail=str(e))
+        return await cached_response(
+            request, ("sensor_history", sensor_id, start, end, limit, position), end, sensor_history
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching sensor history: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/sensors/{sensor_id}/stream")
+async def stream_sensor_history(
+    sensor_id: str,
+    start_date: Optional[str] = Query(None),
+    end_date: Optional[str] = Query(None)
+):
+    """All readings of a sensor in the range as NDJSON, oldest first, in constant memory"""
+    try:
+        start, end = _parse_date(start_date), _parse_date(end_date)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def lines() -> AsyncIterator[bytes]:
+        # Keyset chunks rather than one open cursor: a slow client doesn't pin a
+        # read snapshot (which would hold back WAL checkpoints) between chunks
+        position = None
+        while True:
+            rows = await run_read(_readings_page, sensor_id, start, end, position, STREAM_CHUNK, False)
+            if rows:
+                yield "".join(
+                    json.dumps({
+                        "timestamp": datetime.fromisoformat(timestamp).isoformat(),
+                        "value": value,
+                        "unit": unit
+                    }) + "\n"
+                    for timestamp, _, value, unit in rows
+                ).encode()
+            if len(rows) < STREAM_CHUNK:
+                return
+            position = rows[-1][:2]
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@router.post("/export", status_code=202)
+async def export_history(
+    start_date: Optional[str] = Query(None),
+    end_date: Optional[str] = Query(None),
+    sensors: Optional[str] = Query(None, description="Comma-separated sensor ids (default all)"),
+    victron: bool = Query(True)
+):
+    """Export history as NDJSON in a background job; download from /api/jobs/{id}/download"""
+    return await submit_job("history_export", {
+        "start_date": start_date,
+        "end_date": end_date,
+        "sensors": sorted(s.strip() for s in sensors.split(",") if s.strip()) if sensors else None,
+        "victron": victron,
+    })
 
 
 @router.get("/victron/{device_id}")
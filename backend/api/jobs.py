@@ -0,0 +1,108 @@
+"""
+Background jobs API endpoints
+
+Submit long-running work (exports, backups, reports), poll its progress,
+cancel it and download its result file.
+"""
+import os
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import FileResponse
+from pydantic import BaseModel
+
+from services.jobs import job_types, requires_password
+import logging
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+
+class JobRequest(BaseModel):
+    """Job submission"""
+    type: str
+    params: Dict[str, Any] = {}
+    priority: Optional[int] = None
+    reuse: bool = True  # Return an identical queued, running or recent job instead
+
+
+def _queue():
+    from main import jobs
+
+    if not jobs:
+        raise HTTPException(status_code=503, detail="Job queue not available")
+    return jobs
+
+
+def _verify_password(password: Optional[str]):
+    # api.settings imports this module (submit_job)
+    from api.settings import verify_password
+
+    verify_password(password)
+
+
+async def submit_job(job_type: str, params: Dict[str, Any], priority: Optional[int] = None, reuse: bool = True):
+    """Queue a job, mapping invalid parameters to 400"""
+    try:
+        return await _queue().submit(job_type, params, priority=priority, reuse=reuse)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("")
+async def list_jobs(
+    status: Optional[str] = Query(None, pattern="^(queued|running|succeeded|failed|cancelled)$"),
+    limit: int = Query(50, ge=1, le=500)
+):
+    """Most recent jobs first"""
+    return {"jobs": await _queue().list(status, limit)}
+
+
+@router.get("/types")
+async def get_job_types():
+    """Job types that can be submitted and their parameters"""
+    return {"types": job_types()}
+
+
+@router.post("", status_code=202)
+async def create_job(request: JobRequest, password: Optional[str] = Header(None)):
+    """Submit a job (protected types, like backups, need the settings password)"""
+    if requires_password(request.type):
+        _verify_password(password)
+    return await submit_job(request.type, request.params, request.priority, request.reuse)
+
+
+@router.get("/{job_id}")
+async def get_job(job_id: int):
+    """Job status, progress and result"""
+    job = await _queue().get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+
+@router.delete("/{job_id}")
+async def cancel_job(job_id: int):
+    """Cancel a queued or running job"""
+    job = await _queue().cancel(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+
+@router.get("/{job_id}/download")
+async def download_job_result(job_id: int, password: Optional[str] = Header(None)):
+    """Download the file a finished job produced (export, backup; backups need the settings password)"""
+    job = await _queue().get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    if requires_password(job["type"], download=True):
+        _verify_password(password)
+    path = (job["result"] or {}).get("file")
+    if job["status"] != "succeeded" or not path:
+        raise HTTPException(status_code=409, detail=f"Job {job_id} has no result file ({job['status']})")
+    if not os.path.exists(path):
+        raise HTTPException(status_code=410, detail=f"Result file of job {job_id} has been removed")
+
+    media_type = "application/x-ndjson" if path.endswith(".ndjson") else "application/octet-stream"
+    return FileResponse(path, media_type=media_type, filename=os.path.basename(path))
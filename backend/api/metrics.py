@@ -0,0 +1,18 @@
+"""
+Metrics API endpoint (Prometheus text or JSON)
+"""
+from fastapi import APIRouter, Query
+from fastapi.responses import PlainTextResponse
+from services.metrics import metrics
+
+router = APIRouter()
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4"
+
+
+@router.get("")
+async def get_metrics(format: str = Query("prometheus", pattern="^(prometheus|json)$")):
+    """Hot-path metrics: loop durations, board reads, DB, WebSockets and HTTP routes"""
+    if format == "json":
+        return metrics.to_dict()
+    return PlainTextResponse(metrics.render_prometheus(), media_type=PROMETHEUS_CONTENT_TYPE)
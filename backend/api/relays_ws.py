@@ -4,12 +4,17 @@ Relay WebSocket endpoint for real-time state updates
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 import asyncio
 import logging
+import time
+
+from services.metrics import WEBSOCKET_CLIENTS, WEBSOCKET_SEND_SECONDS
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
 # WebSocket connections
 active_connections: list[WebSocket] = []
+WEBSOCKET_CLIENTS.labels("relays").set_function(lambda: len(active_connections))
+_send_seconds = WEBSOCKET_SEND_SECONDS.labels("relays")
 
 
 @router.websocket("/ws")
@@ -30,7 +35,9 @@ async def relay_websocket(websocket: WebSocket):
                     "timestamp": asyncio.get_event_loop().time(),
                     "data": relays
                 }
+                started = time.perf_counter()
                 await websocket.send_json(data)
+                _send_seconds.since(started)
 
             await asyncio.sleep(0.2)  # Send updates every 200ms for responsive UI
 
@@ -1,34 +1,81 @@
 """
 Sensors API endpoints
 """
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from typing import Dict, Any
+from fastapi import APIRouter, Query, WebSocket, WebSocketDisconnect
+from typing import Dict, Any, Optional
 import asyncio
 import json
 import logging
+import time
+
+from services.metrics import WEBSOCKET_CLIENTS, WEBSOCKET_SEND_SECONDS
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
 # WebSocket connections
 active_connections: list[WebSocket] = []
+WEBSOCKET_CLIENTS.labels("sensors").set_function(lambda: len(active_connections))
+_send_seconds = WEBSOCKET_SEND_SECONDS.labels("sensors")
+
+
+def _split_records(records: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """Split reading records into a plain value map and a quality map"""
+    return {
+        "values": {sensor_id: r["value"] for sensor_id, r in records.items()},
+        "quality": {
+            sensor_id: {
+                "age": r["age"],
+                "sample_time": r["sample_time"],
+                "quality": r["quality"],
+                "board_id": r["board_id"]
+            }
+            for sensor_id, r in records.items()
+        },
+    }
 
 
 @router.get("")
-async def get_sensors():
-    """Get all current sensor readings"""
+async def get_sensors(since: Optional[int] = Query(None, ge=0)):
+    """Get all current sensor readings, or only those changed after version `since`"""
     from main import sensor_manager
 
     if not sensor_manager:
         return {"error": "Sensor manager not initialized"}
 
-    readings = sensor_manager.get_all_readings()
+    if since is not None:
+        version, changed = sensor_manager.get_changed_readings(since)
+        return {
+            "timestamp": asyncio.get_event_loop().time(),
+            "version": version,
+            "sensors": changed
+        }
+
+    records = _split_records(sensor_manager.get_all_records())
     return {
         "timestamp": asyncio.get_event_loop().time(),
-        "sensors": readings
+        "version": sensor_manager.store.version,
+        "sensors": records["values"],
+        "quality": records["quality"]
     }
 
 
+@router.get("/registry")
+async def get_sensor_registry():
+    """Get every configured sensor (name, board, channel, unit, logging policy)"""
+    from hardware.sensor_registry import sensor_registry
+
+    return {"sensors": [d.to_dict() for d in sensor_registry.sensors.values()]}
+
+
+@router.get("/registry/firmware/{board_id}")
+async def get_firmware_channels(board_id: str):
+    """Get the SENSOR_CHANNELS mapping for a wireless board's firmware"""
+    from hardware.sensor_registry import sensor_registry
+
+    return {"board_id": board_id, "sensor_channels": sensor_registry.firmware_channels(board_id)}
+
+
 @router.get("/{sensor_id}")
 async def get_sensor(sensor_id: str):
     """Get specific sensor reading"""
@@ -37,13 +84,13 @@ async def get_sensor(sensor_id: str):
     if not sensor_manager:
         return {"error": "Sensor manager not initialized"}
 
-    reading = sensor_manager.get_reading(sensor_id)
-    if reading is None:
+    record = sensor_manager.get_record(sensor_id)
+    if record is None:
         return {"error": f"Sensor {sensor_id} not found"}
 
     return {
         "sensor_id": sensor_id,
-        "value": reading,
+        **record,
         "timestamp": asyncio.get_event_loop().time()
     }
 
@@ -60,13 +107,16 @@ async def sensor_websocket(websocket: WebSocket):
             from main import sensor_manager
 
             if sensor_manager:
-                readings = sensor_manager.get_all_readings()
+                records = _split_records(sensor_manager.get_all_records())
                 data = {
                     "type": "sensor_update",
                     "timestamp": asyncio.get_event_loop().time(),
-                    "data": readings
+                    "data": records["values"],
+                    "quality": records["quality"]
                 }
+                started = time.perf_counter()
                 await websocket.send_json(data)
+                _send_seconds.since(started)
 
             await asyncio.sleep(2.0)  # Send updates every 2 seconds
 
@@ -5,6 +5,7 @@ from fastapi import APIRouter, HTTPException, Header, Depends
 from pydantic import BaseModel
 from typing import Dict, Any, Optional
 from config import settings as app_settings
+from api.jobs import submit_job
 import logging
 
 logger = logging.getLogger(__name__)
@@ -96,3 +97,10 @@ async def update_system_settings(
     logger.info(f"Updating system settings: {settings}")
     # TODO: Implement settings update
     return {"success": True, "settings": settings}
+
+
+@router.post("/backup", status_code=202)
+async def backup_database(authorized: bool = Depends(verify_password)):
+    """Back up the database in a background job; download from /api/jobs/{id}/download"""
+    logger.info("Database backup requested")
+    return await submit_job("database_backup", {}, reuse=False)
@@ -5,9 +5,11 @@ from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
 from typing import Dict, Any, Optional
 from sqlalchemy import select
-from database.database import AsyncSessionLocal
+from database.database import ReadSessionLocal
 from database.models import SystemSettings
 from api.settings import verify_password
+from services.db_writer import db_writer, upsert_setting
+from services.response_cache import response_cache
 import logging
 import json
 
@@ -23,6 +25,8 @@ class ThresholdConfig(BaseModel):
     coolant_temp_max: Optional[float] = 95.0
 
 
+THRESHOLDS_DESCRIPTION = "Sensor alarm thresholds"
+
 DEFAULT_THRESHOLDS = {
     "engine_rpm_max": 3000.0,
     "oil_pressure_min": 20.0,
@@ -34,7 +38,7 @@ DEFAULT_THRESHOLDS = {
 @router.get("")
 async def get_thresholds():
     """Get current threshold settings (public - no auth required for reading)"""
-    async with AsyncSessionLocal() as session:
+    async with ReadSessionLocal() as session:
         try:
             result = await session.execute(
                 select(SystemSettings).where(SystemSettings.key == "sensor_thresholds")
@@ -57,63 +61,29 @@ async def update_thresholds(
     authorized: bool = Depends(verify_password)
 ):
     """Update threshold settings (requires password)"""
-    async with AsyncSessionLocal() as session:
-        try:
-            # Get or create settings entry
-            result = await session.execute(
-                select(SystemSettings).where(SystemSettings.key == "sensor_thresholds")
-            )
-            setting = result.scalar_one_or_none()
+    threshold_data = config.dict(exclude_none=True)
+    try:
+        await db_writer.write(upsert_setting("sensor_thresholds", threshold_data, THRESHOLDS_DESCRIPTION))
+        if response_cache:
+            response_cache.clear()  # Engine statistics count violations against them
+        logger.info(f"Thresholds updated: {threshold_data}")
+        return {"success": True, "thresholds": threshold_data}
 
-            threshold_data = config.dict(exclude_none=True)
-
-            if setting:
-                # Update existing
-                setting.value = threshold_data
-            else:
-                # Create new
-                setting = SystemSettings(
-                    key="sensor_thresholds",
-                    value=threshold_data
-                )
-                session.add(setting)
-
-            await session.commit()
-
-            logger.info(f"Thresholds updated: {threshold_data}")
-            return {"success": True, "thresholds": threshold_data}
-
-        except Exception as e:
-            await session.rollback()
-            logger.error(f"Error updating thresholds: {e}", exc_info=True)
-            raise HTTPException(status_code=500, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error updating thresholds: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post("/reset")
 async def reset_thresholds(authorized: bool = Depends(verify_password)):
     """Reset thresholds to default values"""
-    async with AsyncSessionLocal() as session:
-        try:
-            result = await session.execute(
-                select(SystemSettings).where(SystemSettings.key == "sensor_thresholds")
-            )
-            setting = result.scalar_one_or_none()
-
-            if setting:
-                setting.value = DEFAULT_THRESHOLDS
-            else:
-                setting = SystemSettings(
-                    key="sensor_thresholds",
-                    value=DEFAULT_THRESHOLDS
-                )
-                session.add(setting)
-
-            await session.commit()
-
-            logger.info("Thresholds reset to defaults")
-            return {"success": True, "thresholds": DEFAULT_THRESHOLDS}
-
-        except Exception as e:
-            await session.rollback()
-            logger.error(f"Error resetting thresholds: {e}", exc_info=True)
-            raise HTTPException(status_code=500, detail=str(e))
+    try:
+        await db_writer.write(upsert_setting("sensor_thresholds", DEFAULT_THRESHOLDS, THRESHOLDS_DESCRIPTION))
+        if response_cache:
+            response_cache.clear()
+        logger.info("Thresholds reset to defaults")
+        return {"success": True, "thresholds": DEFAULT_THRESHOLDS}
+
+    except Exception as e:
+        logger.error(f"Error resetting thresholds: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
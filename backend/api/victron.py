@@ -1,8 +1,8 @@
 """
 Victron API endpoints
 """
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from typing import Dict, Any, List
+from fastapi import APIRouter, Query, WebSocket, WebSocketDisconnect
+from typing import Dict, Any, List, Optional
 import asyncio
 import logging
 
@@ -14,16 +14,25 @@ active_connections: list[WebSocket] = []
 
 
 @router.get("")
-async def get_victron_devices():
-    """Get all Victron device data"""
+async def get_victron_devices(since: Optional[int] = Query(None, ge=0)):
+    """Get all Victron device data, or only the "device.field" values changed after version `since`"""
     from main import victron_manager
 
     if not victron_manager:
         return {"error": "Victron manager not initialized"}
 
+    if since is not None:
+        version, changed = victron_manager.get_changed_fields(since)
+        return {
+            "timestamp": asyncio.get_event_loop().time(),
+            "version": version,
+            "fields": changed
+        }
+
     data = victron_manager.get_all_data()
     return {
         "timestamp": asyncio.get_event_loop().time(),
+        "version": victron_manager.store.version,
         "devices": data
     }
 
@@ -0,0 +1,3 @@
+"""
+Benchmarks - load tests and dataset benchmarks, run from backend/ with python -m benchmarks.<name>
+"""
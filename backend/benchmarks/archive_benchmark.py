@@ -0,0 +1,159 @@
+"""
+Archive segment benchmark
+
+Compression and read speed of sealed history (database/archive.py) against
+the same sensor readings in a SQLite partition, for a synthetic dataset:
+
+    - bytes per sample: SQLite file (rows and indexes, vacuumed) vs segment
+    - encode and full decode throughput (samples per second)
+    - latency of a one-day, one-sensor read (the history chart query)
+
+Run from backend/:
+    python -m benchmarks.archive_benchmark --dataset month
+    python -m benchmarks.archive_benchmark --dataset year --queries 200
+"""
+import argparse
+import logging
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict
+
+from sqlalchemy import create_engine
+
+from database import archive
+from database.database import Base
+from database.models import SensorReading
+from database.partitions import TIMESTAMP_FORMAT
+
+from .common import percentiles, write_results
+from .datasets import DATASET_DAYS, ensure_datasets
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_QUERY = (
+    "SELECT timestamp, sensor_type, sensor_id, value, unit FROM sensor_readings "
+    "WHERE timestamp IS NOT NULL ORDER BY sensor_type, sensor_id, unit, timestamp"
+)
+
+
+def _sqlite_copy(source: str, path: str) -> int:
+    """The dataset's sensor readings alone in a partition-like SQLite file; returns its size"""
+    file_engine = create_engine(f"sqlite:///{path}")
+    try:
+        Base.metadata.create_all(file_engine, tables=[SensorReading.__table__])
+    finally:
+        file_engine.dispose()
+    db = sqlite3.connect(path)
+    try:
+        db.execute("ATTACH DATABASE ? AS source", [f"file:{source}?mode=ro"])
+        db.execute(
+            "INSERT INTO sensor_readings (timestamp, sensor_type, sensor_id, value, unit) "
+            "SELECT timestamp, sensor_type, sensor_id, value, unit FROM source.sensor_readings ORDER BY timestamp"
+        )
+        db.commit()
+        db.execute("DETACH DATABASE source")
+        db.execute("VACUUM")
+    finally:
+        db.close()
+    return os.path.getsize(path)
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    source = ensure_datasets([args.dataset], interval=args.interval, seed=args.seed)[args.dataset]
+    directory = tempfile.mkdtemp(prefix="boatmonitor-archive-")
+    try:
+        sqlite_path = os.path.join(directory, "partition.db")
+        segment_path = os.path.join(directory, "partition.seg")
+        logger.info("Copying sensor readings to a SQLite partition")
+        sqlite_bytes = _sqlite_copy(source, sqlite_path)
+
+        db = sqlite3.connect(f"file:{sqlite_path}?mode=ro", uri=True)
+        samples = [
+            (archive.to_micros(datetime.fromisoformat(timestamp)), sensor_type, sensor_id, value, unit)
+            for timestamp, sensor_type, sensor_id, value, unit in db.execute(SAMPLE_QUERY)
+        ]
+        sensors = sorted({sample[1] for sample in samples})
+        first, last = min(s[0] for s in samples), max(s[0] for s in samples)
+
+        logger.info(f"Encoding {len(samples)} samples")
+        started = time.perf_counter()
+        stats = archive.write_segment(segment_path, samples)
+        encode_s = time.perf_counter() - started
+
+        segment = archive.Segment(segment_path)
+        started = time.perf_counter()
+        decoded = sum(1 for _ in segment.samples())
+        decode_s = time.perf_counter() - started
+        assert decoded == len(samples)
+
+        # One sensor over one day, like the history chart
+        rng = random.Random(args.seed)
+        day = timedelta(days=1) // timedelta(microseconds=1)
+        sqlite_seconds, segment_seconds = [], []
+        for _ in range(args.queries):
+            sensor = rng.choice(sensors)
+            start = rng.randint(first, max(first, last - day))
+            bounds = [archive.from_micros(t).strftime(TIMESTAMP_FORMAT) for t in (start, start + day)]
+            started = time.perf_counter()
+            expected = db.execute(
+                "SELECT timestamp, value FROM sensor_readings "
+                "WHERE sensor_type = ? AND timestamp >= ? AND timestamp < ? ORDER BY timestamp",
+                [sensor, *bounds]
+            ).fetchall()
+            sqlite_seconds.append(time.perf_counter() - started)
+            started = time.perf_counter()
+            rows = [(timestamp, value) for timestamp, _, _, value, _ in segment.samples([sensor], None, start, start + day)]
+            segment_seconds.append(time.perf_counter() - started)
+            assert len(rows) == len(expected)
+        segment.close()
+        db.close()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    return {
+        "config": {key: getattr(args, key) for key in ("dataset", "interval", "seed", "queries")},
+        "results": {
+            "samples": len(samples),
+            "blocks": stats["blocks"],
+            "sqlite_bytes": sqlite_bytes,
+            "segment_bytes": stats["bytes"],
+            "sqlite_bytes_per_sample": round(sqlite_bytes / len(samples), 2),
+            "segment_bytes_per_sample": round(stats["bytes"] / len(samples), 2),
+            "compression_ratio": round(sqlite_bytes / stats["bytes"], 1),
+            "encode_samples_per_s": round(len(samples) / encode_s),
+            "decode_samples_per_s": round(decoded / decode_s),
+            "day_query": {"sqlite": percentiles(sqlite_seconds), "segment": percentiles(segment_seconds)},
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive segment compression and read speed vs SQLite")
+    parser.add_argument("--dataset", default="month", choices=sorted(DATASET_DAYS))
+    parser.add_argument("--interval", type=float, default=60.0, help="Seconds between logged samples in the dataset")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--queries", type=int, default=100, help="One-day reads to time")
+    parser.add_argument("--output", help="Results file (default benchmarks/results/archive_benchmark-<time>.json)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    results = run(args)
+    path = write_results("archive_benchmark", results, args.output)
+
+    result = results["results"]
+    print(f"{result['samples']} samples in {result['blocks']} blocks")
+    print(f"SQLite:  {result['sqlite_bytes_per_sample']:>7} bytes/sample")
+    print(f"Segment: {result['segment_bytes_per_sample']:>7} bytes/sample ({result['compression_ratio']}x smaller)")
+    print(f"Encode {result['encode_samples_per_s']:,} samples/s, decode {result['decode_samples_per_s']:,} samples/s")
+    for store, latency in result["day_query"].items():
+        print(f"One-day read from {store}: p50 {latency['p50_ms']} ms, p95 {latency['p95_ms']} ms")
+    print(f"Results saved to {path}")
+
+
+if __name__ == "__main__":
+    main()
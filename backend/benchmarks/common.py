@@ -0,0 +1,146 @@
+"""
+Shared helpers for the benchmarks
+"""
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+import aiohttp
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def percentiles(values: Sequence[float], points: Sequence[int] = (50, 95, 99)) -> Dict[str, Any]:
+    """Count, mean, max and nearest-rank percentiles, in milliseconds"""
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+    summary = {
+        "count": len(ordered),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+    for p in points:
+        index = min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered))) - 1))
+        summary[f"p{p}_ms"] = round(ordered[index] * 1000, 3)
+    return summary
+
+
+class ProcessSampler:
+    """CPU and RSS of a process, read from /proc (Linux only, like the Pi)"""
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.clock_ticks = os.sysconf("SC_CLK_TCK")
+        self.page_size = os.sysconf("SC_PAGE_SIZE")
+        self.cpu_percent: List[float] = []
+        self.rss_bytes: List[int] = []
+        self._last: Optional[tuple] = None
+
+    def _cpu_seconds(self) -> float:
+        with open(f"/proc/{self.pid}/stat") as f:
+            # Fields after the command name; utime and stime are fields 14 and 15
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / self.clock_ticks
+
+    def _rss(self) -> int:
+        with open(f"/proc/{self.pid}/statm") as f:
+            return int(f.read().split()[1]) * self.page_size
+
+    def sample(self):
+        """Take one sample (call at a steady interval)"""
+        try:
+            cpu = self._cpu_seconds()
+            self.rss_bytes.append(self._rss())
+        except (OSError, IndexError, ValueError):
+            return
+        now = time.monotonic()
+        if self._last:
+            last_cpu, last_time = self._last
+            self.cpu_percent.append(100.0 * (cpu - last_cpu) / (now - last_time))
+        self._last = (cpu, now)
+
+    def summary(self) -> Dict[str, Any]:
+        if not self.rss_bytes:
+            return {"available": False}
+        return {
+            "available": True,
+            "cpu_percent_mean": round(sum(self.cpu_percent) / len(self.cpu_percent), 1) if self.cpu_percent else None,
+            "cpu_percent_max": round(max(self.cpu_percent), 1) if self.cpu_percent else None,
+            "rss_mb_max": round(max(self.rss_bytes) / 1e6, 1),
+            "rss_mb_end": round(self.rss_bytes[-1] / 1e6, 1),
+        }
+
+
+def write_results(name: str, results: Dict[str, Any], path: Optional[str] = None) -> str:
+    """Save results as JSON, with the machine they ran on"""
+    results = {
+        "benchmark": name,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "machine": {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count()},
+        **results,
+    }
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{name}-{datetime.now():%Y%m%d-%H%M%S}.json")
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+    return path
+
+
+class BackendProcess:
+    """The backend running under uvicorn in a subprocess, with its own environment"""
+
+    def __init__(self, port: int, env: Dict[str, str]):
+        self.port = port
+        self.base_url = f"http://127.0.0.1:{port}"
+        self.env = {**os.environ, **env}
+        self.process: Optional[subprocess.Popen] = None
+
+    @property
+    def pid(self) -> int:
+        return self.process.pid
+
+    async def start(self, timeout: float = 30.0):
+        """Start uvicorn and wait until /api/health answers"""
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(self.port), "--log-level", "warning"],
+            cwd=BACKEND_DIR,
+            env=self.env
+        )
+        deadline = time.monotonic() + timeout
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5)) as session:
+            while time.monotonic() < deadline:
+                if self.process.poll() is not None:
+                    break
+                try:
+                    async with session.get(f"{self.base_url}/api/health") as response:
+                        if response.status == 200:
+                            return
+                except aiohttp.ClientError:
+                    pass
+                await asyncio.sleep(0.2)
+        self.stop()
+        raise RuntimeError("Backend did not start")
+
+    def stop(self):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+    async def __aenter__(self) -> "BackendProcess":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        self.stop()
@@ -0,0 +1,197 @@
+"""
+Synthetic history datasets
+
+Builds BoatMonitor databases with months or years of `sensor_readings` and
+`victron_readings`, using the seeded boat simulator so the data has real
+engine sessions, tank usage and solar days. Rows follow the data logger's
+policy (critical sensors always, optional sensors when non-zero) and end at
+generation time, so the "last N days" endpoints find data.
+
+At the default 60 s interval a month is ~100 MB and five years ~6 GB;
+use a longer --interval for quick runs.
+
+Run from backend/:
+    python -m benchmarks.datasets month year 5years --interval 60
+"""
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import create_engine
+
+from database.database import Base
+from database import models  # noqa: F401 - registers the tables on Base.metadata
+from hardware.sensor_registry import LOG_CRITICAL, LOG_OPTIONAL, sensor_registry
+from hardware.simulator import BoatSimulator
+
+logger = logging.getLogger(__name__)
+
+DATASETS_DIR = os.path.join(os.path.dirname(__file__), "datasets")
+DATASET_DAYS = {"month": 30, "year": 365, "5years": 5 * 365 + 1}
+BATCH_SIZE = 50000
+
+
+def _device_type(device_id: str) -> str:
+    """Same mapping as DataLogger._get_device_type"""
+    if "smartshunt" in device_id or "bmv" in device_id:
+        return "battery_monitor"
+    elif "mppt" in device_id or "solar" in device_id:
+        return "solar_charger"
+    elif "inverter" in device_id or "multiplus" in device_id:
+        return "inverter"
+    return "unknown"
+
+
+def dataset_path(name: str, interval: float, seed: int) -> str:
+    """Where a dataset is cached"""
+    return os.path.join(DATASETS_DIR, f"{name}-{interval:g}s-seed{seed}.db")
+
+
+def read_metadata(path: str) -> Optional[Dict]:
+    """Generation parameters stored next to a dataset"""
+    try:
+        with open(path + ".json") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def generate(
+    path: str,
+    days: float,
+    interval: float = 60.0,
+    victron_interval: Optional[float] = None,
+    seed: int = 1,
+    end: Optional[datetime] = None
+) -> Dict:
+    """Write `days` of history ending at `end` (UTC, default now) into a new database"""
+    victron_interval = victron_interval or interval
+    end = end or datetime.utcnow()
+    start = end - timedelta(days=days)
+
+    if os.path.exists(path):
+        os.remove(path)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    # Schema from the models, so indexes match the real database
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    engine.dispose()
+
+    db = sqlite3.connect(path)
+    db.execute("PRAGMA journal_mode=OFF")
+    db.execute("PRAGMA synchronous=OFF")
+
+    policy = {d.sensor_id: d.logging for d in sensor_registry.sensors.values()}
+    units = sensor_registry.units
+    ranges = {
+        d.sensor_id: (float(d.simulation.get("min", 0)), float(d.simulation.get("max", 100)))
+        for d in sensor_registry.sensors.values()
+    }
+    simulator = BoatSimulator(seed=seed, start_time=start.replace(tzinfo=timezone.utc).timestamp(), sensor_ranges=ranges)
+
+    sensor_rows = []
+    victron_rows = []
+    counts = {"sensor_readings": 0, "victron_readings": 0}
+    steps = int(days * 86400 / interval)
+    victron_every = max(1, int(round(victron_interval / interval)))
+    started = time.monotonic()
+
+    def flush():
+        db.executemany(
+            "INSERT INTO sensor_readings (timestamp, sensor_type, sensor_id, value, unit) VALUES (?, ?, ?, ?, ?)",
+            sensor_rows
+        )
+        db.executemany(
+            "INSERT INTO victron_readings (timestamp, device_type, device_id, data) VALUES (?, ?, ?, ?)",
+            victron_rows
+        )
+        counts["sensor_readings"] += len(sensor_rows)
+        counts["victron_readings"] += len(victron_rows)
+        sensor_rows.clear()
+        victron_rows.clear()
+
+    for i in range(steps):
+        simulator.step(interval)
+        # Same text format SQLAlchemy stores for DateTime columns
+        timestamp = (start + timedelta(seconds=(i + 1) * interval)).strftime("%Y-%m-%d %H:%M:%S.%f")
+
+        for sensor_id, _, value in simulator.read_sensors():
+            logging_policy = policy.get(sensor_id)
+            if logging_policy == LOG_CRITICAL or (logging_policy == LOG_OPTIONAL and value > 0):
+                sensor_rows.append((timestamp, sensor_id, sensor_id, value, units.get(sensor_id, "")))
+
+        if i % victron_every == 0:
+            for device_id, data in simulator.victron_data().items():
+                victron_rows.append((timestamp, _device_type(device_id), device_id, json.dumps(data)))
+
+        if len(sensor_rows) >= BATCH_SIZE:
+            flush()
+            db.commit()
+
+    flush()
+    db.commit()
+    db.close()
+
+    metadata = {
+        "days": days,
+        "interval": interval,
+        "victron_interval": victron_interval,
+        "seed": seed,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "rows": counts,
+        "size_mb": round(os.path.getsize(path) / 1e6, 1),
+        "generation_s": round(time.monotonic() - started, 1),
+    }
+    with open(path + ".json", "w") as f:
+        json.dump(metadata, f, indent=2)
+    return metadata
+
+
+def ensure_datasets(
+    names: Iterable[str],
+    interval: float = 60.0,
+    seed: int = 1,
+    max_age_days: float = 1.0
+) -> Dict[str, str]:
+    """Paths of the named datasets, (re)generating missing or outdated ones"""
+    paths = {}
+    for name in names:
+        path = dataset_path(name, interval, seed)
+        metadata = read_metadata(path)
+        outdated = (
+            metadata is None
+            or not os.path.exists(path)
+            or datetime.utcnow() - datetime.fromisoformat(metadata["end"]) > timedelta(days=max_age_days)
+        )
+        if outdated:
+            logger.info(f"Generating {name} dataset ({DATASET_DAYS[name]} days at {interval:g}s)...")
+            metadata = generate(path, DATASET_DAYS[name], interval=interval, seed=seed)
+            logger.info(f"Generated {path}: {metadata['rows']} in {metadata['generation_s']}s")
+        paths[name] = path
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic BoatMonitor history databases")
+    parser.add_argument("names", nargs="+", choices=sorted(DATASET_DAYS), help="Dataset sizes")
+    parser.add_argument("--interval", type=float, default=60.0, help="Seconds between logged samples")
+    parser.add_argument("--victron-interval", type=float, help="Seconds between Victron rows (default: --interval)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    for name in args.names:
+        path = dataset_path(name, args.interval, args.seed)
+        metadata = generate(path, DATASET_DAYS[name], args.interval, args.victron_interval, args.seed)
+        print(f"{path}: {json.dumps(metadata)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+History query benchmark
+
+Times every /api/history/* and /api/engine/* endpoint against synthetic
+datasets of increasing size (see benchmarks/datasets.py), so scaling
+curves show whether indexes and rollups keep queries flat as data grows.
+
+Each dataset is served by its own backend process (simulation mode, data
+logger effectively idle). Datasets are cached under benchmarks/datasets/ and
+regenerated when they are older than a day, since several endpoints query
+"the last N days".
+
+Run from backend/:
+    python -m benchmarks.history_benchmark month year --repeat 5
+    python -m benchmarks.history_benchmark month year 5years --interval 300
+"""
+import argparse
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Tuple
+
+import aiohttp
+
+from .common import BackendProcess, percentiles, write_results
+from .datasets import DATASET_DAYS, ensure_datasets, read_metadata
+
+logger = logging.getLogger(__name__)
+
+
+def endpoints() -> List[Tuple[str, str]]:
+    """(name, path) of every history and engine query worth timing"""
+    now = datetime.utcnow()
+    day_ago = (now - timedelta(days=1)).isoformat()
+    month_ago = (now - timedelta(days=30)).isoformat()
+    return [
+        ("history_sensor_latest_1000", "/api/history/sensors/engine_rpm"),
+        ("history_sensor_latest_10000", "/api/history/sensors/engine_rpm?limit=10000"),
+        ("history_sensor_last_day", f"/api/history/sensors/coolant_temp?start_date={day_ago}&limit=10000"),
+        ("history_sensor_optional", "/api/history/sensors/fuel_tank?limit=10000"),
+        ("history_victron", f"/api/history/victron/mppt_solar?start_date={month_ago}"),
+        ("history_solar_yield", "/api/history/solar/yield?days=30"),
+        ("history_battery_usage", "/api/history/battery/usage?days=30"),
+        ("history_fuel_consumption", "/api/history/fuel/consumption?days=30"),
+        ("engine_statistics_all", "/api/engine/statistics"),
+        ("engine_statistics_30d", f"/api/engine/statistics?start_date={month_ago}"),
+        ("engine_usage_summary_7d", "/api/engine/usage-summary?days=7"),
+        ("engine_usage_summary_90d", "/api/engine/usage-summary?days=90"),
+        ("engine_alerts_7d", "/api/engine/alerts?days=7"),
+        ("engine_alerts_90d", "/api/engine/alerts?days=90"),
+    ]
+
+
+async def _time_endpoint(
+    session: aiohttp.ClientSession,
+    base_url: str,
+    path: str,
+    repeat: int
+) -> Dict[str, Any]:
+    """Time one endpoint (first call reported separately as the cold run)"""
+    timings = []
+    status = None
+    size = 0
+    for i in range(repeat + 1):
+        started = time.perf_counter()
+        try:
+            async with session.get(f"{base_url}{path}") as response:
+                body = await response.read()
+                status = response.status
+                size = len(body)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            return {"error": type(e).__name__}
+        timings.append(time.perf_counter() - started)
+
+    return {
+        "status": status,
+        "response_bytes": size,
+        "cold_ms": round(timings[0] * 1000, 3),
+        **percentiles(timings[1:]),
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    paths = ensure_datasets(args.datasets, interval=args.interval, seed=args.seed)
+    results = {}
+
+    for name, path in paths.items():
+        env = {
+            "DATABASE_URL": f"sqlite+aiosqlite:///{path}",
+            "SIMULATION_MODE": "true",
+            "HISTORY_SAVE_INTERVAL": str(10 ** 9),  # One startup write, then idle
+            "REPLAY_SOURCE": "",
+            "DEBUG": "false",
+        }
+        logger.info(f"Benchmarking {name} ({path})")
+        timings = {}
+        async with BackendProcess(args.port, env) as backend:
+            timeout = aiohttp.ClientTimeout(total=args.timeout)
+            async with aiohttp.ClientSession(timeout=timeout) as session:
+                for endpoint, url in endpoints():
+                    timings[endpoint] = await _time_endpoint(session, backend.base_url, url, args.repeat)
+                    logger.info(f"  {endpoint}: {timings[endpoint].get('p50_ms')} ms")
+
+        results[name] = {"dataset": read_metadata(path), "endpoints": timings}
+
+    return {
+        "config": {"datasets": args.datasets, "interval": args.interval, "seed": args.seed, "repeat": args.repeat},
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time history and engine endpoints against synthetic datasets")
+    parser.add_argument("datasets", nargs="*", default=["month", "year"], choices=sorted(DATASET_DAYS))
+    parser.add_argument("--interval", type=float, default=60.0, help="Seconds between logged samples in the datasets")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=5, help="Timed calls per endpoint (after one cold call)")
+    parser.add_argument("--timeout", type=float, default=300.0, help="Per-request timeout (s)")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--output", help="Results file (default benchmarks/results/history_benchmark-<time>.json)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    results = asyncio.run(run(args))
+    path = write_results("history_benchmark", results, args.output)
+
+    # Scaling table: p50 per endpoint per dataset
+    names = list(results["results"])
+    print(f"{'endpoint':32}" + "".join(f"{name:>14}" for name in names))
+    for endpoint, _ in endpoints():
+        row = [results["results"][name]["endpoints"][endpoint].get("p50_ms") for name in names]
+        print(f"{endpoint:32}" + "".join(f"{value if value is not None else '-':>14}" for value in row))
+    print(f"Results saved to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,325 @@
+"""
+End-to-end load test
+
+Starts the backend under uvicorn (simulation or firmware emulator mode),
+attaches WebSocket clients and REST pollers, and reports:
+    - sample-to-screen latency (sensor sample time -> WebSocket message received)
+    - REST round-trip latency
+    - loop lag probe (/api/health round trip, a proxy for event loop stalls)
+    - backend CPU and RSS
+    - database write throughput (rows added to sensor_readings / victron_readings)
+
+Results are saved as JSON under benchmarks/results/.
+
+Run from backend/:
+    python -m benchmarks.load_test --sensors 50 --tick-hz 20 --ws-clients 10 --rest-pollers 5
+    python -m benchmarks.load_test --emulators 4 --sensors 48 --tick-hz 10 --latency 0.02
+"""
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+import websockets
+
+from .common import BackendProcess, ProcessSampler, percentiles, write_results
+
+CHANNELS_PER_TYPE = 8
+
+
+def _emulator_sensors(board_count: int, sensor_count: int, poll_interval: float):
+    """Spread the load sensors over the emulated boards; returns (channel maps per board, sensors.json entries)"""
+    from hardware.emulator import EmulatorCluster
+
+    board_ids = [EmulatorCluster.BOARD_ID.format(i + 1) for i in range(board_count)]
+    channel_maps: Dict[str, Dict] = {board_id: {} for board_id in board_ids}
+    sensors = {}
+    for i in range(sensor_count):
+        board_id = board_ids[i % board_count]
+        slot = i // board_count
+        input_type = ("analog", "frequency")[slot // CHANNELS_PER_TYPE % 2]
+        channel = slot % CHANNELS_PER_TYPE + 1
+        sensor_id = f"load_sensor_{i}"
+        channel_maps[board_id][sensor_id] = {"type": input_type, "channel": channel}
+        sensors[sensor_id] = {
+            "name": f"Load Sensor {i}",
+            "board": board_id,
+            "type": input_type,
+            "channel": channel,
+            "unit": "",
+            "poll_interval": poll_interval,
+            "logging": "critical",
+            "simulation": {"min": 0, "max": 100},
+        }
+    return channel_maps, sensors
+
+
+def _simulation_sensors(sensor_count: int) -> Dict[str, Dict]:
+    """
+    sensors.json for simulation mode: the configured sensors plus the
+    simulator's synthetic ones (sim_sensor_N), registered as critical so the
+    data logger writes them too. Without a "simulation" range the simulator
+    leaves them to its load-test waveform.
+    """
+    from config import settings
+
+    with open(os.path.join(settings.CONFIG_DIR, "sensors.json")) as f:
+        sensors = json.load(f).get("sensors", {})
+    for i in range(sensor_count):
+        sensors[f"sim_sensor_{i}"] = {"name": f"Simulated Sensor {i}", "unit": "", "logging": "critical"}
+    return sensors
+
+
+def _count_rows(database_path: str) -> Optional[int]:
+    """Rows logged so far (None if the tables don't exist yet)"""
+    try:
+        db = sqlite3.connect(f"file:{database_path}?mode=ro", uri=True, timeout=5)
+        try:
+            return sum(
+                db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ("sensor_readings", "victron_readings")
+            )
+        finally:
+            db.close()
+    except sqlite3.Error:
+        return None
+
+
+class LoadTest:
+    """One load test run against a backend subprocess"""
+
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.base_url = f"http://127.0.0.1:{args.port}"
+        self.ws_url = f"ws://127.0.0.1:{args.port}/api/sensors/ws"
+        self.sample_latency: List[float] = []
+        self.rest_latency: List[float] = []
+        self.probe_latency: List[float] = []
+        self.ws_messages = 0
+        self.rest_requests = 0
+        self.errors: Dict[str, int] = {}
+        self.measuring = False
+
+    def _error(self, kind: str):
+        self.errors[kind] = self.errors.get(kind, 0) + 1
+
+    async def _ws_client(self, stop: asyncio.Event):
+        """Receive sensor updates and record sample-to-screen latency for new samples"""
+        last_sample: Dict[str, float] = {}
+        try:
+            async with websockets.connect(self.ws_url, max_size=None) as ws:
+                while not stop.is_set():
+                    try:
+                        raw = await asyncio.wait_for(ws.recv(), timeout=1.0)
+                    except asyncio.TimeoutError:
+                        continue
+                    received = time.time()
+                    message = json.loads(raw)
+                    for sensor_id, record in message.get("quality", {}).items():
+                        sample_time = record.get("sample_time")
+                        if sample_time is None or sample_time <= last_sample.get(sensor_id, 0.0):
+                            continue
+                        last_sample[sensor_id] = sample_time
+                        if self.measuring:
+                            self.sample_latency.append(received - sample_time)
+                    if self.measuring:
+                        self.ws_messages += 1
+        except (OSError, websockets.WebSocketException) as e:
+            self._error(f"websocket: {type(e).__name__}")
+
+    async def _rest_poller(self, session: aiohttp.ClientSession, stop: asyncio.Event):
+        """Poll /api/sensors like the dashboard's fallback path"""
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                async with session.get(f"{self.base_url}/api/sensors") as response:
+                    await response.read()
+                    if response.status != 200:
+                        self._error(f"rest: HTTP {response.status}")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                self._error(f"rest: {type(e).__name__}")
+            else:
+                if self.measuring:
+                    self.rest_latency.append(time.perf_counter() - started)
+                    self.rest_requests += 1
+            await asyncio.sleep(self.args.rest_interval)
+
+    async def _probe(self, session: aiohttp.ClientSession, stop: asyncio.Event):
+        """Round trip of the cheapest endpoint; grows when the event loop is blocked"""
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                async with session.get(f"{self.base_url}/api/health") as response:
+                    await response.read()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                self._error(f"probe: {type(e).__name__}")
+            else:
+                if self.measuring:
+                    self.probe_latency.append(time.perf_counter() - started)
+            await asyncio.sleep(0.25)
+
+    async def _server_metrics(self, session: aiohttp.ClientSession, backend: BackendProcess) -> Dict[str, Any]:
+        """Loop lag and stalls as measured inside the backend (whole run, including warmup)"""
+        try:
+            async with session.get(f"{backend.base_url}/api/metrics?format=json") as response:
+                data = await response.json()
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            self._error(f"metrics: {type(e).__name__}")
+            return {}
+
+        def first(name: str) -> Optional[Dict[str, Any]]:
+            values = data.get(name, {}).get("values", [])
+            return values[0] if values else None
+
+        stalls = first("boatmonitor_event_loop_stalls_total")
+        return {
+            "event_loop_lag": first("boatmonitor_event_loop_lag_seconds"),
+            "event_loop_stalls": stalls["value"] if stalls else None,
+            "loop_iterations": data.get("boatmonitor_loop_iteration_seconds", {}).get("values", []),
+        }
+
+    async def _sample_process(self, sampler: ProcessSampler, stop: asyncio.Event):
+        while not stop.is_set():
+            if self.measuring:
+                sampler.sample()
+            await asyncio.sleep(1.0)
+
+    def _environment(self, workdir: str) -> Dict[str, str]:
+        args = self.args
+        env = {
+            "DATABASE_URL": f"sqlite+aiosqlite:///{os.path.join(workdir, 'load.db')}",
+            "SIMULATION_MODE": "false" if args.emulators else "true",
+            "SIMULATION_SEED": str(args.seed),
+            "SIMULATION_TICK_HZ": str(args.tick_hz),
+            "SIMULATION_EXTRA_SENSORS": str(args.sensors),
+            "HISTORY_SAVE_INTERVAL": str(args.save_interval),
+            "REPLAY_SOURCE": "",
+        }
+        # Both modes register the load sensors in a sensors.json of their own
+        env["CONFIG_DIR"] = workdir
+        if args.emulators:
+            env["SENSOR_POLL_INTERVAL"] = str(1.0 / args.tick_hz)
+        return env
+
+    async def run(self) -> Dict[str, Any]:
+        args = self.args
+        cluster = None
+
+        with tempfile.TemporaryDirectory(prefix="boatmonitor-load-") as workdir:
+            if args.emulators:
+                from hardware.emulator import EmulatorCluster
+                channel_maps, sensors = _emulator_sensors(args.emulators, args.sensors, 1.0 / args.tick_hz)
+                cluster = EmulatorCluster(
+                    args.emulators,
+                    base_port=args.emulator_port,
+                    channel_maps=channel_maps,
+                    latency=args.latency,
+                    jitter=args.jitter,
+                    loss=args.loss
+                )
+                with open(os.path.join(workdir, "boards.json"), "w") as f:
+                    json.dump({"boards": cluster.board_config()}, f)
+                await cluster.start()
+            else:
+                sensors = _simulation_sensors(args.sensors)
+            with open(os.path.join(workdir, "sensors.json"), "w") as f:
+                json.dump({"sensors": sensors}, f)
+
+            database_path = os.path.join(workdir, "load.db")
+            try:
+                async with BackendProcess(args.port, self._environment(workdir)) as backend:
+                    return await self._measure(backend, database_path)
+            finally:
+                if cluster:
+                    await cluster.stop()
+
+    async def _measure(self, backend: BackendProcess, database_path: str) -> Dict[str, Any]:
+        args = self.args
+        stop = asyncio.Event()
+        sampler = ProcessSampler(backend.pid)
+        timeout = aiohttp.ClientTimeout(total=10)
+
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            tasks = [asyncio.create_task(self._ws_client(stop)) for _ in range(args.ws_clients)]
+            tasks += [asyncio.create_task(self._rest_poller(session, stop)) for _ in range(args.rest_pollers)]
+            tasks.append(asyncio.create_task(self._probe(session, stop)))
+            tasks.append(asyncio.create_task(self._sample_process(sampler, stop)))
+
+            await asyncio.sleep(args.warmup)
+            rows_start = _count_rows(database_path)
+            self.measuring = True
+            started = time.monotonic()
+            await asyncio.sleep(args.duration)
+            self.measuring = False
+            elapsed = time.monotonic() - started
+            rows_end = _count_rows(database_path)
+            server_metrics = await self._server_metrics(session, backend)
+
+            stop.set()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        rows = (rows_end - rows_start) if rows_start is not None and rows_end is not None else None
+        return {
+            "config": {
+                "mode": "emulator" if args.emulators else "simulation",
+                "sensors": args.sensors,
+                "tick_hz": args.tick_hz,
+                "ws_clients": args.ws_clients,
+                "rest_pollers": args.rest_pollers,
+                "rest_interval": args.rest_interval,
+                "emulators": args.emulators,
+                "emulator_faults": {"latency": args.latency, "jitter": args.jitter, "loss": args.loss},
+                "save_interval": args.save_interval,
+                "duration": args.duration,
+                "warmup": args.warmup,
+            },
+            "sample_to_screen": percentiles(self.sample_latency),
+            "rest": {**percentiles(self.rest_latency), "requests_per_s": round(self.rest_requests / elapsed, 1)},
+            "loop_lag_probe": percentiles(self.probe_latency),
+            "server": server_metrics,
+            "websocket": {"messages_per_s": round(self.ws_messages / elapsed, 1)},
+            "process": sampler.summary(),
+            "database": {
+                "rows_written": rows,
+                "rows_per_s": round(rows / elapsed, 1) if rows is not None else None,
+            },
+            "errors": self.errors,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="BoatMonitor end-to-end load test")
+    parser.add_argument("--sensors", type=int, default=50, help="Extra simulated sensors (or sensors on the emulators)")
+    parser.add_argument("--tick-hz", type=float, default=10.0, help="Sensor tick rate (max 100)")
+    parser.add_argument("--ws-clients", type=int, default=10)
+    parser.add_argument("--rest-pollers", type=int, default=5)
+    parser.add_argument("--rest-interval", type=float, default=1.0, help="Seconds between polls per poller")
+    parser.add_argument("--duration", type=float, default=60.0, help="Measurement window (s)")
+    parser.add_argument("--warmup", type=float, default=5.0)
+    parser.add_argument("--save-interval", type=float, default=5.0, help="HISTORY_SAVE_INTERVAL for the run")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--emulators", type=int, default=0, help="Use N emulated wireless boards instead of simulation")
+    parser.add_argument("--emulator-port", type=int, default=8100)
+    parser.add_argument("--latency", type=float, default=0.0, help="Emulator response delay (s)")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--loss", type=float, default=0.0)
+    parser.add_argument("--output", help="Results file (default benchmarks/results/load_test-<time>.json)")
+    args = parser.parse_args()
+
+    if args.emulators and args.sensors > args.emulators * CHANNELS_PER_TYPE * 2:
+        parser.error(f"At most {CHANNELS_PER_TYPE * 2} sensors per emulated board")
+
+    results = asyncio.run(LoadTest(args).run())
+    path = write_results("load_test", results, args.output)
+    print(json.dumps(results, indent=2))
+    print(f"Results saved to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""
+Storage profile benchmark
+
+Measures history read latency while a writer commits data-logger-sized
+batches, for each SQLite storage profile:
+    - rollback: the old setup (rollback journal, synchronous=FULL, a new
+      connection per session shared by reads and writes)
+    - wal: the current profile from database/database.py (WAL, tuned
+      pragmas, one writer connection, read-only pool, background checkpoints)
+
+Runs in-process against a copy of a synthetic dataset (see
+benchmarks/datasets.py), so only the storage layer differs between runs.
+Reads are the kiosk's history query (latest readings of one sensor over a
+chart window).
+
+Run from backend/:
+    python -m benchmarks.storage_benchmark --duration 30 --readers 4
+    python -m benchmarks.storage_benchmark --write-interval 0.2 --batch 500
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from config import settings
+from database import database
+from database.models import SensorReading, VictronReading
+
+from .common import percentiles, write_results
+from .datasets import DATASET_DAYS, ensure_datasets
+
+logger = logging.getLogger(__name__)
+
+HISTORY_SENSORS = ("engine_rpm", "oil_pressure", "coolant_temp", "fuel_tank")
+
+# DB_* settings of the old setup, for the rollback profile
+ROLLBACK_SETTINGS = {
+    "DB_JOURNAL_MODE": "DELETE",
+    "DB_SYNCHRONOUS": "FULL",
+}
+
+
+def _sessions(profile: str, url: str):
+    """(write sessions, read sessions, engines) for a profile"""
+    if profile == "rollback":
+        engine = create_async_engine(url)
+        sessions = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        return sessions, sessions, [engine]
+
+    write_engine = database.create_write_engine(url)
+    read_engine = database.create_read_engine(url)
+    return (
+        async_sessionmaker(write_engine, class_=AsyncSession, expire_on_commit=False),
+        async_sessionmaker(read_engine or write_engine, class_=AsyncSession, expire_on_commit=False),
+        [engine for engine in (write_engine, read_engine) if engine is not None],
+    )
+
+
+async def _writer(sessions, stop: asyncio.Event, interval: float, batch: int, stats: Dict[str, List]):
+    """Commit one data-logger-sized batch per interval"""
+    while not stop.is_set():
+        started = time.perf_counter()
+        timestamp = datetime.utcnow()
+        try:
+            async with sessions() as session:
+                for i in range(batch):
+                    sensor_id = f"bench_{i}"
+                    session.add(SensorReading(
+                        timestamp=timestamp, sensor_type=sensor_id, sensor_id=sensor_id,
+                        value=random.random() * 100, unit=""
+                    ))
+                session.add(VictronReading(
+                    timestamp=timestamp, device_type="battery_monitor", device_id="smartshunt_bench",
+                    data={"voltage": 12.8, "current": -4.2, "soc": 87.0}
+                ))
+                await session.commit()
+            stats["write"].append(time.perf_counter() - started)
+        except OperationalError as e:
+            stats["write_errors"].append(str(e.orig))
+        try:
+            await asyncio.wait_for(stop.wait(), max(0.0, interval - (time.perf_counter() - started)))
+        except asyncio.TimeoutError:
+            pass
+
+
+async def _reader(sessions, stop: asyncio.Event, args: argparse.Namespace, stats: Dict[str, List]):
+    """Repeat the history endpoint's query (a kiosk chart window) for random sensors"""
+    while not stop.is_set():
+        sensor = random.choice(HISTORY_SENSORS)
+        since = datetime.utcnow() - timedelta(hours=args.window_hours)
+        started = time.perf_counter()
+        try:
+            async with sessions() as session:
+                result = await session.execute(
+                    select(SensorReading).where(
+                        SensorReading.sensor_type == sensor, SensorReading.timestamp >= since
+                    ).order_by(SensorReading.timestamp.desc()).limit(args.limit)
+                )
+                result.scalars().all()
+            stats["read"].append(time.perf_counter() - started)
+        except OperationalError as e:
+            stats["read_errors"].append(str(e.orig))
+        await asyncio.sleep(args.read_pause)
+
+
+async def run_profile(profile: str, source: str, args: argparse.Namespace) -> Dict[str, Any]:
+    directory = tempfile.mkdtemp(prefix="boatmonitor-storage-")
+    path = os.path.join(directory, "boatmonitor.db")
+    shutil.copyfile(source, path)
+    url = f"sqlite+aiosqlite:///{path}"
+
+    original = {name: getattr(settings, name) for name in (*ROLLBACK_SETTINGS, "DATABASE_URL")}
+    settings.DATABASE_URL = url
+    if profile == "rollback":
+        for name, value in ROLLBACK_SETTINGS.items():
+            setattr(settings, name, value)
+
+    write_sessions, read_sessions, engines = _sessions(profile, url)
+    checkpointer = database.WalCheckpointer(args.checkpoint_interval) if profile == "wal" else None
+    stats: Dict[str, List] = {"read": [], "write": [], "read_errors": [], "write_errors": []}
+    try:
+        # First connection sets the journal mode; readers need the file in its final mode
+        async with write_sessions() as session:
+            await session.execute(select(SensorReading.id).limit(1))
+
+        stop = asyncio.Event()
+        tasks = [asyncio.create_task(_writer(write_sessions, stop, args.write_interval, args.batch, stats))]
+        tasks += [
+            asyncio.create_task(_reader(read_sessions, stop, args, stats))
+            for _ in range(args.readers)
+        ]
+        if checkpointer:
+            tasks.append(asyncio.create_task(checkpointer.start()))
+
+        logger.info(f"Running {profile} profile for {args.duration}s")
+        await asyncio.sleep(args.duration)
+        stop.set()
+        if checkpointer:
+            await checkpointer.stop()
+        await asyncio.gather(*tasks)
+        wal_bytes = database.wal_size()
+    finally:
+        for engine in engines:
+            await engine.dispose()
+        for name, value in original.items():
+            setattr(settings, name, value)
+        shutil.rmtree(directory, ignore_errors=True)
+
+    return {
+        "reads": percentiles(stats["read"]),
+        "reads_per_second": round(len(stats["read"]) / args.duration, 1),
+        "read_errors": len(stats["read_errors"]),
+        "writes": percentiles(stats["write"]),
+        "write_errors": len(stats["write_errors"]),
+        "wal_bytes_at_end": wal_bytes,
+        "errors": sorted(set(stats["read_errors"] + stats["write_errors"]))[:5],
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    source = ensure_datasets([args.dataset], interval=args.interval, seed=args.seed)[args.dataset]
+    results = {}
+    for profile in args.profiles:
+        results[profile] = await run_profile(profile, source, args)
+        reads = results[profile]["reads"]
+        logger.info(f"  {profile}: read p50 {reads.get('p50_ms')} ms, p99 {reads.get('p99_ms')} ms")
+    return {
+        "config": {
+            key: getattr(args, key)
+            for key in ("dataset", "interval", "duration", "readers", "window_hours", "limit", "read_pause",
+                        "write_interval", "batch", "checkpoint_interval")
+        },
+        "wal_profile": {
+            name: getattr(settings, name)
+            for name in ("DB_SYNCHRONOUS", "DB_CACHE_SIZE_KB", "DB_MMAP_SIZE_MB", "DB_TEMP_STORE",
+                         "DB_READ_POOL_SIZE", "DB_WAL_AUTOCHECKPOINT")
+        },
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="History read latency under concurrent writes, per storage profile")
+    parser.add_argument("--profiles", nargs="+", default=["rollback", "wal"], choices=["rollback", "wal"])
+    parser.add_argument("--dataset", default="month", choices=sorted(DATASET_DAYS))
+    parser.add_argument("--interval", type=float, default=60.0, help="Seconds between logged samples in the dataset")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds per profile")
+    parser.add_argument("--readers", type=int, default=4, help="Concurrent history readers")
+    parser.add_argument("--window-hours", type=float, default=24.0, help="History window per read")
+    parser.add_argument("--limit", type=int, default=1000, help="Rows per history read")
+    parser.add_argument("--read-pause", type=float, default=0.05, help="Pause between one reader's queries (s)")
+    parser.add_argument("--write-interval", type=float, default=1.0, help="Seconds between write batches")
+    parser.add_argument("--batch", type=int, default=200, help="Sensor rows per write batch")
+    parser.add_argument("--checkpoint-interval", type=float, default=10.0, help="WAL checkpoint interval (s)")
+    parser.add_argument("--output", help="Results file (default benchmarks/results/storage_benchmark-<time>.json)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    results = asyncio.run(run(args))
+    path = write_results("storage_benchmark", results, args.output)
+
+    print(f"{'profile':10}{'read p50':>10}{'read p95':>10}{'read p99':>10}{'reads/s':>9}"
+          f"{'write p50':>11}{'write p99':>11}{'errors':>8}")
+    for profile, result in results["results"].items():
+        reads, writes = result["reads"], result["writes"]
+        print(f"{profile:10}{reads.get('p50_ms', '-'):>10}{reads.get('p95_ms', '-'):>10}{reads.get('p99_ms', '-'):>10}"
+              f"{result['reads_per_second']:>9}{writes.get('p50_ms', '-'):>11}{writes.get('p99_ms', '-'):>11}"
+              f"{result['read_errors'] + result['write_errors']:>8}")
+    print(f"Results saved to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+Storage wear benchmark
+
+Bytes written per hour of logging, with the data logger committing every
+sample to SQLite ("direct") and with write staging ("staged", see
+services/staging.py). Each mode runs the real DataLogger, db writer and WAL
+checkpoints in a child process against a copy of a synthetic dataset, fed
+by the boat simulator instead of hardware, and logs the samples back to
+back; the results are scaled to the configured log interval:
+
+    - syscall_bytes: everything the process write()s (SQLite pages, WAL,
+      checkpoints, journal records) - /proc/self/io wchar
+    - storage_bytes: what reached the block device - /proc/self/io write_bytes
+      (0 on tmpfs and some container filesystems)
+
+Run from backend/:
+    python -m benchmarks.wear_benchmark --hours 6 --log-interval 60
+    python -m benchmarks.wear_benchmark --hours 1 --log-interval 1 --merge-minutes 15
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict
+
+from .common import BACKEND_DIR, write_results
+from .datasets import DATASET_DAYS, ensure_datasets
+
+logger = logging.getLogger(__name__)
+
+MODES = ("direct", "staged")
+
+
+class _SimulatedSensors:
+    """The sensor and Victron managers' read side, fed by the boat simulator"""
+
+    def __init__(self, simulator, interval: float):
+        self.simulator = simulator
+        self.interval = interval
+
+    def get_all_readings(self, include_stale: bool = True) -> Dict[str, float]:
+        self.simulator.step(self.interval)
+        return {sensor_id: value for sensor_id, _, value in self.simulator.read_sensors()}
+
+    def get_all_data(self) -> Dict[str, Dict[str, Any]]:
+        return self.simulator.victron_data()
+
+
+async def _measure(args: argparse.Namespace) -> Dict[str, Any]:
+    """Child process: log `samples` samples with the settings from the environment"""
+    from database.database import checkpoint, close_database, init_database, wal_size
+    from hardware.sensor_registry import sensor_registry
+    from hardware.simulator import BoatSimulator
+    from services.data_logger import DataLogger
+    from services.db_writer import db_writer
+    from services.metrics import process_io
+
+    await init_database()
+    writer = asyncio.create_task(db_writer.start())
+
+    ranges = {
+        d.sensor_id: (float(d.simulation.get("min", 0)), float(d.simulation.get("max", 100)))
+        for d in sensor_registry.sensors.values()
+    }
+    source = _SimulatedSensors(BoatSimulator(seed=args.seed, sensor_ranges=ranges), args.log_interval)
+    data_logger = DataLogger()
+    data_logger.sensor_manager = source
+    data_logger.victron_manager = source
+    if data_logger.stage:
+        await data_logger.stage.recover()
+
+    samples = int(args.hours * 3600 / args.log_interval)
+    checkpoint_every = max(1, int(args.checkpoint_interval / args.log_interval))
+    syscall_before, storage_before = process_io("wchar"), process_io("write_bytes")
+    started = time.perf_counter()
+    for i in range(1, samples + 1):
+        await data_logger._log_data()
+        # What WalCheckpointer does every DB_CHECKPOINT_INTERVAL
+        if i % checkpoint_every == 0:
+            await checkpoint()
+    if data_logger.stage:
+        await data_logger.stage.merge()
+        data_logger.stage.close()
+    await db_writer.stop()
+    await writer
+    elapsed = time.perf_counter() - started
+    wal_bytes = wal_size()
+    syscall_bytes = process_io("wchar") - syscall_before
+    storage_bytes = process_io("write_bytes") - storage_before
+    await close_database()
+
+    return {
+        "samples": samples,
+        "commits": db_writer.batches,
+        "syscall_bytes": syscall_bytes,
+        "storage_bytes": storage_bytes,
+        "syscall_bytes_per_hour": round(syscall_bytes / args.hours),
+        "storage_bytes_per_hour": round(storage_bytes / args.hours),
+        "wal_bytes_at_end": wal_bytes,
+        "elapsed_s": round(elapsed, 2),
+    }
+
+
+def run_mode(mode: str, source: str, args: argparse.Namespace) -> Dict[str, Any]:
+    """Run one mode in a child process (the database settings are read at import)"""
+    directory = tempfile.mkdtemp(prefix="boatmonitor-wear-")
+    path = os.path.join(directory, "boatmonitor.db")
+    shutil.copyfile(source, path)
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite+aiosqlite:///{path}",
+        "DB_STAGING": "true" if mode == "staged" else "false",
+        "DB_STAGING_JOURNAL": os.path.join(directory, "staging.journal"),
+        # Merge by sample count; the benchmark logs faster than real time
+        "DB_STAGING_MERGE_INTERVAL": "1e9",
+        "DB_STAGING_MAX_SAMPLES": str(max(1, int(args.merge_minutes * 60 / args.log_interval))),
+        "LOG_LEVEL": "WARNING",
+    }
+    command = [
+        sys.executable, "-m", "benchmarks.wear_benchmark", "--child",
+        "--hours", str(args.hours), "--log-interval", str(args.log_interval),
+        "--checkpoint-interval", str(args.checkpoint_interval), "--seed", str(args.seed),
+    ]
+    try:
+        logger.info(f"Running {mode} mode")
+        output = subprocess.run(command, cwd=BACKEND_DIR, env=env, check=True, capture_output=True, text=True)
+        return json.loads(output.stdout.strip().splitlines()[-1])
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    source = ensure_datasets([args.dataset], interval=args.interval, seed=args.seed)[args.dataset]
+    results = {mode: run_mode(mode, source, args) for mode in args.modes}
+    if "direct" in results and "staged" in results and results["staged"]["syscall_bytes"]:
+        results["syscall_reduction"] = round(results["direct"]["syscall_bytes"] / results["staged"]["syscall_bytes"], 1)
+    return {
+        "config": {
+            key: getattr(args, key)
+            for key in ("dataset", "interval", "hours", "log_interval", "merge_minutes", "checkpoint_interval")
+        },
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bytes written per hour of logging, direct vs staged writes")
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=MODES)
+    parser.add_argument("--dataset", default="month", choices=sorted(DATASET_DAYS))
+    parser.add_argument("--interval", type=float, default=60.0, help="Seconds between logged samples in the dataset")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--hours", type=float, default=6.0, help="Logging time to simulate")
+    parser.add_argument("--log-interval", type=float, default=60.0, help="HISTORY_SAVE_INTERVAL to simulate")
+    parser.add_argument("--merge-minutes", type=float, default=15.0, help="DB_STAGING_MERGE_INTERVAL to simulate")
+    parser.add_argument("--checkpoint-interval", type=float, default=300.0, help="DB_CHECKPOINT_INTERVAL to simulate")
+    parser.add_argument("--output", help="Results file (default benchmarks/results/wear_benchmark-<time>.json)")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(_measure(args))))
+        return
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    results = run(args)
+    path = write_results("wear_benchmark", results, args.output)
+
+    print(f"{'mode':8}{'samples':>9}{'commits':>9}{'syscall MB/h':>14}{'storage MB/h':>14}")
+    for mode in args.modes:
+        result = results["results"][mode]
+        print(f"{mode:8}{result['samples']:>9}{result['commits']:>9}"
+              f"{result['syscall_bytes_per_hour'] / 1e6:>14.2f}{result['storage_bytes_per_hour'] / 1e6:>14.2f}")
+    if "syscall_reduction" in results["results"]:
+        print(f"Staging writes {results['results']['syscall_reduction']}x fewer bytes")
+    print(f"Results saved to {path}")
+
+
+if __name__ == "__main__":
+    main()
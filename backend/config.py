@@ -16,15 +16,104 @@ class Settings(BaseSettings):
 
     # Database
     DATABASE_URL: str = "sqlite+aiosqlite:///./boatmonitor.db"
+    SQL_ECHO: bool = False  # Log every SQL statement (independent of DEBUG)
+
+    # SQLite storage profile (see database/database.py)
+    DB_JOURNAL_MODE: str = "WAL"  # "DELETE" = SQLite's default rollback journal
+    DB_SYNCHRONOUS: str = "NORMAL"  # FULL = fsync every commit (slow on SD cards)
+    DB_CACHE_SIZE_KB: int = 8192  # Page cache per connection
+    DB_MMAP_SIZE_MB: int = 64  # Memory-mapped reads; 0 = off
+    DB_TEMP_STORE: str = "MEMORY"  # Sorts and temp indexes in RAM, not on the SD card
+    DB_BUSY_TIMEOUT: float = 5.0  # Seconds a connection waits for a lock
+    DB_READ_POOL_SIZE: int = 4  # Read-only connections for history reads; 0 = share the writer
+    DB_CHECKPOINT_INTERVAL: float = 300.0  # Seconds between background WAL checkpoints
+    DB_WAL_AUTOCHECKPOINT: int = 10000  # Pages; safety net if the background checkpoint falls behind
+    DB_WRITE_MAX_BATCH: int = 200  # Write operations per group commit
+    DB_WRITE_BATCH_DELAY: float = 0.01  # Seconds the writer waits for more writes before committing
+
+    # Write staging (services/staging.py): samples go to a journal file, merged into SQLite in batches
+    DB_STAGING: bool = False
+    DB_STAGING_JOURNAL: str = "./staging.journal"
+    DB_STAGING_MERGE_INTERVAL: float = 900.0  # Seconds between merges (history reads lag by this much)
+    DB_STAGING_MAX_SAMPLES: int = 1000  # Merge earlier once this many samples are staged
+    DB_STAGING_FSYNC: bool = True  # fdatasync the journal after every sample
+
+    # History partitions (database/partitions.py): readings in one SQLite file per month
+    DB_PARTITIONING: bool = False
+    DB_PARTITION_DIR: str = "./partitions"
+    DB_RETENTION_MONTHS: int = 0  # Whole months older than this are retired; 0 = keep everything
+    DB_ARCHIVE_DIR: str = ""  # Retired months are moved here; empty = deleted
+    DB_SEAL_AFTER_MONTHS: int = 0  # Sensor readings of older months go to compressed archive segments; 0 = never
+
+    # Logging (written by a background thread, see services/log_pipeline.py)
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "text"  # "text" or "json" (one object per line)
+    LOG_FILE: str = ""  # Rotating log file; empty = console only
+    LOG_FILE_MAX_BYTES: int = 5_000_000
+    LOG_FILE_BACKUPS: int = 3
+    LOG_QUEUE_SIZE: int = 10000  # Records beyond this are dropped, never block
+    LOG_RATE_LIMIT_BURST: int = 10  # Identical messages allowed per period...
+    LOG_RATE_LIMIT_PERIOD: float = 60.0  # ...before further ones are suppressed
 
     # Hardware
     SIMULATION_MODE: bool = os.getenv("SIMULATION_MODE", "true").lower() == "true"
     AUTOMATION_2040W_COUNT: int = 2
 
+    # Simulation
+    SIMULATION_SEED: int = 1  # Same seed (and start), same data
+    SIMULATION_START: str = "2026-06-01T00:00:00"  # Model clock start, UTC ("now" = wall clock, not reproducible)
+    SIMULATION_TICK_HZ: float = 0.0  # 0 = use the normal poll intervals, max 100
+    SIMULATION_TIME_SCALE: float = 1.0  # Simulated seconds per real second
+    SIMULATION_EXTRA_SENSORS: int = 0  # Synthetic sensors added for load testing
+    SIMULATION_BOARD_COUNT: int = 2  # Boards the synthetic sensors are spread over
+
+    # Replay (feed recorded history back through the pipeline instead of live data)
+    REPLAY_SOURCE: str = ""  # Database file or NDJSON export; empty = disabled
+    REPLAY_SPEED: float = 1.0  # 1x - 1000x
+    REPLAY_LOOP: bool = False
+    REPLAY_MAX_GAP: float = 0.0  # Cap quiet periods to this many seconds (0 = keep original)
+
     # Sensor polling intervals (seconds)
     SENSOR_POLL_INTERVAL: float = 5.0  # Update sensor readings every 5 seconds
     VICTRON_POLL_INTERVAL: float = 5.0  # Update Victron data every 5 seconds
     HISTORY_SAVE_INTERVAL: float = 60.0  # Save to database every minute
+    HISTORY_CACHE_HOURS: float = 24.0  # Recent readings kept in memory for history queries (0 = off)
+
+    # Cached history and engine report responses (with ETag revalidation)
+    RESPONSE_CACHE_ENTRIES: int = 256  # 0 = off
+    RESPONSE_CACHE_MB: float = 16.0
+    RESPONSE_CACHE_MAX_AGE: float = 3600.0  # Seconds a response for a closed (past) range is kept
+    SENSOR_STALE_AFTER: float = 30.0  # Readings older than this are reported as stale
+
+    # Multi-process mode: polling and logging in a separate process, sharing
+    # the live values with the web process through a memory-mapped store
+    ACQUISITION_PROCESS: bool = False
+    SHARED_STORE_PATH: str = ""  # Empty = /dev/shm/boatmonitor-live
+    SHARED_STORE_CAPACITY: int = 1024  # Sensor + Victron field slots
+
+    # Analytics (report queries in a process pool with read-only DB connections)
+    ANALYTICS_WORKERS: int = 1  # 0 = run reports in a thread instead
+    ANALYTICS_MAX_QUEUED: int = 8  # More waiting reports are rejected with 503
+    ANALYTICS_TIMEOUT: float = 120.0  # Seconds before a report is cancelled
+
+    # Background jobs (exports, backups, long reports; see /api/jobs)
+    JOB_WORKERS: int = 1  # Jobs run at once
+    JOB_RESULT_TTL: float = 600.0  # Identical submissions within this many seconds reuse the result
+    JOB_TIMEOUT: float = 3600.0  # Per database step of a job (instead of ANALYTICS_TIMEOUT)
+    JOB_HISTORY_DAYS: float = 7.0  # Finished jobs (and their export files) are removed after this
+    EXPORT_DIR: str = "./exports"
+    BACKUP_DIR: str = "./backups"
+
+    # Background task supervision
+    TASK_RESTART_BACKOFF: float = 1.0  # First restart delay after a crash (doubles each time)
+    TASK_RESTART_BACKOFF_MAX: float = 60.0
+    SHUTDOWN_TIMEOUT: float = 10.0  # Time for loops to finish (and flush) before they are cancelled
+
+    # Event loop monitor (lag sampling and stall capture, see /api/diagnostics)
+    LOOP_MONITOR_ENABLED: bool = True
+    LOOP_MONITOR_INTERVAL: float = 0.1  # Lag sample interval (seconds)
+    LOOP_STALL_THRESHOLD: float = 0.25  # Blocked longer than this = stall, stack captured
+    LOOP_INCIDENT_HISTORY: int = 50  # Stalls kept for the API
 
     # Security
     SETTINGS_PASSWORD: str = "1AmpMatter"
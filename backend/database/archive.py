@@ -0,0 +1,340 @@
+"""
+Archive segments - sealed months of sensor readings in a compressed columnar file
+
+A sealed month's `sensor_readings` move out of its SQLite partition (see
+database/partitions.py) into DB_PARTITION_DIR/history-YYYY-MM.seg:
+
+    "BMSEG001" | block | block | ... | index (zlib JSON) | footer
+
+Each block holds up to BLOCK_SAMPLES consecutive readings of one sensor,
+compressed like Facebook's Gorilla: timestamps (microseconds) as
+delta-of-delta in variable-width buckets, values as the XOR with the
+previous value, storing only its meaningful bits. Regularly logged sensors
+cost a few bits per timestamp and steady values one bit. The index lists
+each block's sensor, unit, time span, count and position, so a query only
+decodes the blocks of the sensors and times it asks for.
+
+Segments are memory-mapped; open_segment() keeps them open per process.
+Timestamps are microseconds since the Unix epoch (naive UTC); values are
+floats (a NULL value is stored as NaN and read back as None).
+"""
+import heapq
+import json
+import math
+import mmap
+import os
+import struct
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+MAGIC = b"BMSEG001"
+FOOTER = struct.Struct("<QI8s")  # index offset, index length, magic
+BLOCK_SAMPLES = 1024
+
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+# Delta-of-delta buckets: (prefix, prefix bits, value bits). Gorilla's
+# buckets are for second timestamps; these are sized for microseconds
+# (a 60 s logging loop jitters by a few milliseconds)
+DOD_BUCKETS = ((0b10, 2, 14), (0b110, 3, 20), (0b1110, 4, 32))
+DOD_LARGE = (0b1111, 4, 64)
+
+NAN_BITS = 0x7FF8000000000000
+_pack_double = struct.Struct(">d").pack
+_unpack_double = struct.Struct(">d").unpack
+_pack_bits = struct.Struct(">Q").pack
+_unpack_bits = struct.Struct(">Q").unpack
+
+# (timestamp_us, sensor_type, sensor_id, value, unit)
+Sample = Tuple[int, str, str, Optional[float], Optional[str]]
+
+
+def to_micros(timestamp: datetime) -> int:
+    return (timestamp.replace(tzinfo=None) - EPOCH) // MICROSECOND
+
+
+def from_micros(micros: int) -> datetime:
+    return EPOCH + timedelta(microseconds=micros)
+
+
+class _BitWriter:
+    def __init__(self):
+        self.out = bytearray()
+        self.acc = 0
+        self.bits = 0
+
+    def write(self, value: int, bits: int):
+        self.acc = (self.acc << bits) | (value & ((1 << bits) - 1))
+        self.bits += bits
+        if self.bits >= 64:
+            whole, self.bits = divmod(self.bits, 8)
+            self.out += (self.acc >> self.bits).to_bytes(whole, "big")
+            self.acc &= (1 << self.bits) - 1
+
+    def getvalue(self) -> bytes:
+        if self.bits:
+            padding = -self.bits % 8
+            self.out += (self.acc << padding).to_bytes((self.bits + padding) // 8, "big")
+            self.acc = self.bits = 0
+        return bytes(self.out)
+
+
+class _BitReader:
+    def __init__(self, data: bytes):
+        self.data = data
+        self.pos = 0
+
+    def read(self, bits: int) -> int:
+        start = self.pos >> 3
+        end = (self.pos + bits + 7) >> 3
+        chunk = int.from_bytes(self.data[start:end], "big")
+        shift = (end << 3) - self.pos - bits
+        self.pos += bits
+        return (chunk >> shift) & ((1 << bits) - 1)
+
+    def bit(self) -> int:
+        pos = self.pos
+        self.pos = pos + 1
+        return (self.data[pos >> 3] >> (7 - (pos & 7))) & 1
+
+
+def encode_block(timestamps: Sequence[int], values: Sequence[Optional[float]]) -> bytes:
+    """Gorilla-compress one sensor's samples (timestamps in microseconds)"""
+    writer = _BitWriter()
+    write = writer.write
+    previous_time = timestamps[0]
+    previous_delta = 0
+    previous = NAN_BITS if values[0] is None else _unpack_bits(_pack_double(values[0]))[0]
+    write(previous_time, 64)
+    write(previous, 64)
+    leading = trailing = -1
+
+    for timestamp, value in zip(timestamps[1:], values[1:]):
+        delta = timestamp - previous_time
+        dod = delta - previous_delta
+        previous_time, previous_delta = timestamp, delta
+        if dod == 0:
+            write(0, 1)
+        else:
+            for prefix, prefix_bits, bits in DOD_BUCKETS:
+                if -(1 << (bits - 1)) <= dod < (1 << (bits - 1)):
+                    break
+            else:
+                prefix, prefix_bits, bits = DOD_LARGE
+            write(prefix, prefix_bits)
+            write(dod, bits)
+
+        current = NAN_BITS if value is None else _unpack_bits(_pack_double(value))[0]
+        xor = current ^ previous
+        previous = current
+        if xor == 0:
+            write(0, 1)
+            continue
+        lead = min(64 - xor.bit_length(), 31)
+        trail = (xor & -xor).bit_length() - 1
+        if leading >= 0 and lead >= leading and trail >= trailing:
+            # Fits the previous window of meaningful bits
+            write(0b10, 2)
+            write(xor >> trailing, 64 - leading - trailing)
+        else:
+            leading, trailing = lead, trail
+            length = 64 - lead - trail
+            write(0b11, 2)
+            write(lead, 5)
+            write(length - 1, 6)
+            write(xor >> trail, length)
+    return writer.getvalue()
+
+
+def decode_block(data: bytes, count: int) -> Tuple[List[int], List[Optional[float]]]:
+    """Timestamps and values of a block written by encode_block()"""
+    reader = _BitReader(data)
+    read, bit = reader.read, reader.bit
+    timestamp = read(64)
+    previous = read(64)
+    value = _unpack_double(_pack_bits(previous))[0]
+    timestamps = [timestamp]
+    values: List[Optional[float]] = [None if math.isnan(value) else value]
+    delta = 0
+    leading = trailing = 0
+
+    for _ in range(count - 1):
+        if bit():
+            if not bit():
+                bits = 14
+            elif not bit():
+                bits = 20
+            elif not bit():
+                bits = 32
+            else:
+                bits = 64
+            dod = read(bits)
+            if dod >= 1 << (bits - 1):
+                dod -= 1 << bits
+            delta += dod
+        timestamp += delta
+        timestamps.append(timestamp)
+
+        if bit():
+            if bit():
+                leading = read(5)
+                length = read(6) + 1
+                trailing = 64 - leading - length
+            else:
+                length = 64 - leading - trailing
+            previous ^= read(length) << trailing
+            value = _unpack_double(_pack_bits(previous))[0]
+            values.append(None if math.isnan(value) else value)
+        else:
+            values.append(values[-1])
+    return timestamps, values
+
+
+@dataclass
+class Block:
+    """Index entry of one block"""
+    sensor_type: str
+    sensor_id: str
+    unit: Optional[str]
+    first: int
+    last: int
+    count: int
+    offset: int
+    length: int
+
+
+def write_segment(path: str, samples: Iterable[Sample]) -> Dict[str, int]:
+    """
+    Write a segment from samples ordered by sensor and time; written to a
+    temporary file and renamed into place. Returns sample, block and byte counts.
+    """
+    partial = path + ".part"
+    blocks: List[Block] = []
+    with open(partial, "wb") as f:
+        f.write(MAGIC)
+
+        def flush(key, timestamps, values):
+            data = encode_block(timestamps, values)
+            blocks.append(Block(*key, timestamps[0], timestamps[-1], len(timestamps), f.tell(), len(data)))
+            f.write(data)
+
+        key = None
+        timestamps: List[int] = []
+        values: List[Optional[float]] = []
+        for timestamp, sensor_type, sensor_id, value, unit in samples:
+            sample_key = (sensor_type, sensor_id, unit)
+            if timestamps and (sample_key != key or len(timestamps) >= BLOCK_SAMPLES):
+                flush(key, timestamps, values)
+                timestamps, values = [], []
+            key = sample_key
+            timestamps.append(timestamp)
+            values.append(value)
+        if timestamps:
+            flush(key, timestamps, values)
+
+        index = zlib.compress(json.dumps([list(vars(block).values()) for block in blocks]).encode())
+        offset = f.tell()
+        f.write(index)
+        f.write(FOOTER.pack(offset, len(index), MAGIC))
+        f.flush()
+        os.fsync(f.fileno())
+        size = f.tell()
+    os.replace(partial, path)
+    return {"samples": sum(block.count for block in blocks), "blocks": len(blocks), "bytes": size}
+
+
+class Segment:
+    """A memory-mapped segment file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self.inode = os.fstat(f.fileno()).st_ino
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        offset, length, magic = FOOTER.unpack_from(self.map, len(self.map) - FOOTER.size)
+        if magic != MAGIC or self.map[:len(MAGIC)] != MAGIC:
+            self.map.close()
+            raise ValueError(f"{path} is not an archive segment")
+        self.blocks = [Block(*entry) for entry in json.loads(zlib.decompress(self.map[offset:offset + length]))]
+
+    @property
+    def first(self) -> Optional[int]:
+        return min((block.first for block in self.blocks), default=None)
+
+    @property
+    def last(self) -> Optional[int]:
+        return max((block.last for block in self.blocks), default=None)
+
+    def samples(
+        self,
+        sensor_types: Optional[Iterable[str]] = None,
+        sensor_ids: Optional[Iterable[str]] = None,
+        start: Optional[int] = None,
+        end: Optional[int] = None
+    ) -> Iterator[Sample]:
+        """Samples with start <= timestamp < end, block by block (by sensor, then time)"""
+        for block in self._matching(sensor_types, sensor_ids, start, end):
+            yield from self._decode(block, start, end)
+
+    def ordered(
+        self,
+        sensor_types: Optional[Iterable[str]] = None,
+        sensor_ids: Optional[Iterable[str]] = None,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        reverse: bool = False
+    ) -> Iterator[Sample]:
+        """Like samples(), in time order (newest first if `reverse`), decoding blocks only as they are reached"""
+        chains: Dict[tuple, List[Block]] = {}
+        for block in self._matching(sensor_types, sensor_ids, start, end):
+            chains.setdefault((block.sensor_type, block.sensor_id, block.unit), []).append(block)
+
+        def chain(blocks: List[Block]) -> Iterator[Sample]:
+            # A sensor's blocks are written in time order
+            for block in reversed(blocks) if reverse else blocks:
+                decoded = self._decode(block, start, end)
+                yield from reversed(list(decoded)) if reverse else decoded
+
+        return heapq.merge(*map(chain, chains.values()), key=lambda sample: sample[0], reverse=reverse)
+
+    def _matching(
+        self,
+        sensor_types: Optional[Iterable[str]],
+        sensor_ids: Optional[Iterable[str]],
+        start: Optional[int],
+        end: Optional[int]
+    ) -> List[Block]:
+        sensor_types = set(sensor_types) if sensor_types is not None else None
+        sensor_ids = set(sensor_ids) if sensor_ids is not None else None
+        return [
+            block for block in self.blocks
+            if (sensor_types is None or block.sensor_type in sensor_types)
+            and (sensor_ids is None or block.sensor_id in sensor_ids)
+            and (start is None or block.last >= start) and (end is None or block.first < end)
+        ]
+
+    def _decode(self, block: Block, start: Optional[int], end: Optional[int]) -> Iterator[Sample]:
+        timestamps, values = decode_block(self.map[block.offset:block.offset + block.length], block.count)
+        for timestamp, value in zip(timestamps, values):
+            if (start is None or timestamp >= start) and (end is None or timestamp < end):
+                yield timestamp, block.sensor_type, block.sensor_id, value, block.unit
+
+    def close(self):
+        self.map.close()
+
+
+_segments: Dict[str, Segment] = {}
+
+
+def open_segment(path: str) -> Segment:
+    """Cached Segment for a path (reopened if the file was replaced)"""
+    segment = _segments.get(path)
+    if segment is not None and os.stat(path).st_ino != segment.inode:
+        segment.close()
+        segment = None
+    if segment is None:
+        segment = _segments[path] = Segment(path)
+    return segment
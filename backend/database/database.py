@@ -1,25 +1,137 @@
 """
 Database initialization and session management
+
+SQLite storage profile for SD-card Pis (DB_* settings):
+
+- WAL journal: readers never block the data logger's commits and the logger
+  never blocks readers; synchronous=NORMAL drops the fsync per commit
+  (a power cut can lose the last commits, not corrupt the database)
+- one writer connection (AsyncSessionLocal) and a pool of read-only
+  connections (ReadSessionLocal) for history and settings reads
+- checkpoints run from a background task instead of inside whichever
+  commit happens to cross the WAL size limit
+- page cache, memory-mapped reads and in-memory temp storage per connection
 """
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+import asyncio
+import logging
+import os
+import sqlite3
+import time
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import event, inspect
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from config import settings
-import logging
+from services.metrics import metrics
 
 logger = logging.getLogger(__name__)
 
-# Create async engine
-engine = create_async_engine(
-    settings.DATABASE_URL,
-    echo=settings.DEBUG,
+CHECKPOINT_SECONDS = metrics.histogram(
+    "boatmonitor_db_checkpoint_seconds", "WAL checkpoint duration", ("mode",)
 )
+WAL_BYTES = metrics.gauge("boatmonitor_db_wal_bytes", "Size of the SQLite write-ahead log")
+
+
+def database_file(url: str) -> Optional[str]:
+    """File path of a SQLite database URL (None for other databases or in-memory)"""
+    parsed = make_url(url)
+    if not parsed.drivername.startswith("sqlite") or parsed.database in (None, "", ":memory:"):
+        return None
+    return parsed.database
+
+
+def sqlite_pragmas(read_only: bool = False) -> List[str]:
+    """PRAGMA statements for a new SQLite connection, from the DB_* settings"""
+    pragmas = [
+        f"PRAGMA busy_timeout = {int(settings.DB_BUSY_TIMEOUT * 1000)}",
+        f"PRAGMA cache_size = -{settings.DB_CACHE_SIZE_KB}",
+        f"PRAGMA mmap_size = {settings.DB_MMAP_SIZE_MB * 1024 * 1024}",
+        f"PRAGMA temp_store = {settings.DB_TEMP_STORE}",
+    ]
+    if read_only:
+        pragmas.append("PRAGMA query_only = ON")
+    else:
+        # The journal mode is stored in the file; only the writer sets it
+        pragmas += [
+            f"PRAGMA journal_mode = {settings.DB_JOURNAL_MODE}",
+            f"PRAGMA synchronous = {settings.DB_SYNCHRONOUS}",
+            f"PRAGMA wal_autocheckpoint = {settings.DB_WAL_AUTOCHECKPOINT}",
+        ]
+    return pragmas
+
+
+def _apply_pragmas(engine: AsyncEngine, read_only: bool):
+    pragmas = sqlite_pragmas(read_only)
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def configure(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
 
-# Create session factory
+
+def create_write_engine(url: str) -> AsyncEngine:
+    """Engine with a single connection: SQLite has one writer at a time anyway"""
+    if database_file(url) is None:
+        return create_async_engine(url, echo=False)
+    # aiosqlite would otherwise open a new connection per session (NullPool)
+    write_engine = create_async_engine(
+        url, echo=False, poolclass=AsyncAdaptedQueuePool, pool_size=1, max_overflow=0
+    )
+    _apply_pragmas(write_engine, read_only=False)
+    _explicit_transactions(write_engine)
+    return write_engine
+
+
+def _explicit_transactions(engine: AsyncEngine):
+    """
+    Let SQLAlchemy issue BEGIN itself so savepoints work (the db writer runs
+    each operation in one); IMMEDIATE takes the write lock up front instead
+    of failing to upgrade a read transaction later.
+    """
+    @event.listens_for(engine.sync_engine, "connect")
+    def disable_driver_transactions(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine.sync_engine, "begin")
+    def begin_immediate(conn):
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+def create_read_engine(url: str) -> Optional[AsyncEngine]:
+    """Pool of read-only connections (None if the database is not a SQLite file)"""
+    path = database_file(url)
+    if path is None or settings.DB_READ_POOL_SIZE <= 0:
+        return None
+    read_url = f"{make_url(url).drivername}:///file:{path}?mode=ro&uri=true"
+    read_engine = create_async_engine(
+        read_url, echo=False, poolclass=AsyncAdaptedQueuePool,
+        pool_size=settings.DB_READ_POOL_SIZE, max_overflow=0
+    )
+    _apply_pragmas(read_engine, read_only=True)
+    return read_engine
+
+
+# SQL logging is enabled via SQL_ECHO in services/log_pipeline.py
+engine = create_write_engine(settings.DATABASE_URL)
+read_engine = create_read_engine(settings.DATABASE_URL)
+
+# Create session factories: writes (and reads that must see them) go through
+# AsyncSessionLocal, plain reads through ReadSessionLocal
 AsyncSessionLocal = async_sessionmaker(
     engine,
     class_=AsyncSession,
     expire_on_commit=False,
 )
+ReadSessionLocal = async_sessionmaker(
+    read_engine or engine,
+    class_=AsyncSession,
+    expire_on_commit=False,
+)
 
 
 class Base(DeclarativeBase):
@@ -32,7 +144,118 @@ async def init_database():
     logger.info("Initializing database...")
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
-    logger.info("Database initialized successfully")
+        await conn.run_sync(_add_missing_columns)
+    logger.info(f"Database initialized successfully ({settings.DB_JOURNAL_MODE} journal)")
+
+
+def _add_missing_columns(connection):
+    """Add columns the models gained since a table was created (create_all only creates missing tables)"""
+    inspector = inspect(connection)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                column_type = column.type.compile(connection.dialect)
+                connection.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}")
+                logger.info(f"Added column {table.name}.{column.name}")
+
+
+def wal_size() -> int:
+    """Bytes in the write-ahead log (0 when there is none)"""
+    path = database_file(settings.DATABASE_URL)
+    wal = f"{path}-wal"
+    return os.path.getsize(wal) if path and os.path.exists(wal) else 0
+
+
+WAL_BYTES.set_function(wal_size)
+
+
+async def checkpoint(mode: str = "PASSIVE", path: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Copy the WAL back into the database file (or the partition file at `path`).
+
+    PASSIVE never waits for (or blocks) readers and the writer; FULL and
+    TRUNCATE (used at shutdown) wait for them, and TRUNCATE also empties
+    the WAL file. Runs on its own connection in a thread. Returns None when
+    not in WAL mode.
+    """
+    path = path or database_file(settings.DATABASE_URL)
+    if path is None or settings.DB_JOURNAL_MODE.upper() != "WAL":
+        return None
+
+    def run():
+        db = sqlite3.connect(path, timeout=settings.DB_BUSY_TIMEOUT)
+        try:
+            return db.execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+        finally:
+            db.close()
+
+    started = time.perf_counter()
+    busy, wal_pages, checkpointed = await asyncio.to_thread(run)
+    CHECKPOINT_SECONDS.labels(mode).since(started)
+    return {"busy": bool(busy), "wal_pages": wal_pages, "checkpointed_pages": checkpointed}
+
+
+class WalCheckpointer:
+    """Checkpoints the WAL periodically (supervised background task)"""
+
+    def __init__(self, interval: Optional[float] = None):
+        self.interval = settings.DB_CHECKPOINT_INTERVAL if interval is None else interval
+        self.running = False
+        self.last_result: Optional[Dict[str, Any]] = None
+        self._wake = asyncio.Event()
+
+    async def start(self):
+        if settings.DB_JOURNAL_MODE.upper() != "WAL" or database_file(settings.DATABASE_URL) is None:
+            return
+        self.running = True
+        self._wake.clear()
+        while self.running:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            if not self.running:
+                break
+            self.last_result = await checkpoint()
+            if self.last_result["busy"]:
+                logger.debug(f"Partial WAL checkpoint: {self.last_result}")
+
+    async def stop(self):
+        self.running = False
+        self._wake.set()
+
+
+async def close_database():
+    """Final checkpoint (so the WAL is empty) and close all connections"""
+    if read_engine is not None:
+        await read_engine.dispose()
+    await engine.dispose()
+    try:
+        await checkpoint("TRUNCATE")
+    except sqlite3.Error as e:
+        logger.warning(f"Final WAL checkpoint failed: {e}")
+
+
+def database_status() -> Dict[str, Any]:
+    """Storage profile and WAL size for /api/health"""
+    return {
+        "journal_mode": settings.DB_JOURNAL_MODE,
+        "read_pool": settings.DB_READ_POOL_SIZE if read_engine is not None else 0,
+        "wal_bytes": wal_size(),
+    }
+
+
+async def run_read(function, *args):
+    """
+    Run `function(dbapi_connection, *args)` on a read connection: for raw
+    SQL that attaches history partitions (see database/partitions.py), which
+    can't happen inside a session's transaction.
+    """
+    async with (read_engine or engine).connect() as connection:
+        return await connection.run_sync(lambda sync: function(sync.connection.dbapi_connection, *args))
 
 
 async def get_db():
@@ -63,6 +63,7 @@ class SystemSettings(Base):
     id = Column(Integer, primary_key=True, index=True)
     key = Column(String, unique=True, index=True)
     value = Column(JSON)
+    description = Column(String)
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
 
@@ -79,3 +80,55 @@ class WidgetLayout(Base):
     width = Column(Integer, default=1)
     height = Column(Integer, default=1)
     config = Column(JSON)  # Widget-specific configuration
+
+
+class Job(Base):
+    """Background job (export, backup, report) queued for the job workers"""
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    job_type = Column(String, index=True)
+    params = Column(JSON)
+    params_hash = Column(String, index=True)  # Identical requests share a result
+    priority = Column(Integer, default=0)  # Higher runs first
+    status = Column(String, index=True)  # queued, running, succeeded, failed, cancelled
+    progress = Column(Float, default=0.0)  # 0 - 1
+    message = Column(String)
+    result = Column(JSON)
+    error = Column(String)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True))
+    finished_at = Column(DateTime(timezone=True))
+
+
+class HistoryPartition(Base):
+    """Catalog of the monthly history files (see database/partitions.py)"""
+    __tablename__ = "history_partitions"
+
+    name = Column(String, primary_key=True)  # "2026-10"
+    path = Column(String)
+    start = Column(DateTime(timezone=True), index=True)  # First instant of the month
+    end = Column(DateTime(timezone=True), index=True)  # First instant of the next month
+    status = Column(String, index=True)  # active, archived, dropped
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    retired_at = Column(DateTime(timezone=True))
+
+
+class ArchiveSegment(Base):
+    """Sealed months whose sensor readings moved to an archive segment (see database/archive.py)"""
+    __tablename__ = "archive_segments"
+
+    name = Column(String, primary_key=True)  # Partition name, "2026-10"
+    path = Column(String)
+    last_id = Column(Integer)  # Highest sensor_readings id in the segment; later rows stay in the partition
+    samples = Column(Integer)
+    bytes = Column(Integer)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class StagingMark(Base):
+    """Highest staged sample merged into this database file (see services/staging.py)"""
+    __tablename__ = "staging_marks"
+
+    id = Column(Integer, primary_key=True)  # One row, id 1
+    seq = Column(Integer)
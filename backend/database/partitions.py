@@ -0,0 +1,243 @@
+"""
+History partitions - readings in one SQLite file per month
+
+With DB_PARTITIONING on, `sensor_readings` and `victron_readings` rows are
+written to DB_PARTITION_DIR/history-YYYY-MM.db instead of the main database,
+which keeps the catalog (`history_partitions`), settings and jobs. Dropping
+a month is deleting (or archiving) one file, and the month being written
+stays small enough to stay in the page cache.
+
+Readers attach only the partitions overlapping their time range. SQLite
+attaches at most 10 databases per connection, so a range is split into
+groups of up to ATTACH_LIMIT consecutive months; each group is read through
+`group.table("sensor_readings")`, a UNION ALL of the group's partitions and
+the rows of the group's time span still in the main database (history from
+before partitioning was enabled):
+
+    for group in history_groups(db, start, end):
+        with attached(db, group):
+            db.execute(f"SELECT ... FROM {group.table('sensor_readings')} WHERE ...")
+
+Months sealed into archive segments (database/archive.py) keep their
+`victron_readings` here, but their sensor readings are read with
+`group.archived(...)` instead: `group.table("sensor_readings")` only takes
+the rows of a sealed partition written after it was sealed (late samples,
+ids above the segment's `last_id`).
+
+Without partitions there is one group and `group.table(name)` is just `name`.
+Works on any DB-API connection to the main database (sqlite3 in the analytics
+workers, the aiosqlite adapter through database.run_read()).
+"""
+import logging
+import os
+import sqlite3
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import MetaData, Table
+
+from config import settings
+from database.archive import from_micros, open_segment, to_micros
+
+logger = logging.getLogger(__name__)
+
+ACTIVE = "active"
+ARCHIVED = "archived"
+DROPPED = "dropped"
+
+HISTORY_TABLES = ("sensor_readings", "victron_readings")
+ATTACH_LIMIT = 8  # Partitions per group (SQLite's limit is 10 attached databases)
+
+# Same text format SQLAlchemy uses for DateTime columns on SQLite
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+_tables: Dict[Tuple[str, str], Table] = {}
+
+
+def partition_name(timestamp: datetime) -> str:
+    """Partition a timestamp belongs to ("2026-10")"""
+    return timestamp.strftime("%Y-%m")
+
+
+def month_bounds(name: str) -> Tuple[datetime, datetime]:
+    """First instant of the partition's month and of the month after"""
+    start = datetime.strptime(name, "%Y-%m")
+    return start, add_months(start, 1)
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    """First instant of the month `months` after (or before) `month`"""
+    index = month.year * 12 + month.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def schema_name(name: str) -> str:
+    """Name a partition is attached under"""
+    return "h_" + name.replace("-", "_")
+
+
+def partition_path(name: str) -> str:
+    return os.path.abspath(os.path.join(settings.DB_PARTITION_DIR, f"history-{name}.db"))
+
+
+def segment_path(name: str) -> str:
+    return os.path.abspath(os.path.join(settings.DB_PARTITION_DIR, f"history-{name}.seg"))
+
+
+def partition_table(table: Table, name: Optional[str]) -> Table:
+    """`table` in an attached partition (or itself for the main database), for Core inserts"""
+    if name is None:
+        return table
+    key = (table.name, name)
+    if key not in _tables:
+        _tables[key] = table.to_metadata(MetaData(), schema=schema_name(name))
+    return _tables[key]
+
+
+def _literal(timestamp: datetime) -> str:
+    return f"'{timestamp.strftime(TIMESTAMP_FORMAT)}'"
+
+
+@dataclass
+class HistoryGroup:
+    """Consecutive partitions read together, plus the main database's rows in the same span"""
+    start: Optional[datetime] = None  # None = open (oldest group)
+    end: Optional[datetime] = None  # None = open (newest group)
+    partitions: List[Tuple[str, str]] = field(default_factory=list)  # (name, path)
+    segments: List[Tuple[str, str]] = field(default_factory=list)  # (name, path) of the sealed ones
+    sealed_through: Dict[str, int] = field(default_factory=dict)  # Sealed name -> last sensor_readings id in its segment
+
+    def arms(self, table: str) -> List[str]:
+        """FROM-able sources of `table` in this group (one per database)"""
+        if not self.partitions:
+            return [table]
+        bounds = []
+        if self.start:
+            bounds.append(f"timestamp >= {_literal(self.start)}")
+        if self.end:
+            bounds.append(f"timestamp < {_literal(self.end)}")
+        main = f"main.{table}"
+        if bounds:
+            main = f"(SELECT * FROM main.{table} WHERE {' AND '.join(bounds)})"
+        arms = [main]
+        for name, _ in self.partitions:
+            arm = f"{schema_name(name)}.{table}"
+            if table == "sensor_readings" and name in self.sealed_through:
+                arm = f"(SELECT * FROM {arm} WHERE id > {self.sealed_through[name]})"
+            arms.append(arm)
+        return arms
+
+    def table(self, table: str) -> str:
+        """FROM-able union of `table` over the group"""
+        arms = self.arms(table)
+        if len(arms) == 1:
+            return arms[0]
+        return "(" + " UNION ALL ".join(f"SELECT * FROM {arm}" for arm in arms) + ")"
+
+    def archived(
+        self,
+        sensor_types: Optional[Iterable[str]] = None,
+        sensor_ids: Optional[Iterable[str]] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> List[tuple]:
+        """
+        Sensor readings of the group's sealed months with start <= timestamp < end,
+        as (timestamp, sensor_type, sensor_id, value, unit) rows in time order
+        """
+        rows = []
+        for _, path in self.segments:
+            samples = open_segment(path).samples(
+                sensor_types, sensor_ids,
+                to_micros(start) if start else None, to_micros(end) if end else None
+            )
+            rows.extend(
+                (from_micros(timestamp).strftime(TIMESTAMP_FORMAT), sensor_type, sensor_id, value, unit)
+                for timestamp, sensor_type, sensor_id, value, unit in samples
+            )
+        rows.sort(key=lambda row: row[0])
+        return rows
+
+
+def plan_groups(
+    catalog: List[Tuple[str, str]],
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    newest_first: bool = False,
+    sealed: Optional[Dict[str, Tuple[str, int]]] = None
+) -> List[HistoryGroup]:
+    """Split the partitions (name, path) overlapping [start, end] into groups (`sealed`: see sealed_segments())"""
+    overlapping = []
+    for name, path in sorted(catalog):
+        month_start, month_end = month_bounds(name)
+        if (end is None or month_start <= end) and (start is None or month_end > start):
+            overlapping.append((name, path))
+    if not overlapping:
+        return [HistoryGroup()]
+
+    chunks = [overlapping[i:i + ATTACH_LIMIT] for i in range(0, len(overlapping), ATTACH_LIMIT)]
+    groups = []
+    for i, chunk in enumerate(chunks):
+        # Groups meet at partition boundaries; the outer ones stay open for main database rows
+        group_start = month_bounds(chunk[0][0])[0] if i > 0 else None
+        group_end = month_bounds(chunks[i + 1][0][0])[0] if i + 1 < len(chunks) else None
+        sealed_names = [name for name, _ in chunk if sealed and name in sealed]
+        segments = [(name, sealed[name][0]) for name in sealed_names]
+        sealed_through = {name: sealed[name][1] for name in sealed_names}
+        groups.append(HistoryGroup(group_start, group_end, chunk, segments, sealed_through))
+    return groups[::-1] if newest_first else groups
+
+
+def active_partitions(db) -> List[Tuple[str, str]]:
+    """(name, path) of the active partitions in the catalog (none if the table doesn't exist)"""
+    cursor = db.cursor()
+    try:
+        cursor.execute("SELECT name, path FROM history_partitions WHERE status = ?", [ACTIVE])
+        return cursor.fetchall()
+    except sqlite3.OperationalError:
+        return []  # Database from before partitioning (benchmark datasets, replay sources)
+    finally:
+        cursor.close()
+
+
+def sealed_segments(db) -> Dict[str, Tuple[str, int]]:
+    """(segment path, last sealed row id) of each sealed month (none if the table doesn't exist)"""
+    cursor = db.cursor()
+    try:
+        cursor.execute("SELECT name, path, last_id FROM archive_segments")
+        return {name: (path, last_id or 0) for name, path, last_id in cursor.fetchall()}
+    except sqlite3.OperationalError:
+        return {}
+    finally:
+        cursor.close()
+
+
+def history_groups(
+    db,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    newest_first: bool = False
+) -> List[HistoryGroup]:
+    """Groups to read for [start, end], oldest first unless `newest_first`"""
+    return plan_groups(active_partitions(db), start, end, newest_first, sealed_segments(db))
+
+
+@contextmanager
+def attached(db, group: HistoryGroup) -> Iterator[HistoryGroup]:
+    """Attach the group's partitions to `db` for the duration of the block"""
+    cursor = db.cursor()
+    names = []
+    try:
+        for name, path in group.partitions:
+            if not os.path.exists(path):
+                # Attaching would create an empty file
+                raise sqlite3.OperationalError(f"History partition {name} is missing ({path})")
+            cursor.execute(f"ATTACH DATABASE ? AS {schema_name(name)}", [path])
+            names.append(name)
+        yield group
+    finally:
+        for name in names:
+            cursor.execute(f"DETACH DATABASE {schema_name(name)}")
+        cursor.close()
@@ -0,0 +1,251 @@
+"""
+Calibration engine - turns stored calibration parameters into converter functions
+
+Calibration parameters are compiled once (when loaded or saved) into plain
+functions raw -> engineering value, so the acquisition path never touches
+the database or re-parses parameters per sample.
+
+Supported parameter formats (per sensor):
+    {"min": 0, "max": 4095, "offset": 0, "scale": 1}      ADC range -> 0-100 %
+    {"offset": 0, "scale": 1}                             linear
+    {"pulses_per_rev": 1.0}                               frequency (Hz) -> RPM
+    {"type": "lookup_table", "points": [[raw, value], ...]}
+    {"type": "polynomial", "coefficients": [c0, c1, c2, ...]}
+"""
+from bisect import bisect_right
+from typing import Any, Callable, Dict, List, Optional, Sequence
+import logging
+
+from sqlalchemy import select
+from database.database import ReadSessionLocal
+from database.models import SensorCalibration, SystemSettings
+from .sensor_registry import sensor_registry
+
+logger = logging.getLogger(__name__)
+
+Converter = Callable[[float], float]
+
+# Defaults come from each sensor's "calibration" entry in sensors.json
+DEFAULT_CALIBRATION = sensor_registry.default_calibration()
+
+
+def _identity(raw: float) -> float:
+    return raw
+
+
+def compile_linear(scale: float = 1.0, offset: float = 0.0) -> Converter:
+    """value = raw * scale + offset"""
+    scale = float(scale)
+    offset = float(offset)
+    if scale == 1.0 and offset == 0.0:
+        return _identity
+
+    def convert(raw: float) -> float:
+        return raw * scale + offset
+    return convert
+
+
+def compile_range(min_raw: float, max_raw: float, scale: float = 1.0, offset: float = 0.0) -> Converter:
+    """Map an ADC range onto 0-100 %, then apply scale/offset and clamp"""
+    min_raw = float(min_raw)
+    span = float(max_raw) - min_raw
+    if span == 0:
+        raise ValueError("Calibration min and max must differ")
+    factor = 100.0 * float(scale) / span
+    offset = float(offset)
+
+    def convert(raw: float) -> float:
+        value = (raw - min_raw) * factor + offset
+        if value < 0.0:
+            return 0.0
+        if value > 100.0:
+            return 100.0
+        return value
+    return convert
+
+
+def compile_frequency(pulses_per_rev: float = 1.0) -> Converter:
+    """Frequency in Hz -> RPM"""
+    pulses_per_rev = float(pulses_per_rev)
+    if pulses_per_rev <= 0:
+        raise ValueError("pulses_per_rev must be > 0")
+    factor = 60.0 / pulses_per_rev
+
+    def convert(hz: float) -> float:
+        return hz * factor
+    return convert
+
+
+def compile_lookup_table(points: Sequence[Sequence[float]]) -> Converter:
+    """
+    Piecewise-linear interpolation over (raw, value) points, e.g. a tank
+    sender's resistance curve. Segment slopes are precomputed, so each
+    conversion is one binary search and one multiply-add. Inputs outside
+    the table are clamped to the end points.
+    """
+    ordered = sorted((float(x), float(y)) for x, y in points)
+    if len(ordered) < 2:
+        raise ValueError("Lookup table needs at least two points")
+
+    xs = [x for x, _ in ordered]
+    ys = [y for _, y in ordered]
+    if len(set(xs)) != len(xs):
+        raise ValueError("Lookup table raw values must be unique")
+
+    slopes = [(ys[i + 1] - ys[i]) / (xs[i + 1] - xs[i]) for i in range(len(xs) - 1)]
+    first_x, last_x = xs[0], xs[-1]
+    first_y, last_y = ys[0], ys[-1]
+    last_segment = len(slopes) - 1
+
+    def convert(raw: float) -> float:
+        if raw <= first_x:
+            return first_y
+        if raw >= last_x:
+            return last_y
+        i = bisect_right(xs, raw) - 1
+        if i > last_segment:
+            i = last_segment
+        return ys[i] + (raw - xs[i]) * slopes[i]
+    return convert
+
+
+def compile_polynomial(coefficients: Sequence[float]) -> Converter:
+    """Polynomial c0 + c1*x + c2*x^2 + ..., evaluated with Horner's method"""
+    if not coefficients:
+        raise ValueError("Polynomial needs at least one coefficient")
+    # Horner runs from the highest order term down
+    reversed_coefficients = tuple(float(c) for c in reversed(coefficients))
+    lead, rest = reversed_coefficients[0], reversed_coefficients[1:]
+
+    def convert(raw: float) -> float:
+        value = lead
+        for c in rest:
+            value = value * raw + c
+        return value
+    return convert
+
+
+def compile_calibration(params: Dict[str, Any]) -> Converter:
+    """Compile one sensor's calibration parameters into a converter"""
+    calibration_type = params.get("type")
+
+    if calibration_type == "lookup_table":
+        return compile_lookup_table(params["points"])
+    if calibration_type == "polynomial":
+        return compile_polynomial(params["coefficients"])
+    if calibration_type == "frequency" or "pulses_per_rev" in params:
+        return compile_frequency(params.get("pulses_per_rev", 1.0))
+    if "min" in params and "max" in params:
+        return compile_range(params["min"], params["max"], params.get("scale", 1), params.get("offset", 0))
+    if calibration_type in (None, "linear"):
+        return compile_linear(params.get("scale", 1), params.get("offset", 0))
+
+    raise ValueError(f"Unknown calibration type: {calibration_type}")
+
+
+def compile_inverse(params: Dict[str, Any]) -> Converter:
+    """
+    Compile the inverse of a sensor's calibration: engineering value -> raw
+    (for emulated boards, which have to serve raw readings). Lookup tables
+    must be monotonic; polynomials above first order aren't supported.
+    """
+    calibration_type = params.get("type")
+
+    if calibration_type == "lookup_table":
+        ordered = sorted((float(y), float(x)) for x, y in params["points"])
+        values = [y for y, _ in ordered]
+        raws = [x for _, x in ordered]
+        if values != sorted(set(values)) or (raws != sorted(raws) and raws != sorted(raws, reverse=True)):
+            raise ValueError("Only a monotonic lookup table can be inverted")
+        return compile_lookup_table([(y, x) for y, x in ordered])
+    if calibration_type == "polynomial":
+        coefficients = [float(c) for c in params["coefficients"]] + [0.0]
+        if any(coefficients[2:]) or not coefficients[1]:
+            raise ValueError("Only a first order polynomial can be inverted")
+        return compile_linear(1 / coefficients[1], -coefficients[0] / coefficients[1])
+    if calibration_type == "frequency" or "pulses_per_rev" in params:
+        return compile_linear(float(params.get("pulses_per_rev", 1.0)) / 60.0)
+    if "min" in params and "max" in params:
+        span = float(params["max"]) - float(params["min"])
+        factor = span / (100.0 * float(params.get("scale", 1)))
+        return compile_linear(factor, float(params["min"]) - float(params.get("offset", 0)) * factor)
+    if calibration_type in (None, "linear"):
+        scale = float(params.get("scale", 1))
+        if not scale:
+            raise ValueError("A zero scale can't be inverted")
+        return compile_linear(1 / scale, -float(params.get("offset", 0)) / scale)
+
+    raise ValueError(f"Unknown calibration type: {calibration_type}")
+
+
+class CalibrationEngine:
+    """Holds the compiled converter for every calibrated sensor"""
+
+    def __init__(self, defaults: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.defaults = DEFAULT_CALIBRATION if defaults is None else defaults
+        self.parameters: Dict[str, Dict[str, Any]] = {}
+        self._converters: Dict[str, Converter] = {}
+        self.update(self.defaults)
+
+    async def load(self) -> Dict[str, Dict[str, Any]]:
+        """Load calibration from the database (at startup and after changes); returns what was applied"""
+        calibration = dict(self.defaults)
+        try:
+            async with ReadSessionLocal() as session:
+                result = await session.execute(
+                    select(SystemSettings).where(SystemSettings.key == "sensor_calibration")
+                )
+                setting = result.scalar_one_or_none()
+                if setting and setting.value:
+                    calibration.update(setting.value)
+
+                # Per-sensor rows (linear, lookup_table, polynomial) take precedence
+                result = await session.execute(select(SensorCalibration))
+                for row in result.scalars().all():
+                    calibration[row.sensor_id] = {
+                        "type": row.calibration_type,
+                        **(row.calibration_data or {})
+                    }
+        except Exception as e:
+            logger.error(f"Error loading calibration, using defaults: {e}", exc_info=True)
+
+        self.update(calibration)
+        return calibration
+
+    def update(self, calibration: Dict[str, Dict[str, Any]]):
+        """
+        Compile and hot-swap converters for the given sensors.
+
+        Everything is compiled before anything is swapped, and the converter
+        table is replaced in one assignment, so the poll loop never sees a
+        half-applied calibration. Sensors with invalid parameters keep their
+        previous converter.
+        """
+        converters = dict(self._converters)
+        parameters = dict(self.parameters)
+
+        for sensor_id, params in calibration.items():
+            if not isinstance(params, dict):
+                continue
+            try:
+                converters[sensor_id] = compile_calibration(params)
+                parameters[sensor_id] = params
+            except (KeyError, TypeError, ValueError) as e:
+                logger.error(f"Invalid calibration for {sensor_id}, keeping previous: {e}")
+
+        self.parameters = parameters
+        self._converters = converters
+        logger.info(f"Calibration compiled for {len(converters)} sensors")
+
+    def get_converter(self, sensor_id: str) -> Converter:
+        """Get the converter for a sensor (identity if uncalibrated)"""
+        return self._converters.get(sensor_id, _identity)
+
+    def convert(self, sensor_id: str, raw: float) -> float:
+        """Convert a raw reading to engineering units"""
+        return self._converters.get(sensor_id, _identity)(raw)
+
+    def convert_batch(self, sensor_id: str, values: List[float]) -> List[float]:
+        """Convert a buffer of raw readings"""
+        convert = self.get_converter(sensor_id)
+        return [convert(v) for v in values]
@@ -0,0 +1,395 @@
+"""
+Automation 2040W firmware emulator
+
+Serves the wireless firmware's HTTP routes (/health, /sensors, /analog/N,
+/digital/N, /frequency/N, /relay/N) from asyncio so WirelessBoard, the
+sensor manager and the relay manager can be exercised without hardware.
+Dozens of emulated boards can run on consecutive localhost ports.
+
+Network faults are injected per request:
+    latency / jitter   delay before responding (seconds)
+    loss               probability a request is dropped (connection closed, no response)
+    stall_rate         probability a request starts a stall; the board then
+                       answers nothing for stall_duration seconds (WiFi dropout)
+    keep_alive         False (default) mimics the firmware: one request per
+                       connection, "Connection: close"
+
+Like the firmware, each board handles one request at a time.
+
+Run from backend/:
+    python -m hardware.emulator --count 24 --base-port 8100 --latency 0.02 --loss 0.01
+    python -m hardware.emulator --count 4 --print-config   # boards.json entries
+"""
+import argparse
+import asyncio
+import json
+import logging
+import random
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from .calibration import compile_inverse
+from .sensor_registry import sensor_registry
+
+logger = logging.getLogger(__name__)
+
+# Fallback channel mapping, same as the firmware's SENSOR_CHANNELS
+DEFAULT_CHANNELS = {
+    "engine_rpm": {"type": "frequency", "channel": 1},
+    "oil_pressure": {"type": "analog", "channel": 1},
+    "coolant_temp": {"type": "analog", "channel": 2},
+    "fuel_tank": {"type": "analog", "channel": 3},
+}
+INPUT_TYPES = ("analog", "digital", "frequency")
+MAX_CHANNEL = 8
+MAX_REQUEST_SIZE = 8192
+
+
+class _Drop(Exception):
+    """Close the connection without answering"""
+
+
+class EmulatedBoard:
+    """One emulated Automation 2040W running the wireless firmware"""
+
+    def __init__(
+        self,
+        board_id: str,
+        board_name: Optional[str] = None,
+        host: str = "127.0.0.1",
+        port: int = 8100,
+        channels: Optional[Dict[str, Dict[str, Any]]] = None,
+        relay_count: int = 3,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        loss: float = 0.0,
+        stall_rate: float = 0.0,
+        stall_duration: float = 10.0,
+        keep_alive: bool = False,
+        seed: int = 1
+    ):
+        self.board_id = board_id
+        self.board_name = board_name or f"Emulated {board_id}"
+        self.host = host
+        self.port = port
+        self.channels = channels or sensor_registry.firmware_channels(board_id) or DEFAULT_CHANNELS
+        self.relays = {relay: False for relay in range(1, relay_count + 1)}
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.stall_rate = stall_rate
+        self.stall_duration = stall_duration
+        self.keep_alive = keep_alive
+
+        # Separate streams so fault injection doesn't change the sensor values
+        self._fault_rng = random.Random(f"{seed}:{board_id}:faults")
+        self._value_rng = random.Random(f"{seed}:{board_id}:values")
+        self._ranges = self._value_ranges()
+        self._values: Dict[Tuple[str, int], float] = {
+            key: (low + high) / 2 for key, (low, high) in self._ranges.items()
+        }
+        self._last_update = time.monotonic()
+        self._stalled_until = 0.0
+        self._lock = asyncio.Lock()
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._connections: Set[asyncio.Task] = set()
+
+        self.stats = {"requests": 0, "dropped": 0, "stalls": 0, "errors": 0}
+
+    @property
+    def address(self) -> str:
+        """Address as used by WirelessBoard's ip_address"""
+        return f"{self.host}:{self.port}"
+
+    def board_config(self) -> Dict[str, Any]:
+        """boards.json entry pointing at this emulator"""
+        return {
+            "board_id": self.board_id,
+            "board_name": self.board_name,
+            "connection_type": "wireless",
+            "ip_address": self.address,
+            "relays": {str(relay): f"Relay {relay}" for relay in self.relays},
+        }
+
+    async def start(self):
+        """Start listening"""
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        logger.info(f"Emulated board {self.board_id} listening on {self.address}")
+
+    async def stop(self):
+        """Stop listening"""
+        if self._server:
+            self._server.close()
+            # Requests held by a stall or latency would otherwise keep the server open
+            for task in list(self._connections):
+                task.cancel()
+            await self._server.wait_closed()
+            self._server = None
+
+    def _value_ranges(self) -> Dict[Tuple[str, int], Tuple[float, float]]:
+        """
+        Raw value range per (input type, channel): the sensors' simulation
+        ranges (engineering units) through the inverse of their calibration,
+        so the sensor manager's calibration turns them back into those ranges
+        """
+        ranges = {}
+        for sensor_id, mapping in self.channels.items():
+            definition = sensor_registry.get(sensor_id)
+            simulation = definition.simulation if definition else {}
+            low, high = float(simulation.get("min", 0.0)), float(simulation.get("max", 100.0))
+            if definition and definition.calibration:
+                try:
+                    to_raw = compile_inverse(definition.calibration)
+                    low, high = sorted((to_raw(low), to_raw(high)))
+                except (KeyError, TypeError, ValueError, ZeroDivisionError) as e:
+                    logger.warning(f"Serving {sensor_id} in engineering units, its calibration can't be inverted: {e}")
+            ranges[(mapping["type"], mapping["channel"])] = (low, high)
+        return ranges
+
+    def _read(self, input_type: str, channel: int) -> Any:
+        """Current raw value of an input (values wander slowly between reads)"""
+        if input_type not in INPUT_TYPES or not 1 <= channel <= MAX_CHANNEL:
+            raise ValueError(f"Invalid {input_type} channel {channel}")
+
+        now = time.monotonic()
+        dt = min(now - self._last_update, 10.0)
+        self._last_update = now
+        for key, (low, high) in self._ranges.items():
+            step = (high - low) * 0.02 * dt ** 0.5
+            value = self._values[key] + self._value_rng.gauss(0.0, step)
+            self._values[key] = min(max(value, low), high)
+
+        value = self._values.get((input_type, channel), 0.0)
+        if input_type == "digital":
+            return value > 0
+        return round(value, 3)
+
+    def _route(self, method: str, path: str, body: bytes) -> Tuple[int, Any]:
+        """Firmware request routing"""
+        if path == "/health":
+            return 200, {
+                "status": "ok",
+                "board_id": self.board_id,
+                "board_name": self.board_name,
+                "ip_address": self.host,
+                "sensors": list(self.channels),
+                "relays": list(self.relays),
+            }
+
+        if path == "/sensors":
+            return 200, {
+                sensor_id: self._read(mapping["type"], mapping["channel"])
+                for sensor_id, mapping in self.channels.items()
+            }
+
+        parts = path.strip("/").split("/")
+        if len(parts) != 2:
+            return 404, "Not Found"
+        route, index = parts[0], int(parts[1])
+
+        if route in INPUT_TYPES:
+            return 200, {"channel": index, "value": self._read(route, index)}
+
+        if route == "relay":
+            if index not in self.relays:
+                raise ValueError(f"Invalid relay {index}")
+            if method == "POST":
+                state = bool(json.loads(body or b"{}").get("state", False))
+                self.relays[index] = state
+                return 200, {"status": "ok", "relay": index, "state": state}
+            return 200, {"relay": index, "state": self.relays[index]}
+
+        return 404, "Not Found"
+
+    async def _inject_faults(self):
+        """Apply stall, loss and latency before a response"""
+        now = time.monotonic()
+        if now >= self._stalled_until and self.stall_rate and self._fault_rng.random() < self.stall_rate:
+            self._stalled_until = now + self.stall_duration
+            self.stats["stalls"] += 1
+        if now < self._stalled_until:
+            # Hold the request until the stall ends; clients normally time out first
+            await asyncio.sleep(self._stalled_until - now)
+
+        if self.loss and self._fault_rng.random() < self.loss:
+            raise _Drop()
+
+        delay = self.latency
+        if self.jitter:
+            delay += self._fault_rng.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        task = asyncio.current_task()
+        self._connections.add(task)
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                method, path, body = request
+
+                # The firmware serves one request at a time
+                async with self._lock:
+                    self.stats["requests"] += 1
+                    try:
+                        await self._inject_faults()
+                    except _Drop:
+                        self.stats["dropped"] += 1
+                        break
+
+                    try:
+                        status, payload = self._route(method, path, body)
+                    except Exception as e:
+                        logger.debug(f"Emulated board {self.board_id} error on {method} {path}: {e}")
+                        self.stats["errors"] += 1
+                        status, payload = 500, "Internal Server Error"
+
+                    writer.write(self._response(status, payload))
+                    await writer.drain()
+
+                if not self.keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.CancelledError):
+            pass
+        finally:
+            self._connections.discard(task)
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (ConnectionError, asyncio.CancelledError):
+                pass
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Tuple[str, str, bytes]]:
+        """Read one request; None when the client closed the connection"""
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError:
+            return None
+        if len(head) > MAX_REQUEST_SIZE:
+            return None
+
+        lines = head.decode("latin-1").split("\r\n")
+        request_line = lines[0].split(" ")
+        if len(request_line) < 2:
+            return None
+
+        content_length = 0
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            if name.strip().lower() == "content-length":
+                content_length = min(int(value.strip() or 0), MAX_REQUEST_SIZE)
+        body = await reader.readexactly(content_length) if content_length else b""
+        return request_line[0], request_line[1].split("?", 1)[0], body
+
+    def _response(self, status: int, payload: Any) -> bytes:
+        """Format a response the way the firmware's send_json / send_error do"""
+        if status == 200:
+            body = json.dumps(payload).encode()
+            content_type = "application/json"
+            reason = "OK"
+        else:
+            body = str(payload).encode()
+            content_type = "text/plain"
+            reason = str(payload)
+
+        headers = [
+            f"HTTP/1.1 {status} {reason}",
+            f"Content-Type: {content_type}",
+            f"Content-Length: {len(body)}",
+            "Connection: keep-alive" if self.keep_alive else "Connection: close",
+        ]
+        return ("\r\n".join(headers) + "\r\n\r\n").encode() + body
+
+
+class EmulatorCluster:
+    """A group of emulated boards on consecutive ports"""
+
+    BOARD_ID = "emu-board-{}"
+
+    def __init__(
+        self,
+        count: int,
+        base_port: int = 8100,
+        host: str = "127.0.0.1",
+        channel_maps: Optional[Dict[str, Dict[str, Dict[str, Any]]]] = None,
+        **options
+    ):
+        channel_maps = channel_maps or {}
+        self.boards = []
+        for i in range(count):
+            board_id = self.BOARD_ID.format(i + 1)
+            self.boards.append(EmulatedBoard(
+                board_id, host=host, port=base_port + i, channels=channel_maps.get(board_id), **options
+            ))
+
+    def board_config(self) -> List[Dict[str, Any]]:
+        """boards.json "boards" list for the cluster"""
+        return [board.board_config() for board in self.boards]
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Request and fault counters per board"""
+        return {board.board_id: dict(board.stats) for board in self.boards}
+
+    async def start(self):
+        await asyncio.gather(*(board.start() for board in self.boards))
+
+    async def stop(self):
+        await asyncio.gather(*(board.stop() for board in self.boards))
+
+    async def __aenter__(self) -> "EmulatorCluster":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Emulate Automation 2040W wireless boards")
+    parser.add_argument("--count", type=int, default=1, help="Number of boards")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--base-port", type=int, default=8100, help="Port of the first board")
+    parser.add_argument("--relays", type=int, default=3, help="Relays per board")
+    parser.add_argument("--latency", type=float, default=0.0, help="Response delay (s)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="+/- random delay (s)")
+    parser.add_argument("--loss", type=float, default=0.0, help="Probability a request is dropped")
+    parser.add_argument("--stall-rate", type=float, default=0.0, help="Probability a request starts a stall")
+    parser.add_argument("--stall-duration", type=float, default=10.0, help="Stall length (s)")
+    parser.add_argument("--keep-alive", action="store_true", help="Allow several requests per connection")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--print-config", action="store_true", help="Print boards.json entries and exit")
+    args = parser.parse_args()
+
+    cluster = EmulatorCluster(
+        args.count,
+        base_port=args.base_port,
+        host=args.host,
+        relay_count=args.relays,
+        latency=args.latency,
+        jitter=args.jitter,
+        loss=args.loss,
+        stall_rate=args.stall_rate,
+        stall_duration=args.stall_duration,
+        keep_alive=args.keep_alive,
+        seed=args.seed
+    )
+    if args.print_config:
+        print(json.dumps({"boards": cluster.board_config()}, indent=2))
+        return
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    async def run():
+        async with cluster:
+            await asyncio.Event().wait()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""
+Signal conditioning filters for raw sensor values
+
+Each filter keeps a small, fixed amount of state per sensor and is updated
+incrementally with every new sample. Filters are combined into a FilterChain
+which is built from the per-sensor "filters" list in the board configuration:
+
+    "fuel_tank": {"type": "analog", "channel": 1,
+                  "filters": [{"type": "median", "window": 5},
+                              {"type": "kalman", "process_variance": 0.01,
+                               "measurement_variance": 4.0}]}
+"""
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Any, Dict, List, Optional, Sequence
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class SignalFilter(ABC):
+    """Abstract base class for a single streaming filter stage"""
+
+    __slots__ = ()
+
+    @abstractmethod
+    def update(self, value: float, timestamp: float) -> float:
+        """Feed one sample and return the filtered value"""
+        pass
+
+    @abstractmethod
+    def reset(self):
+        """Forget all state (SensorManager calls it after a gap in the samples, e.g. a board dropout)"""
+        pass
+
+    @abstractmethod
+    def clone(self) -> "SignalFilter":
+        """Return a fresh filter with the same parameters and no state"""
+        pass
+
+    def process_batch(self, values: Sequence[float], timestamps: Sequence[float]) -> List[float]:
+        """Filter a whole buffer of samples in one pass"""
+        update = self.update
+        return [update(v, t) for v, t in zip(values, timestamps)]
+
+
+class EMAFilter(SignalFilter):
+    """Exponential moving average: y = y + alpha * (x - y)"""
+
+    __slots__ = ("alpha", "_value")
+
+    def __init__(self, alpha: float = 0.3):
+        if not 0 < alpha <= 1:
+            raise ValueError(f"EMA alpha must be in (0, 1], got {alpha}")
+        self.alpha = alpha
+        self._value: Optional[float] = None
+
+    def update(self, value: float, timestamp: float) -> float:
+        if self._value is None:
+            self._value = value
+        else:
+            self._value += self.alpha * (value - self._value)
+        return self._value
+
+    def reset(self):
+        self._value = None
+
+    def clone(self) -> "EMAFilter":
+        return EMAFilter(self.alpha)
+
+    def process_batch(self, values: Sequence[float], timestamps: Sequence[float]) -> List[float]:
+        alpha = self.alpha
+        y = self._value
+        out = []
+        append = out.append
+        for x in values:
+            y = x if y is None else y + alpha * (x - y)
+            append(y)
+        self._value = y
+        return out
+
+
+class MedianFilter(SignalFilter):
+    """Median of the last N samples - removes single-sample spikes"""
+
+    __slots__ = ("window", "_samples")
+
+    def __init__(self, window: int = 5):
+        if window < 1:
+            raise ValueError(f"Median window must be >= 1, got {window}")
+        self.window = int(window)
+        self._samples = deque(maxlen=self.window)
+
+    def update(self, value: float, timestamp: float) -> float:
+        self._samples.append(value)
+        ordered = sorted(self._samples)
+        mid = len(ordered) // 2
+        if len(ordered) % 2:
+            return ordered[mid]
+        return (ordered[mid - 1] + ordered[mid]) / 2
+
+    def reset(self):
+        self._samples.clear()
+
+    def clone(self) -> "MedianFilter":
+        return MedianFilter(self.window)
+
+
+class RateLimitFilter(SignalFilter):
+    """Limit how fast the output may change (units per second)"""
+
+    __slots__ = ("max_rate", "_value", "_timestamp")
+
+    def __init__(self, max_rate: float):
+        if max_rate <= 0:
+            raise ValueError(f"Rate limit must be > 0, got {max_rate}")
+        self.max_rate = max_rate
+        self._value: Optional[float] = None
+        self._timestamp: Optional[float] = None
+
+    def update(self, value: float, timestamp: float) -> float:
+        if self._value is None:
+            self._value = value
+        else:
+            max_step = self.max_rate * max(timestamp - self._timestamp, 0.0)
+            delta = value - self._value
+            if delta > max_step:
+                delta = max_step
+            elif delta < -max_step:
+                delta = -max_step
+            self._value += delta
+        self._timestamp = timestamp
+        return self._value
+
+    def reset(self):
+        self._value = None
+        self._timestamp = None
+
+    def clone(self) -> "RateLimitFilter":
+        return RateLimitFilter(self.max_rate)
+
+
+class KalmanFilter(SignalFilter):
+    """Scalar Kalman filter for slowly changing levels such as tanks"""
+
+    __slots__ = ("process_variance", "measurement_variance", "_estimate", "_error")
+
+    def __init__(self, process_variance: float = 0.01, measurement_variance: float = 4.0):
+        if process_variance <= 0 or measurement_variance <= 0:
+            raise ValueError("Kalman variances must be > 0")
+        self.process_variance = process_variance
+        self.measurement_variance = measurement_variance
+        self._estimate: Optional[float] = None
+        self._error = 1.0
+
+    def update(self, value: float, timestamp: float) -> float:
+        if self._estimate is None:
+            self._estimate = value
+            self._error = self.measurement_variance
+            return value
+
+        # Predict (constant level model), then correct with the measurement
+        error = self._error + self.process_variance
+        gain = error / (error + self.measurement_variance)
+        self._estimate += gain * (value - self._estimate)
+        self._error = (1 - gain) * error
+        return self._estimate
+
+    def reset(self):
+        self._estimate = None
+        self._error = 1.0
+
+    def clone(self) -> "KalmanFilter":
+        return KalmanFilter(self.process_variance, self.measurement_variance)
+
+
+# Filter type name (as used in configuration) -> (class, allowed parameters)
+FILTER_TYPES = {
+    "ema": (EMAFilter, ("alpha",)),
+    "median": (MedianFilter, ("window",)),
+    "rate_limit": (RateLimitFilter, ("max_rate",)),
+    "kalman": (KalmanFilter, ("process_variance", "measurement_variance")),
+}
+
+
+class FilterChain:
+    """Ordered list of filters applied to one sensor's samples"""
+
+    __slots__ = ("stages",)
+
+    def __init__(self, stages: Optional[List[SignalFilter]] = None):
+        self.stages = stages or []
+
+    def __len__(self) -> int:
+        return len(self.stages)
+
+    def update(self, value: float, timestamp: Optional[float] = None) -> float:
+        """Run one sample through every stage"""
+        if timestamp is None:
+            timestamp = time.monotonic()
+        for stage in self.stages:
+            value = stage.update(value, timestamp)
+        return value
+
+    def reset(self):
+        """Reset every stage, so stale state doesn't carry into readings after a gap"""
+        for stage in self.stages:
+            stage.reset()
+
+    def process_batch(
+        self,
+        values: Sequence[float],
+        timestamps: Optional[Sequence[float]] = None
+    ) -> List[float]:
+        """
+        Reprocess a buffer of samples with a fresh copy of the chain.
+
+        The buffer is pushed through one stage at a time, so each stage runs
+        a tight loop over the whole buffer. The live per-sensor state is not
+        touched. Without timestamps, samples are taken to be one second apart.
+        """
+        values = list(values)
+        if timestamps is None:
+            timestamps = [float(i) for i in range(len(values))]
+        elif len(timestamps) != len(values):
+            raise ValueError("values and timestamps must be the same length")
+
+        for stage in self.stages:
+            values = stage.clone().process_batch(values, timestamps)
+        return values
+
+
+def build_filter_chain(spec: Optional[List[Dict[str, Any]]]) -> FilterChain:
+    """Build a FilterChain from its configuration list"""
+    stages = []
+    for entry in spec or []:
+        filter_type = entry.get("type")
+        if filter_type not in FILTER_TYPES:
+            raise ValueError(f"Unknown filter type: {filter_type}")
+
+        filter_class, allowed = FILTER_TYPES[filter_type]
+        params = {k: v for k, v in entry.items() if k in allowed}
+        stages.append(filter_class(**params))
+
+    return FilterChain(stages)
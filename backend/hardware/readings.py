@@ -0,0 +1,54 @@
+"""
+Live sensor reading records
+"""
+from typing import Any, Dict, Optional
+import time
+
+# Quality flags
+QUALITY_GOOD = "good"            # Fresh sample from a board
+QUALITY_SIMULATED = "simulated"  # Fresh sample from simulation mode
+QUALITY_REPLAY = "replay"        # Recorded sample fed back by history replay
+QUALITY_ERROR = "error"          # Last read attempt failed, value is the previous sample
+QUALITY_STALE = "stale"          # No new sample within the staleness window (read side only)
+
+
+class Reading:
+    """Latest value of one sensor, with when and where it was sampled"""
+
+    __slots__ = ("value", "sample_time", "board_id", "quality")
+
+    def __init__(
+        self,
+        value: float,
+        sample_time: Optional[float] = None,
+        board_id: Optional[str] = None,
+        quality: str = QUALITY_GOOD
+    ):
+        self.value = value
+        self.sample_time = time.time() if sample_time is None else sample_time
+        self.board_id = board_id
+        self.quality = quality
+
+    def age(self, now: Optional[float] = None) -> float:
+        """Seconds since the value was sampled"""
+        return (time.time() if now is None else now) - self.sample_time
+
+    def quality_at(self, now: float, stale_after: float) -> str:
+        """Quality as seen by a reader at time `now`"""
+        if now - self.sample_time > stale_after:
+            return QUALITY_STALE
+        return self.quality
+
+    def is_fresh(self, now: float, stale_after: float) -> bool:
+        """True if the value is recent and was read successfully"""
+        return self.quality_at(now, stale_after) in (QUALITY_GOOD, QUALITY_SIMULATED, QUALITY_REPLAY)
+
+    def to_dict(self, now: float, stale_after: float) -> Dict[str, Any]:
+        """Serialize for the REST and WebSocket APIs"""
+        return {
+            "value": self.value,
+            "age": round(now - self.sample_time, 2),
+            "sample_time": self.sample_time,
+            "quality": self.quality_at(now, stale_after),
+            "board_id": self.board_id,
+        }
@@ -99,7 +99,7 @@ class RelayManager:
                 return False
 
         relay["state"] = state
-        logger.info(f"Relay {relay_id} set to {state}")
+        logger.debug(f"Relay {relay_id} set to {state}")
         return True
 
     async def toggle_relay(self, relay_id: str) -> bool:
@@ -2,10 +2,20 @@
 Sensor Manager - Handles all sensor inputs from Automation 2040W boards
 """
 import asyncio
+import json
 import logging
-from typing import Dict, Any, Optional
+import os
+import time
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
 from config import settings
+from .calibration import CalibrationEngine
+from .filters import FilterChain, build_filter_chain
+from .readings import QUALITY_ERROR, QUALITY_GOOD, QUALITY_REPLAY, QUALITY_SIMULATED
+from .sensor_registry import SensorRegistry, sensor_registry
+from .simulator import get_simulator, simulation_interval
+from services.live_store import LiveStore
+from services.metrics import BOARD_READ_ERRORS, BOARD_READ_SECONDS, LOOP_SECONDS
 
 logger = logging.getLogger(__name__)
 
@@ -13,34 +23,86 @@ logger = logging.getLogger(__name__)
 class SensorManager:
     """Manages sensor readings from Automation 2040W boards"""
 
-    def __init__(self):
+    STORE_GROUP = "sensors"
+
+    def __init__(
+        self,
+        store: Optional[LiveStore] = None,
+        registry: Optional[SensorRegistry] = None,
+        replay_mode: bool = False
+    ):
         self.running = False
-        self.sensors: Dict[str, Any] = {}
-        self.current_readings: Dict[str, float] = {}
+        self.registry = registry or sensor_registry
+        self.sensors = self.registry.sensors
+        self.store = store or LiveStore()
+        self.stale_after = settings.SENSOR_STALE_AFTER
+        self.filters: Dict[str, FilterChain] = {}
+        self._filtered_at: Dict[str, float] = {}  # Monotonic time of each sensor's last filtered sample
+        self.calibration = CalibrationEngine(self.registry.default_calibration())
         self.simulation_mode = settings.SIMULATION_MODE
+        self.replay_mode = replay_mode  # A history replay was created and feeds the readings
+        self.boards = []
+        self._next_read: Dict[str, float] = {}
+        self._loop_seconds = LOOP_SECONDS.labels("sensors")
+        self._read_metrics: Dict[str, Tuple[Any, Any]] = {}
 
-        if not self.simulation_mode:
+        for sensor_id, sensor in self.sensors.items():
+            self.store.register(sensor_id, self.STORE_GROUP)
             try:
-                from automation2040w import Automation2040W
-                self.boards = [Automation2040W(i) for i in range(settings.AUTOMATION_2040W_COUNT)]
-                logger.info(f"Initialized {len(self.boards)} Automation 2040W boards")
-            except ImportError:
-                logger.warning("Automation 2040W library not available, using simulation mode")
-                self.simulation_mode = True
-                self.boards = []
+                self.filters[sensor_id] = build_filter_chain(sensor.filters)
+            except (TypeError, ValueError) as e:
+                logger.error(f"Invalid filter config for {sensor_id}, filtering disabled: {e}")
+                self.filters[sensor_id] = FilterChain()
+
+        self.poll_interval = settings.SENSOR_POLL_INTERVAL
+        if self.replay_mode:
+            logger.info(f"Running in replay mode from {settings.REPLAY_SOURCE}")
+        elif not self.simulation_mode:
+            self.boards = self._create_boards(self._load_board_config())
+            logger.info(f"Initialized {len(self.boards)} Automation 2040W boards")
         else:
-            logger.info("Running in simulation mode")
-            self.boards = []
+            self.simulator = get_simulator()
+            self.poll_interval = simulation_interval(settings.SENSOR_POLL_INTERVAL)
+            logger.info(f"Running in simulation mode ({1 / self.poll_interval:.1f} Hz)")
+
+    def _load_board_config(self) -> List[Dict[str, Any]]:
+        """Load board configuration from boards.json"""
+        path = os.path.join(settings.CONFIG_DIR, "boards.json")
+        try:
+            with open(path) as f:
+                return json.load(f).get("boards", [])
+        except FileNotFoundError:
+            logger.warning(f"Board configuration {path} not found")
+        except (OSError, ValueError) as e:
+            logger.error(f"Error loading board configuration {path}: {e}")
+        return []
+
+    def _create_boards(self, board_config: List[Dict[str, Any]]) -> list:
+        """Create board interfaces for the configured boards"""
+        boards = []
+        for board in board_config:
+            if board.get("connection_type") == "wireless":
+                from .wireless_board import WirelessBoard
+                boards.append(WirelessBoard(board["board_id"], board["board_name"], board["ip_address"]))
+            else:
+                from .wired_board import WiredBoard
+                boards.append(WiredBoard(board["board_id"], board["board_name"], board.get("i2c_address")))
+        return boards
 
     async def start(self):
         """Start sensor polling"""
         self.running = True
+        await self.calibration.load()
+        for board in self.boards:
+            await board.connect()
         logger.info("Sensor manager started")
         await self._poll_loop()
 
     async def stop(self):
         """Stop sensor polling"""
         self.running = False
+        for board in self.boards:
+            await board.disconnect()
         logger.info("Sensor manager stopped")
 
     def is_running(self) -> bool:
@@ -51,47 +113,163 @@ class SensorManager:
         """Main polling loop for sensors"""
         while self.running:
             try:
+                started = time.perf_counter()
                 await self._read_all_sensors()
-                await asyncio.sleep(settings.SENSOR_POLL_INTERVAL)
+                self._loop_seconds.since(started)
+                await asyncio.sleep(self.poll_interval)
             except Exception as e:
                 logger.error(f"Error in sensor poll loop: {e}", exc_info=True)
                 await asyncio.sleep(1)
 
     async def _read_all_sensors(self):
         """Read all configured sensors"""
+        if self.replay_mode:
+            return  # Readings are pushed in by the history replay
         if self.simulation_mode:
             await self._simulate_sensors()
         else:
             await self._read_hardware_sensors()
 
-    async def _simulate_sensors(self):
-        """Simulate sensor readings for development"""
-        import random
+    def _ingest(
+        self,
+        sensor_id: str,
+        value: Optional[float],
+        calibrate: bool = True,
+        board_id: Optional[str] = None,
+        quality: Optional[str] = None
+    ):
+        """Calibrate a raw sample, run it through the sensor's filter chain and store it"""
+        if value is None:
+            # Keep the last value but flag that the read failed
+            self.store.set_quality(sensor_id, QUALITY_ERROR)
+            return
 
-        # Engine RPM (0-3000)
-        self.current_readings["engine_rpm"] = random.uniform(0, 3000)
+        if calibrate:
+            value = self.calibration.convert(sensor_id, value)
 
-        # Oil pressure (0-100 psi)
-        self.current_readings["oil_pressure"] = random.uniform(20, 80)
+        chain = self.filters.get(sensor_id)
+        if chain:
+            now = time.monotonic()
+            previous = self._filtered_at.get(sensor_id)
+            if previous is not None and now - previous > self.stale_after:
+                # Board dropout or failing reads: start over instead of blending in the old state
+                chain.reset()
+            self._filtered_at[sensor_id] = now
+            value = chain.update(value, now)
 
-        # Coolant temperature (60-100°C)
-        self.current_readings["coolant_temp"] = random.uniform(65, 95)
+        if board_id is None:
+            sensor = self.sensors.get(sensor_id)
+            board_id = sensor.board_id if sensor else None
+        self.store.set(
+            sensor_id,
+            value,
+            self.STORE_GROUP,
+            board_id=board_id,
+            quality=quality or (QUALITY_SIMULATED if self.simulation_mode else QUALITY_GOOD)
+        )
 
-        # Tank levels (0-100%)
-        self.current_readings["fuel_tank"] = random.uniform(30, 100)
-        self.current_readings["water_tank"] = random.uniform(40, 100)
-        self.current_readings["waste_tank"] = random.uniform(0, 50)
+    def ingest_replay(self, sensor_id: str, value: float):
+        """Accept a recorded (already calibrated and filtered) reading from history replay"""
+        sensor = self.sensors.get(sensor_id)
+        self.store.set(
+            sensor_id,
+            value,
+            self.STORE_GROUP,
+            board_id=sensor.board_id if sensor else None,
+            quality=QUALITY_REPLAY
+        )
+
+    async def _simulate_sensors(self):
+        """Advance the simulator one tick and ingest its values (already in engineering units)"""
+        self.simulator.step(self.poll_interval * settings.SIMULATION_TIME_SCALE)
+        for sensor_id, board_id, value in self.simulator.read_sensors():
+            self._ingest(sensor_id, value, calibrate=False, board_id=board_id)
 
     async def _read_hardware_sensors(self):
-        """Read actual hardware sensors"""
-        # TODO: Implement actual hardware reading
-        # This will be board-specific based on Automation 2040W API
-        pass
+        """Read hardware sensors that are due, according to their poll interval"""
+        boards = {board.board_id: board for board in self.boards}
+        now = time.monotonic()
+
+        for sensor_id, sensor in self.sensors.items():
+            if now < self._next_read.get(sensor_id, 0.0):
+                continue
+            board = boards.get(sensor.board_id)
+            if not board or not board.is_connected():
+                continue
+
+            self._next_read[sensor_id] = now + (sensor.poll_interval or 0.0)
+
+            read_seconds, read_errors = self._board_read_metrics(sensor)
+            started = time.perf_counter()
+            channel = sensor.channel
+            if sensor.input_type == "frequency":
+                value = await board.read_frequency(channel)
+            elif sensor.input_type == "digital":
+                state = await board.read_digital(channel)
+                value = None if state is None else float(state)
+            else:
+                value = await board.read_analog(channel)
+            read_seconds.since(started)
+            if value is None:
+                read_errors.inc()
+
+            self._ingest(sensor_id, value)
+
+    def _board_read_metrics(self, sensor) -> Tuple[Any, Any]:
+        """Read latency histogram and error counter for a sensor's board input"""
+        metrics = self._read_metrics.get(sensor.sensor_id)
+        if metrics is None:
+            labels = (sensor.board_id, sensor.input_type, sensor.channel)
+            metrics = self._read_metrics[sensor.sensor_id] = (
+                BOARD_READ_SECONDS.labels(*labels),
+                BOARD_READ_ERRORS.labels(*labels)
+            )
+        return metrics
+
+    def filter_batch(
+        self,
+        sensor_id: str,
+        values: List[float],
+        timestamps: Optional[List[float]] = None
+    ) -> List[float]:
+        """Reprocess buffered samples with a sensor's configured filter chain"""
+        chain = self.filters.get(sensor_id)
+        if not chain:
+            return list(values)
+        return chain.process_batch(values, timestamps)
 
     def get_reading(self, sensor_id: str) -> Optional[float]:
         """Get current reading for a sensor"""
-        return self.current_readings.get(sensor_id)
+        return self.store.get(sensor_id)
+
+    def get_all_readings(self, include_stale: bool = True) -> Dict[str, float]:
+        """Get all current sensor readings (a shared, read-only snapshot)"""
+        snapshot = self.store.snapshot(self.STORE_GROUP)
+        if include_stale:
+            return snapshot.values
+
+        now = time.time()
+        return {
+            sensor_id: r.value
+            for sensor_id, r in snapshot.records.items()
+            if r.is_fresh(now, self.stale_after)
+        }
+
+    def get_changed_readings(self, since_version: int) -> Tuple[int, Dict[str, float]]:
+        """Get the current store version and the readings changed after `since_version`"""
+        return self.store.changed_since(since_version, self.STORE_GROUP)
+
+    def get_record(self, sensor_id: str) -> Optional[Dict[str, Any]]:
+        """Get a sensor's reading with its age, quality and source board"""
+        reading = self.store.get_record(sensor_id)
+        if not reading:
+            return None
+        return reading.to_dict(time.time(), self.stale_after)
 
-    def get_all_readings(self) -> Dict[str, float]:
-        """Get all current sensor readings"""
-        return self.current_readings.copy()
+    def get_all_records(self) -> Dict[str, Dict[str, Any]]:
+        """Get every sensor's reading with its age, quality and source board"""
+        now = time.time()
+        return {
+            sensor_id: r.to_dict(now, self.stale_after)
+            for sensor_id, r in self.store.snapshot(self.STORE_GROUP).records.items()
+        }
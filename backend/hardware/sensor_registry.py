@@ -0,0 +1,135 @@
+"""
+Sensor registry - single source of truth for every configured sensor
+
+Loaded once at startup from config/sensors.json and compiled into the
+lookup tables used by acquisition, logging, calibration and the API.
+Adding a sensor only needs a new entry in the file:
+
+    "bilge_level": {
+        "name": "Bilge Level", "board": "board-2", "type": "analog", "channel": 3,
+        "unit": "%", "poll_interval": 5.0, "logging": "optional",
+        "calibration": {"min": 0, "max": 4095, "offset": 0, "scale": 1},
+        "filters": [{"type": "median", "window": 5}],
+        "simulation": {"min": 0, "max": 20}
+    }
+"""
+from typing import Any, Dict, List, Optional
+import json
+import logging
+import os
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+INPUT_TYPES = ("analog", "digital", "frequency")
+
+# Logging policies
+LOG_CRITICAL = "critical"  # Always logged
+LOG_OPTIONAL = "optional"  # Logged when available and non-zero
+LOG_NONE = "none"          # Live only
+LOGGING_POLICIES = (LOG_CRITICAL, LOG_OPTIONAL, LOG_NONE)
+
+
+class SensorDefinition:
+    """One configured sensor"""
+
+    __slots__ = (
+        "sensor_id", "name", "board_id", "input_type", "channel", "unit",
+        "poll_interval", "logging", "calibration", "filters", "simulation"
+    )
+
+    def __init__(self, sensor_id: str, config: Dict[str, Any]):
+        self.sensor_id = sensor_id
+        self.name = config.get("name", sensor_id.replace("_", " ").title())
+        self.board_id = config.get("board")
+        self.input_type = config.get("type", "analog")
+        self.channel = config.get("channel")
+        self.unit = config.get("unit", "")
+        self.poll_interval = config.get("poll_interval")
+        self.logging = config.get("logging", LOG_OPTIONAL)
+        self.calibration = config.get("calibration")
+        self.filters = config.get("filters")
+        self.simulation = config.get("simulation")
+
+        if self.input_type not in INPUT_TYPES:
+            raise ValueError(f"Unknown input type '{self.input_type}'")
+        if self.logging not in LOGGING_POLICIES:
+            raise ValueError(f"Unknown logging policy '{self.logging}'")
+        if self.board_id is not None and self.channel is None:
+            raise ValueError("A channel is required when a board is set")
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize for the API"""
+        return {
+            "sensor_id": self.sensor_id,
+            "name": self.name,
+            "board": self.board_id,
+            "type": self.input_type,
+            "channel": self.channel,
+            "unit": self.unit,
+            "poll_interval": self.poll_interval,
+            "logging": self.logging,
+        }
+
+
+class SensorRegistry:
+    """All configured sensors plus the lookup tables compiled from them"""
+
+    def __init__(self, definitions: List[SensorDefinition]):
+        self.sensors: Dict[str, SensorDefinition] = {d.sensor_id: d for d in definitions}
+
+        # Compiled lookup tables
+        self.units: Dict[str, str] = {d.sensor_id: d.unit for d in definitions}
+        self.critical_sensors: List[str] = [d.sensor_id for d in definitions if d.logging == LOG_CRITICAL]
+        self.optional_sensors: List[str] = [d.sensor_id for d in definitions if d.logging == LOG_OPTIONAL]
+        self.by_board: Dict[str, List[SensorDefinition]] = {}
+        for d in definitions:
+            if d.board_id is not None:
+                self.by_board.setdefault(d.board_id, []).append(d)
+
+    @classmethod
+    def load(cls, path: Optional[str] = None) -> "SensorRegistry":
+        """Load the registry from sensors.json (invalid entries are skipped)"""
+        path = path or os.path.join(settings.CONFIG_DIR, "sensors.json")
+        try:
+            with open(path) as f:
+                config = json.load(f).get("sensors", {})
+        except FileNotFoundError:
+            logger.warning(f"Sensor configuration {path} not found, no sensors registered")
+            config = {}
+        except (OSError, ValueError) as e:
+            logger.error(f"Error loading sensor configuration {path}: {e}")
+            config = {}
+
+        definitions = []
+        for sensor_id, entry in config.items():
+            try:
+                definitions.append(SensorDefinition(sensor_id, entry))
+            except (AttributeError, ValueError) as e:
+                logger.error(f"Invalid sensor definition {sensor_id}, skipping: {e}")
+
+        logger.info(f"Loaded {len(definitions)} sensors from {path}")
+        return cls(definitions)
+
+    def get(self, sensor_id: str) -> Optional[SensorDefinition]:
+        """Get a sensor definition"""
+        return self.sensors.get(sensor_id)
+
+    def get_unit(self, sensor_id: str) -> str:
+        """Get a sensor's unit"""
+        return self.units.get(sensor_id, "")
+
+    def default_calibration(self) -> Dict[str, Dict[str, Any]]:
+        """Default calibration parameters for every calibrated sensor"""
+        return {d.sensor_id: d.calibration for d in self.sensors.values() if d.calibration}
+
+    def firmware_channels(self, board_id: str) -> Dict[str, Dict[str, Any]]:
+        """SENSOR_CHANNELS mapping for a wireless board's firmware"""
+        return {
+            d.sensor_id: {"type": d.input_type, "channel": d.channel}
+            for d in self.by_board.get(board_id, [])
+        }
+
+
+sensor_registry = SensorRegistry.load()
@@ -0,0 +1,333 @@
+"""
+Boat simulator - deterministic, physics-flavoured data for simulation mode
+
+A single seeded model of the boat is stepped forward by the sensor poll
+loop with a fixed time step from SIMULATION_START (UTC), so the same seed
+always produces the same sequence of values, on any machine and in any
+timezone. The model ties things together the way they are on
+the boat: engine sessions drive RPM, oil pressure and coolant temperature,
+the engine burns fuel and charges the batteries, the solar charger follows
+the time of day, and battery state of charge follows the net current.
+
+For load testing, extra synthetic sensors can be spread over any number of
+simulated boards, and the tick rate can be raised up to 100 Hz.
+"""
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+import logging
+import math
+import random
+import time
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+MAX_TICK_HZ = 100.0
+
+FUEL_TANK_LITRES = 200.0
+LEISURE_CAPACITY_AH = 200.0
+STARTER_CAPACITY_AH = 70.0
+SOLAR_PEAK_WATTS = 300.0
+AMBIENT_TEMP = 18.0
+
+DEFAULT_START = datetime(2026, 6, 1, tzinfo=timezone.utc).timestamp()
+
+
+def _clamp(value: float, low: float, high: float) -> float:
+    return low if value < low else high if value > high else value
+
+
+class BoatSimulator:
+    """Seeded model of the engine, tanks, solar and batteries"""
+
+    MODELLED_SENSORS = ("engine_rpm", "oil_pressure", "coolant_temp", "fuel_tank", "water_tank", "waste_tank")
+
+    def __init__(
+        self,
+        seed: int = 1,
+        start_time: Optional[float] = None,
+        sensor_ranges: Optional[Dict[str, Tuple[float, float]]] = None,
+        extra_sensors: int = 0,
+        board_count: int = 2
+    ):
+        # Separate generators so reading the outputs never changes the model's evolution
+        self.rng = random.Random(seed)
+        self._sensor_rng = random.Random(seed + 1)
+        self._victron_rng = random.Random(seed + 2)
+        # Model clock (seconds since the epoch, read as UTC); a fixed default keeps runs reproducible
+        self.clock = DEFAULT_START if start_time is None else start_time
+        self.sensor_ranges = sensor_ranges or {}
+
+        # Engine
+        self.engine_running = False
+        self.session_remaining = self.rng.uniform(10, 60)  # First start soon after boot
+        self.target_rpm = 0.0
+        self.rpm = 0.0
+        self.coolant_temp = AMBIENT_TEMP
+        self.oil_pressure = 0.0
+
+        # Tanks (%)
+        self.fuel = self.rng.uniform(60, 95)
+        self.water = self.rng.uniform(50, 100)
+        self.waste = self.rng.uniform(0, 30)
+
+        # Electrical
+        self.leisure_soc = self.rng.uniform(70, 95)
+        self.starter_soc = 98.0
+        self.house_load = 3.0  # Amps
+        self.ac_power = 0.0
+        self.cloud = 1.0
+        self.yield_today = 0.0
+        self._yield_day = time.gmtime(self.clock).tm_yday
+        self.leisure_current = 0.0
+        self.starter_current = 0.0
+        self.solar_power = 0.0
+        self.solar_voltage = 0.0
+
+        # Registry sensors the model does not know about follow a random walk
+        self._walks: Dict[str, float] = {
+            sensor_id: self.rng.uniform(low, high)
+            for sensor_id, (low, high) in self.sensor_ranges.items()
+            if sensor_id not in self.MODELLED_SENSORS
+        }
+
+        # Synthetic load-test sensors: (sensor_id, board_id, period, phase)
+        board_count = max(board_count, 1)
+        self.extra_sensors: List[Tuple[str, str, float, float]] = [
+            (
+                f"sim_sensor_{i}",
+                f"sim-board-{i % board_count + 1}",
+                self.rng.uniform(30, 600),
+                self.rng.uniform(0, 2 * math.pi)
+            )
+            for i in range(extra_sensors)
+        ]
+
+    def step(self, dt: float):
+        """Advance the model by dt simulated seconds"""
+        rng = self.rng
+        self.clock += dt
+        self._step_engine(dt, rng)
+        self._step_tanks(dt, rng)
+        self._step_electrical(dt, rng)
+
+        for sensor_id, value in self._walks.items():
+            low, high = self.sensor_ranges[sensor_id]
+            step = (high - low) * 0.01 * math.sqrt(dt)
+            self._walks[sensor_id] = _clamp(value + rng.gauss(0, step), low, high)
+
+    def _step_engine(self, dt: float, rng: random.Random):
+        self.session_remaining -= dt
+        if self.session_remaining <= 0:
+            self.engine_running = not self.engine_running
+            if self.engine_running:
+                self.session_remaining = rng.uniform(20 * 60, 3 * 3600)
+                self.target_rpm = rng.uniform(1500, 2800)
+            else:
+                self.session_remaining = rng.uniform(30 * 60, 4 * 3600)
+                self.target_rpm = 0.0
+
+        # Occasional throttle changes while under way
+        if self.engine_running and rng.random() < dt / 120:
+            self.target_rpm = 0.6 * self.target_rpm + 0.4 * rng.uniform(1200, 2900)
+
+        target = self.target_rpm if self.engine_running else 0.0
+        self.rpm += (target - self.rpm) * min(1.0, dt / 3.0)
+
+        # Coolant warms towards thermostat temperature, cools slowly when off
+        if self.engine_running:
+            warm = 82.0 + self.rpm / 3000 * 8.0
+            self.coolant_temp += (warm - self.coolant_temp) * min(1.0, dt / 300)
+        else:
+            self.coolant_temp += (AMBIENT_TEMP - self.coolant_temp) * min(1.0, dt / 1800)
+
+        # Oil pressure rises with RPM and drops as the oil thins when hot
+        if self.rpm > 100:
+            self.oil_pressure = _clamp(20 + self.rpm * 0.018 - (self.coolant_temp - 40) * 0.15, 5, 80)
+        else:
+            self.oil_pressure = 0.0
+
+    def _step_tanks(self, dt: float, rng: random.Random):
+        # Fuel burn in L/h grows with the square of RPM
+        if self.engine_running:
+            burn = 1.0 + (self.rpm / 1000) ** 2 * 2.5
+            self.fuel -= burn * dt / 3600 / FUEL_TANK_LITRES * 100
+        if self.fuel < 10:
+            self.fuel = rng.uniform(85, 98)  # Refuelled
+
+        # Water drawn in short bursts, half of it ends up in the waste tank
+        if rng.random() < dt / 900:
+            used = rng.uniform(0.5, 3.0)
+            self.water -= used
+            self.waste += used * 0.5
+        if self.water < 15:
+            self.water = 100.0
+        if self.waste > 90:
+            self.waste = rng.uniform(0, 5)  # Pumped out
+
+    def _step_electrical(self, dt: float, rng: random.Random):
+        day = time.gmtime(self.clock)
+        if day.tm_yday != self._yield_day:
+            self._yield_day = day.tm_yday
+            self.yield_today = 0.0
+
+        # Solar follows the sun between 06:00 and 20:00 (model clock, UTC), with drifting cloud cover
+        hour = day.tm_hour + day.tm_min / 60 + day.tm_sec / 3600
+        sun = max(0.0, math.sin(math.pi * (hour - 6) / 14)) if 6 <= hour <= 20 else 0.0
+        self.cloud = _clamp(self.cloud + rng.gauss(0, 0.02 * math.sqrt(dt)), 0.3, 1.0)
+        self.solar_power = SOLAR_PEAK_WATTS * sun * self.cloud
+        self.solar_voltage = 18.0 + 3.0 * sun if sun > 0 else rng.uniform(0, 2)
+        self.yield_today += self.solar_power * dt / 3600 / 1000
+
+        # House loads: fridge cycling plus occasional inverter use
+        if rng.random() < dt / 600:
+            self.house_load = rng.choice([2.0, 3.0, 6.5])
+        if self.ac_power:
+            if rng.random() < dt / 300:
+                self.ac_power = 0.0  # Kettle boiled, microwave done
+        elif rng.random() < dt / 1800:
+            self.ac_power = rng.choice([150.0, 800.0, 1200.0])
+
+        voltage = self.leisure_voltage
+        solar_current = self.solar_power / voltage
+        alternator = 0.0
+        if self.rpm > 800:
+            alternator = 40.0 * _clamp((100 - self.leisure_soc) / 20, 0.1, 1.0)
+        inverter_current = self.ac_power / voltage / 0.9
+
+        self.leisure_current = solar_current + alternator - self.house_load - inverter_current
+        self.leisure_soc = _clamp(
+            self.leisure_soc + self.leisure_current * dt / 3600 / LEISURE_CAPACITY_AH * 100, 0, 100
+        )
+
+        self.starter_current = 10.0 * _clamp((100 - self.starter_soc) / 5, 0.05, 1.0) if self.rpm > 800 else -0.05
+        self.starter_soc = _clamp(
+            self.starter_soc + self.starter_current * dt / 3600 / STARTER_CAPACITY_AH * 100, 0, 100
+        )
+
+    @property
+    def leisure_voltage(self) -> float:
+        return 11.8 + self.leisure_soc / 100 * 1.0 + self.leisure_current * 0.01
+
+    @property
+    def starter_voltage(self) -> float:
+        return 12.0 + self.starter_soc / 100 * 0.8 + self.starter_current * 0.02
+
+    def _noisy(self, value: float, sigma: float) -> float:
+        return value + self._sensor_rng.gauss(0, sigma) if value else value
+
+    def read_sensors(self) -> Iterator[Tuple[str, Optional[str], float]]:
+        """Current (sensor_id, board_id, value) for every simulated sensor"""
+        noise = self._sensor_rng
+        modelled = {
+            "engine_rpm": self._noisy(self.rpm, 15),
+            "oil_pressure": self._noisy(self.oil_pressure, 0.8),
+            "coolant_temp": self._noisy(self.coolant_temp, 0.2),
+            # Sloshing shows up as noise on the tank senders
+            "fuel_tank": _clamp(self.fuel + noise.gauss(0, 2.0 if self.engine_running else 0.3), 0, 100),
+            "water_tank": _clamp(self.water + noise.gauss(0, 0.5), 0, 100),
+            "waste_tank": _clamp(self.waste + noise.gauss(0, 0.5), 0, 100),
+        }
+        for sensor_id in self.sensor_ranges:
+            if sensor_id in modelled:
+                yield sensor_id, None, modelled[sensor_id]
+            else:
+                yield sensor_id, None, self._walks[sensor_id]
+
+        for sensor_id, board_id, period, phase in self.extra_sensors:
+            value = 50 + 40 * math.sin(2 * math.pi * self.clock / period + phase) + noise.gauss(0, 1)
+            yield sensor_id, board_id, value
+
+    def victron_data(self) -> Dict[str, Dict[str, object]]:
+        """Current data for the simulated Victron devices"""
+        leisure_voltage = self.leisure_voltage
+        starter_voltage = self.starter_voltage
+
+        if self.solar_power < 1:
+            charger_state = "Off"
+        elif self.leisure_soc < 80:
+            charger_state = "Bulk"
+        elif self.leisure_soc < 98:
+            charger_state = "Absorption"
+        else:
+            charger_state = "Float"
+
+        ac_current = self.ac_power / 230
+        return {
+            "smartshunt_leisure": {
+                "voltage": leisure_voltage,
+                "current": self.leisure_current,
+                "soc": self.leisure_soc,
+                "power": leisure_voltage * self.leisure_current,
+                "consumed_ah": (100 - self.leisure_soc) / 100 * LEISURE_CAPACITY_AH,
+            },
+            "smartshunt_starter": {
+                "voltage": starter_voltage,
+                "current": self.starter_current,
+                "soc": self.starter_soc,
+                "power": starter_voltage * self.starter_current,
+                "consumed_ah": (100 - self.starter_soc) / 100 * STARTER_CAPACITY_AH,
+            },
+            "mppt_solar": {
+                "battery_voltage": leisure_voltage,
+                "battery_current": self.solar_power / leisure_voltage,
+                "solar_voltage": self.solar_voltage,
+                "solar_power": self.solar_power,
+                "yield_today": self.yield_today,  # kWh
+                "state": charger_state,
+            },
+            "inverter": {
+                "state": "Inverting" if self.ac_power > 0 else "On",
+                "ac_voltage": 230.0 + self._victron_rng.gauss(0, 1.5),
+                "ac_current": ac_current,
+                "ac_power": self.ac_power,
+            },
+        }
+
+
+def simulation_interval(default: float) -> float:
+    """Poll interval to use in simulation mode (SIMULATION_TICK_HZ overrides the default)"""
+    tick_hz = settings.SIMULATION_TICK_HZ
+    if tick_hz <= 0:
+        return default
+    return 1.0 / min(tick_hz, MAX_TICK_HZ)
+
+
+_simulator: Optional[BoatSimulator] = None
+
+
+def simulation_start() -> float:
+    """SIMULATION_START as epoch seconds: an ISO date (UTC unless it has an offset), or "now" for the wall clock"""
+    value = settings.SIMULATION_START.strip()
+    if value.lower() == "now":
+        return time.time()
+    start = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    return start.timestamp()
+
+
+def get_simulator() -> BoatSimulator:
+    """Shared simulator instance, created from settings and the sensor registry on first use"""
+    global _simulator
+    if _simulator is None:
+        from .sensor_registry import sensor_registry
+
+        ranges = {
+            d.sensor_id: (d.simulation["min"], d.simulation["max"])
+            for d in sensor_registry.sensors.values()
+            if d.simulation
+        }
+        _simulator = BoatSimulator(
+            seed=settings.SIMULATION_SEED,
+            start_time=simulation_start(),
+            sensor_ranges=ranges,
+            extra_sensors=settings.SIMULATION_EXTRA_SENSORS,
+            board_count=settings.SIMULATION_BOARD_COUNT
+        )
+        logger.info(
+            f"Simulator created (seed {settings.SIMULATION_SEED}, "
+            f"{len(ranges) + settings.SIMULATION_EXTRA_SENSORS} sensors)"
+        )
+    return _simulator
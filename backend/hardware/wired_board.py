@@ -93,7 +93,7 @@ class WiredBoard(BoardInterface):
     async def set_relay(self, relay: int, state: bool) -> bool:
         """Set relay state"""
         if self.simulation_mode:
-            logger.info(f"[SIM] Set relay {relay} to {state}")
+            logger.debug(f"[SIM] Set relay {relay} to {state}")
             return True
 
         try:
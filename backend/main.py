@@ -2,7 +2,6 @@
 BoatMonitor - Main Application Entry Point
 Monitors boat sensors, Victron equipment, and provides web interface
 """
-import asyncio
 import logging
 from contextlib import asynccontextmanager
 
@@ -10,59 +9,128 @@ from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 
-from api import sensors, victron, relays, relays_ws, settings, history, engine_logs, thresholds, calibration
+from api import sensors, victron, relays, relays_ws, settings, history, engine_logs, thresholds, calibration, metrics, diagnostics, jobs as jobs_api
 from hardware.sensor_manager import SensorManager
 from hardware.relay_manager import RelayManager
 from victron.device_manager import VictronManager
+from services.acquisition import create_acquisition
+from services.analytics import create_analytics
 from services.data_logger import DataLogger
-from database.database import init_database
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+from services.db_writer import db_writer
+from services.history_cache import history_cache
+from services.jobs import create_jobs
+from services import job_handlers  # noqa: F401 - registers the job types
+from services.live_store import LiveStore
+from services.log_pipeline import setup_logging
+from services.loop_monitor import create_loop_monitor
+from services.metrics import MetricsMiddleware
+from services.partitions import partition_manager
+from services.replay import create_replay
+from services.response_cache import response_cache
+from services.supervisor import create_supervisor
+from database.database import WalCheckpointer, close_database, database_status, init_database
+
+# Configure logging (queued, written by a background thread)
+setup_logging()
 logger = logging.getLogger(__name__)
 
 # Global managers
+live_store = None
 sensor_manager = None
 victron_manager = None
 relay_manager = None
 data_logger = None
+replay = None
+loop_monitor = None
+supervisor = None
+acquisition = None
+analytics = None
+jobs = None
+checkpointer = None
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan manager"""
-    global sensor_manager, victron_manager, relay_manager, data_logger
+    global live_store, sensor_manager, victron_manager, relay_manager, data_logger, replay, loop_monitor, supervisor, acquisition, analytics, jobs, checkpointer
 
     logger.info("Starting BoatMonitor...")
+    supervisor = create_supervisor()
 
-    # Initialize database
-    await init_database()
+    # Watch the event loop from the start, so slow startup work shows up too
+    loop_monitor = create_loop_monitor()
+    if loop_monitor:
+        supervisor.supervise("loop_monitor", loop_monitor.start)
 
-    # Initialize hardware managers
-    sensor_manager = SensorManager()
-    victron_manager = VictronManager()
+    # Initialize database (WAL checkpoints run in the background, not in commits)
+    await init_database()
+    supervisor.supervise("db_writer", db_writer.start)
+    checkpointer = WalCheckpointer()
+    supervisor.supervise("checkpoints", checkpointer.start)
+
+    # Report queries run in worker processes, off the event loop
+    analytics = create_analytics()
+
+    # Exports, backups and long reports run as background jobs
+    jobs = create_jobs(analytics)
+
+    # Multi-process mode: polling and logging run in the acquisition process,
+    # the managers here only read its shared live store
+    acquisition = create_acquisition()
+
+    # Initialize hardware managers (sharing one live value store)
+    live_store = acquisition.store if acquisition else LiveStore()
+    # Replay feeds the managers only if its source could actually be opened
+    replay = None if acquisition else create_replay()
+    sensor_manager = SensorManager(live_store, replay_mode=replay is not None)
+    victron_manager = VictronManager(live_store, replay_mode=replay is not None)
     relay_manager = RelayManager()
     data_logger = DataLogger()
 
-    # Start background tasks
-    asyncio.create_task(sensor_manager.start())
-    asyncio.create_task(victron_manager.start())
-    asyncio.create_task(relay_manager.start())
-    asyncio.create_task(data_logger.start(sensor_manager, victron_manager))
-
+    # Start background tasks (restarted if they crash)
+    supervisor.supervise("relays", relay_manager.start)
+    supervisor.supervise("jobs", jobs.start)
+    if acquisition:
+        supervisor.supervise("acquisition", acquisition.run)
+    else:
+        supervisor.supervise("sensors", sensor_manager.start)
+        supervisor.supervise("victron", victron_manager.start)
+        supervisor.supervise("data_logger", lambda: data_logger.start(sensor_manager, victron_manager))
+        # Monthly history files are managed by the process that writes them
+        if partition_manager:
+            supervisor.supervise("partitions", partition_manager.start)
+    if replay:
+        supervisor.supervise("replay", lambda: replay.start(sensor_manager, victron_manager), restart=False)
+
+    supervisor.ready()
     logger.info("BoatMonitor started successfully")
 
     yield
 
     # Cleanup
     logger.info("Shutting down BoatMonitor...")
-    await sensor_manager.stop()
-    await victron_manager.stop()
+    supervisor.stop()
+    if acquisition:
+        await acquisition.stop()
+    else:
+        if replay:
+            await replay.stop()
+        await sensor_manager.stop()
+        await victron_manager.stop()
+        await data_logger.stop()
+        if partition_manager:
+            await partition_manager.stop()
     await relay_manager.stop()
-    await data_logger.stop()
+    await jobs.stop()
+    await checkpointer.stop()
+    # Drains queued writes; later ones (the final data logger batch) are written directly
+    await db_writer.stop()
+    analytics.shutdown()
+    if loop_monitor:
+        await loop_monitor.stop()
+    # Let the loops finish their last iteration (final data logger batch)
+    await supervisor.join()
+    await close_database()
     logger.info("BoatMonitor stopped")
 
 
@@ -83,6 +151,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-route request latency for /api/metrics
+app.add_middleware(MetricsMiddleware)
+
 # Include API routers
 app.include_router(sensors.router, prefix="/api/sensors", tags=["sensors"])
 app.include_router(victron.router, prefix="/api/victron", tags=["victron"])
@@ -93,16 +164,29 @@ app.include_router(history.router, prefix="/api/history", tags=["history"])
 app.include_router(engine_logs.router, prefix="/api/engine", tags=["engine"])
 app.include_router(thresholds.router, prefix="/api/thresholds", tags=["thresholds"])
 app.include_router(calibration.router, prefix="/api", tags=["calibration"])
+app.include_router(metrics.router, prefix="/api/metrics", tags=["metrics"])
+app.include_router(diagnostics.router, prefix="/api/diagnostics", tags=["diagnostics"])
+app.include_router(jobs_api.router, prefix="/api/jobs", tags=["jobs"])
 
 
 @app.get("/api/health")
 async def health_check():
     """Health check endpoint"""
     return {
-        "status": "healthy",
-        "sensors": sensor_manager.is_running() if sensor_manager else False,
-        "victron": victron_manager.is_running() if victron_manager else False,
-        "relays": relay_manager.running if relay_manager else False
+        "status": "healthy" if not supervisor or supervisor.healthy() else "degraded",
+        "sensors": acquisition.is_alive() if acquisition else sensor_manager.is_running() if sensor_manager else False,
+        "victron": acquisition.is_alive() if acquisition else victron_manager.is_running() if victron_manager else False,
+        "relays": relay_manager.running if relay_manager else False,
+        "replay": replay.status() if replay else None,
+        "acquisition": acquisition.status() if acquisition else None,
+        "analytics": analytics.status() if analytics else None,
+        "jobs": jobs.status() if jobs else None,
+        "staging": data_logger.stage.status() if data_logger and data_logger.stage and not acquisition else None,
+        "partitions": partition_manager.status() if partition_manager and not acquisition else None,
+        "history_cache": history_cache.status() if history_cache and not acquisition else None,
+        "response_cache": response_cache.status() if response_cache else None,
+        "database": {**database_status(), "writer": db_writer.status()},
+        "tasks": supervisor.status() if supervisor else {}
     }
 
 
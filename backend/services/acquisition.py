@@ -0,0 +1,204 @@
+"""
+Acquisition process - sensor polling, Victron and data logging in their own process
+
+With ACQUISITION_PROCESS=true the web process no longer polls hardware.
+It spawns this process, which runs the sensor and Victron managers, the
+data logger and replay under its own task supervisor, and publishes the
+latest values through the shared live store (services/shared_store.py).
+A slow analytics query in the web process can then no longer delay a
+sensor read, and the two use separate cores.
+
+The web process talks to it over a pipe for the few things that must reach
+the pollers (calibration changes, stop).
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import time
+from typing import Any, Dict, Optional
+
+from config import settings
+from services.shared_store import SharedStoreReader, default_path
+
+logger = logging.getLogger(__name__)
+
+READY_TIMEOUT = 60.0
+HEARTBEAT_INTERVAL = 1.0
+
+
+class AcquisitionProcess:
+    """Starts, watches and stops the acquisition process (web process side)"""
+
+    def __init__(self, path: Optional[str] = None, capacity: int = 1024):
+        self.path = path or default_path()
+        self.capacity = capacity
+        self.store = SharedStoreReader(self.path, capacity)
+        self.process: Optional[multiprocessing.Process] = None
+        self.starts = 0
+        self.stopping = False
+        self._connection = None
+
+    async def run(self):
+        """Start the process and watch it; raises if it dies (so the supervisor restarts it)"""
+        await self._start()
+        while not self.stopping:
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            if not self.process.is_alive():
+                if self.stopping or self.process.exitcode == 0:
+                    return  # Stopped on request (e.g. Ctrl+C reaches both processes)
+                raise RuntimeError(f"Acquisition process exited with code {self.process.exitcode}")
+
+    async def _start(self):
+        if self._connection is not None:
+            self._connection.close()
+        context = multiprocessing.get_context("spawn")
+        parent, child = context.Pipe()
+        self.process = context.Process(
+            target=run_acquisition,
+            args=(self.path, self.capacity, child),
+            name="boatmonitor-acquisition",
+            daemon=True
+        )
+        self.process.start()
+        child.close()
+        self._connection = parent
+        self.starts += 1
+
+        # Spawning re-imports the app modules, which takes a few seconds on a Pi
+        ready = await asyncio.to_thread(parent.poll, READY_TIMEOUT)
+        if not ready or parent.recv() != "ready":
+            self.process.terminate()
+            raise RuntimeError("Acquisition process did not start")
+        logger.info(f"Acquisition process started (pid {self.process.pid})")
+
+    def send(self, command: str, payload: Any = None):
+        """Send a command to the acquisition process (dropped if it is not running)"""
+        if self._connection is None or not self.is_alive():
+            logger.warning(f"Acquisition process not running, {command} not sent")
+            return
+        try:
+            self._connection.send((command, payload))
+        except OSError as e:
+            logger.warning(f"Could not send {command} to acquisition process: {e}")
+
+    async def stop(self, timeout: Optional[float] = None):
+        """Ask the process to flush and exit, killing it after the timeout"""
+        self.stopping = True
+        if not self.is_alive():
+            return
+        self.send("stop")
+        timeout = settings.SHUTDOWN_TIMEOUT if timeout is None else timeout
+        await asyncio.to_thread(self.process.join, timeout)
+        if self.process.is_alive():
+            logger.warning(f"Acquisition process did not stop within {timeout}s, terminating")
+            self.process.terminate()
+            await asyncio.to_thread(self.process.join, 1.0)
+        logger.info("Acquisition process stopped")
+
+    def is_alive(self) -> bool:
+        return self.process is not None and self.process.is_alive()
+
+    def status(self) -> Dict[str, Any]:
+        heartbeat_age = self.store.heartbeat_age()
+        return {
+            "pid": self.process.pid if self.process else None,
+            "alive": self.is_alive(),
+            "starts": self.starts,
+            "heartbeat_age": round(heartbeat_age, 2) if heartbeat_age is not None else None,
+            "store_version": self.store.version,
+        }
+
+
+def run_acquisition(path: str, capacity: int, connection):
+    """Entry point of the acquisition process"""
+    from services.log_pipeline import setup_logging
+
+    # Only the web process talks to systemd
+    for name in ("NOTIFY_SOCKET", "WATCHDOG_USEC", "WATCHDOG_PID"):
+        os.environ.pop(name, None)
+    setup_logging()
+    try:
+        asyncio.run(_acquisition_main(path, capacity, connection))
+    except KeyboardInterrupt:
+        pass
+
+
+async def _acquisition_main(path: str, capacity: int, connection):
+    from hardware.sensor_manager import SensorManager
+    from services.data_logger import DataLogger
+    from services.db_writer import db_writer
+    from services.partitions import partition_manager
+    from services.replay import create_replay
+    from services.shared_store import SharedLiveStore
+    from services.supervisor import create_supervisor
+    from victron.device_manager import VictronManager
+
+    loop = asyncio.get_running_loop()
+    stop_requested = asyncio.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, stop_requested.set)
+
+    store = SharedLiveStore(path, capacity)
+    replay = create_replay()
+    sensor_manager = SensorManager(store, replay_mode=replay is not None)
+    victron_manager = VictronManager(store, replay_mode=replay is not None)
+    data_logger = DataLogger()
+
+    supervisor = create_supervisor()
+    supervisor.supervise("db_writer", db_writer.start)
+    supervisor.supervise("sensors", sensor_manager.start)
+    supervisor.supervise("victron", victron_manager.start)
+    supervisor.supervise("data_logger", lambda: data_logger.start(sensor_manager, victron_manager))
+    if partition_manager:
+        supervisor.supervise("partitions", partition_manager.start)
+    if replay:
+        supervisor.supervise("replay", lambda: replay.start(sensor_manager, victron_manager), restart=False)
+
+    async def heartbeat():
+        while not stop_requested.is_set():
+            store.heartbeat()
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+
+    supervisor.supervise("heartbeat", heartbeat)
+
+    def on_command():
+        try:
+            command, payload = connection.recv()
+        except (EOFError, OSError):
+            command, payload = "stop", None  # Web process is gone
+        if command == "calibration":
+            sensor_manager.calibration.update(payload)
+        elif command == "stop":
+            stop_requested.set()
+        else:
+            logger.warning(f"Unknown acquisition command {command}")
+
+    loop.add_reader(connection.fileno(), on_command)
+    connection.send("ready")
+    logger.info("Acquisition process running")
+
+    await stop_requested.wait()
+    loop.remove_reader(connection.fileno())
+
+    started = time.monotonic()
+    supervisor.stop()
+    if replay:
+        await replay.stop()
+    await sensor_manager.stop()
+    await victron_manager.stop()
+    await data_logger.stop()
+    if partition_manager:
+        await partition_manager.stop()
+    await db_writer.stop()
+    await supervisor.join()
+    store.close()
+    logger.info(f"Acquisition process stopped in {time.monotonic() - started:.1f}s")
+
+
+def create_acquisition() -> Optional[AcquisitionProcess]:
+    """Create the acquisition process handle from settings, if multi-process mode is on"""
+    if not settings.ACQUISITION_PROCESS:
+        return None
+    return AcquisitionProcess(settings.SHARED_STORE_PATH or None, settings.SHARED_STORE_CAPACITY)
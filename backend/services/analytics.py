@@ -0,0 +1,254 @@
+"""
+Analytics executor - runs report queries off the event loop
+
+Report endpoints (engine statistics, usage summary, alerts) scan months of
+history. They run here, in a small process pool with a read-only SQLite
+connection per worker, instead of on the event loop that serves the live
+gauges:
+
+- bounded: at most ANALYTICS_WORKERS jobs run at once, at most
+  ANALYTICS_MAX_QUEUED wait; beyond that callers get AnalyticsBusy
+- cancellable: if the HTTP client disconnects or the job exceeds
+  ANALYTICS_TIMEOUT, its SQLite query is interrupted in the worker
+- timed: queue wait and run time per job are recorded as metrics
+
+ANALYTICS_WORKERS=0 runs jobs in a thread instead (same code, no extra
+processes).
+"""
+import asyncio
+import concurrent.futures
+import logging
+import multiprocessing
+import signal
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, List, Optional
+
+from config import settings
+from database.database import sqlite_pragmas
+from services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+JOB_SECONDS = metrics.histogram(
+    "boatmonitor_analytics_job_seconds", "Analytics job run time", ("job", "outcome")
+)
+QUEUE_SECONDS = metrics.histogram(
+    "boatmonitor_analytics_queue_seconds", "Time analytics jobs waited for a worker", ("job",)
+)
+JOBS_WAITING = metrics.gauge(
+    "boatmonitor_analytics_jobs_waiting", "Analytics jobs waiting for a worker"
+)
+
+# Check the cancel flag every N SQLite virtual machine instructions
+PROGRESS_INSTRUCTIONS = 10000
+DISCONNECT_POLL_INTERVAL = 0.25
+
+
+class AnalyticsBusy(Exception):
+    """Too many analytics jobs queued"""
+
+
+class AnalyticsCancelled(Exception):
+    """Job cancelled (client disconnected or timed out)"""
+
+
+# Worker side: one read-only connection per worker process (or thread)
+_worker = threading.local()
+_database_path: Optional[str] = None
+_cancel_flags = None
+
+
+def _init_worker(database_path: str, cancel_flags):
+    global _database_path, _cancel_flags
+    _database_path = database_path
+    _cancel_flags = cancel_flags
+
+
+def _init_process_worker(database_path: str, cancel_flags):
+    # Ctrl+C reaches the whole process group; the web process shuts the pool down itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _init_worker(database_path, cancel_flags)
+
+
+def _connection() -> sqlite3.Connection:
+    db = getattr(_worker, "db", None)
+    if db is None:
+        db = sqlite3.connect(f"file:{_database_path}?mode=ro", uri=True, check_same_thread=False)
+        for pragma in sqlite_pragmas(read_only=True):
+            db.execute(pragma)
+        _worker.db = db
+    return db
+
+
+def _run_job(slot: int, function: Callable, args: tuple) -> Any:
+    """Run one job in a worker; the SQLite query aborts as soon as the slot's cancel flag is set"""
+    db = _connection()
+    db.set_progress_handler(lambda: _cancel_flags[slot], PROGRESS_INSTRUCTIONS)
+    try:
+        return function(db, *args)
+    except sqlite3.OperationalError as e:
+        if _cancel_flags[slot]:
+            raise AnalyticsCancelled() from e
+        raise
+    finally:
+        db.set_progress_handler(None, 0)
+
+
+def database_path(url: str) -> str:
+    """File path of a sqlite:// database URL"""
+    if not url.startswith("sqlite"):
+        raise ValueError(f"Analytics needs a SQLite database, got {url}")
+    return url.split("///", 1)[1]
+
+
+class AnalyticsExecutor:
+    """Bounded, cancellable executor for report queries"""
+
+    def __init__(
+        self,
+        database: str,
+        workers: int = 1,
+        max_queued: int = 8,
+        timeout: float = 120.0
+    ):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.timeout = timeout
+        self.jobs_run = 0
+
+        # One cancel flag per running or queued job
+        slots = max(workers, 1) + max_queued
+        context = multiprocessing.get_context("spawn")
+        self._cancel_flags = context.RawArray("b", slots)
+        self._free_slots: List[int] = list(range(slots))
+        self._running = asyncio.Semaphore(max(workers, 1))
+        self._database = database
+        self._pool = self._create_pool()
+
+    def _create_pool(self) -> concurrent.futures.Executor:
+        if self.workers > 0:
+            return concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_process_worker,
+                initargs=(self._database, self._cancel_flags)
+            )
+        _init_worker(self._database, self._cancel_flags)
+        return concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="analytics")
+
+    async def run(
+        self,
+        function: Callable,
+        *args,
+        request=None,
+        name: Optional[str] = None,
+        timeout: Optional[float] = None
+    ) -> Any:
+        """
+        Run `function(db, *args)` in a worker and return its result.
+
+        With a `request`, the job is cancelled when that HTTP client
+        disconnects. `timeout` overrides ANALYTICS_TIMEOUT (background jobs
+        may run longer). Raises AnalyticsBusy, AnalyticsCancelled or the
+        job's own exception.
+        """
+        name = name or function.__name__
+        if not self._free_slots:
+            raise AnalyticsBusy(f"{self.max_queued} analytics jobs already queued")
+        slot = self._free_slots.pop()
+        self._cancel_flags[slot] = 0
+        queued = time.perf_counter()
+        future = None
+        acquired = False
+        try:
+            JOBS_WAITING.inc()
+            try:
+                await self._running.acquire()
+                acquired = True
+            finally:
+                JOBS_WAITING.dec()
+            QUEUE_SECONDS.labels(name).since(queued)
+            if request is not None and await request.is_disconnected():
+                raise AnalyticsCancelled(f"{name}: client disconnected while queued")
+
+            future = asyncio.get_running_loop().run_in_executor(self._pool, _run_job, slot, function, args)
+            # Slot and worker are only free again once the worker has really finished
+            future.add_done_callback(lambda f: self._release(slot, f))
+            return await self._wait(future, slot, request, name, self.timeout if timeout is None else timeout)
+        finally:
+            # Once the job is submitted, _release() hands both back when the worker is done
+            if future is None:
+                if acquired:
+                    self._running.release()
+                self._free_slots.append(slot)
+
+    def _release(self, slot: int, future: asyncio.Future):
+        if not future.cancelled():
+            future.exception()  # Retrieved here if the caller gave up on it
+        self._running.release()
+        self._free_slots.append(slot)
+
+    async def _wait(self, future: asyncio.Future, slot: int, request, name: str, timeout: float) -> Any:
+        """Wait for a job, interrupting it on timeout or client disconnect"""
+        started = time.perf_counter()
+        deadline = started + timeout
+        outcome = "error"
+        try:
+            while True:
+                # asyncio.wait does not cancel the future if we are cancelled
+                done, _ = await asyncio.wait({future}, timeout=DISCONNECT_POLL_INTERVAL)
+                if done:
+                    result = future.result()
+                    outcome = "ok"
+                    self.jobs_run += 1
+                    return result
+                if time.perf_counter() > deadline:
+                    outcome = "timeout"
+                    raise AnalyticsCancelled(f"{name} exceeded {timeout}s")
+                if request is not None and await request.is_disconnected():
+                    outcome = "cancelled"
+                    raise AnalyticsCancelled(f"{name}: client disconnected")
+        except AnalyticsCancelled:
+            if outcome == "error":
+                outcome = "cancelled"  # Interrupted in the worker
+            raise
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        except concurrent.futures.BrokenExecutor:
+            logger.error("Analytics worker died, restarting the pool")
+            self._pool = self._create_pool()
+            raise
+        finally:
+            if outcome != "ok":
+                # Interrupts the worker's query at its next progress check
+                self._cancel_flags[slot] = 1
+            elapsed = time.perf_counter() - started
+            JOB_SECONDS.labels(name, outcome).observe(elapsed)
+            logger.debug(f"Analytics job {name}: {outcome} in {elapsed:.3f}s")
+
+    def status(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_queued": self.max_queued,
+            "free_slots": len(self._free_slots),
+            "jobs_run": self.jobs_run,
+        }
+
+    def shutdown(self):
+        """Cancel running queries and stop the workers"""
+        for slot in range(len(self._cancel_flags)):
+            self._cancel_flags[slot] = 1
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+def create_analytics() -> AnalyticsExecutor:
+    """Create the analytics executor from settings"""
+    return AnalyticsExecutor(
+        database_path(settings.DATABASE_URL),
+        workers=settings.ANALYTICS_WORKERS,
+        max_queued=settings.ANALYTICS_MAX_QUEUED,
+        timeout=settings.ANALYTICS_TIMEOUT
+    )
@@ -3,13 +3,23 @@ Data Logger Service - Logs sensor data to database for historical tracking
 """
 import asyncio
 import logging
+import time
+from collections import defaultdict
 from datetime import datetime
-from typing import Dict, Any
-from sqlalchemy import select, func, and_
+from typing import Dict, Any, List, Optional
+from sqlalchemy import insert, select, func, and_
 from sqlalchemy.ext.asyncio import AsyncSession
-from database.database import AsyncSessionLocal
+from database.database import ReadSessionLocal
 from database.models import SensorReading, VictronReading
+from database.partitions import partition_name, partition_table
 from config import settings
+from hardware.sensor_registry import sensor_registry
+from services.db_writer import db_writer
+from services.history_cache import history_cache
+from services.metrics import LOOP_SECONDS
+from services.partitions import partition_manager
+from services.response_cache import response_cache
+from services.staging import create_write_stage
 
 logger = logging.getLogger(__name__)
 
@@ -21,129 +31,152 @@ class DataLogger:
         self.running = False
         self.log_interval = settings.HISTORY_SAVE_INTERVAL  # Default 60 seconds
 
-        # Critical sensors to always log
-        self.critical_sensors = [
-            "engine_rpm",
-            "oil_pressure",
-            "coolant_temp",
-        ]
-
-        # Optional sensors to log
-        self.optional_sensors = [
-            "fuel_tank",
-            "water_tank",
-            "waste_tank",
-        ]
+        # Critical sensors are always logged, optional ones when non-zero
+        # (the "logging" policy in sensors.json)
+        self.critical_sensors = sensor_registry.critical_sensors
+        self.optional_sensors = sensor_registry.optional_sensors
+        self._loop_seconds = LOOP_SECONDS.labels("data_logger")
+        self.stage = create_write_stage(self._insert_samples, self._prepare_samples, self._sample_partition)
+        self._wake = asyncio.Event()
 
     async def start(self, sensor_manager, victron_manager):
         """Start data logging"""
         self.running = True
+        self._wake.clear()
         self.sensor_manager = sensor_manager
         self.victron_manager = victron_manager
-        logger.info(f"Data logger started (interval: {self.log_interval}s)")
+        if self.stage:
+            await self.stage.recover()
+        if history_cache:
+            try:
+                await history_cache.warm()
+            except Exception as e:
+                logger.warning(f"Could not warm the history cache (history reads use the database): {e}")
+        logger.info(f"Data logger started (interval: {self.log_interval}s{', staged' if self.stage else ''})")
         await self._logging_loop()
 
     async def stop(self):
-        """Stop data logging"""
+        """Stop data logging (the loop writes one final batch before it exits)"""
         self.running = False
+        self._wake.set()
         logger.info("Data logger stopped")
 
     async def _logging_loop(self):
         """Main logging loop"""
         while self.running:
             try:
+                started = time.perf_counter()
                 await self._log_data()
-                await asyncio.sleep(self.log_interval)
+                self._loop_seconds.since(started)
+                await self._sleep(self.log_interval)
             except Exception as e:
                 logger.error(f"Error in data logging loop: {e}", exc_info=True)
-                await asyncio.sleep(10)
+                await self._sleep(10)
 
-    async def _log_data(self):
-        """Log current sensor and Victron data to database"""
-        async with AsyncSessionLocal() as session:
+        # Don't lose the readings since the last save
+        await self._log_data()
+        if self.stage:
             try:
-                # Log sensor data
-                await self._log_sensors(session)
-
-                # Log Victron data
-                await self._log_victron(session)
+                await self.stage.merge()
+            except Exception as e:
+                logger.error(f"Final merge of staged samples failed (kept in the journal): {e}", exc_info=True)
+            self.stage.close()
+        logger.info("Data logger flushed final batch")
 
-                await session.commit()
-                logger.debug("Data logged successfully")
+    async def _sleep(self, seconds: float):
+        """Sleep, but wake up early when stopped"""
+        try:
+            await asyncio.wait_for(self._wake.wait(), seconds)
+        except asyncio.TimeoutError:
+            pass
 
-            except Exception as e:
-                await session.rollback()
-                logger.error(f"Error logging data: {e}", exc_info=True)
-
-    async def _log_sensors(self, session: AsyncSession):
-        """Log sensor readings"""
-        if not self.sensor_manager:
-            return
-
-        readings = self.sensor_manager.get_all_readings()
-        timestamp = datetime.utcnow()
-
-        # Log critical sensors (always)
-        for sensor_id in self.critical_sensors:
-            if sensor_id in readings:
-                value = readings[sensor_id]
-                unit = self._get_sensor_unit(sensor_id)
-
-                reading = SensorReading(
-                    timestamp=timestamp,
-                    sensor_type=sensor_id,
-                    sensor_id=sensor_id,
-                    value=value,
-                    unit=unit
-                )
-                session.add(reading)
-                logger.debug(f"Logged {sensor_id}: {value} {unit}")
-
-        # Log optional sensors (if available and non-zero)
-        for sensor_id in self.optional_sensors:
-            if sensor_id in readings and readings[sensor_id] > 0:
-                value = readings[sensor_id]
-                unit = self._get_sensor_unit(sensor_id)
-
-                reading = SensorReading(
-                    timestamp=timestamp,
-                    sensor_type=sensor_id,
-                    sensor_id=sensor_id,
-                    value=value,
-                    unit=unit
-                )
-                session.add(reading)
-
-    async def _log_victron(self, session: AsyncSession):
-        """Log Victron device data"""
-        if not self.victron_manager:
-            return
-
-        devices = self.victron_manager.get_all_data()
-        timestamp = datetime.utcnow()
-
-        for device_id, data in devices.items():
-            if data:
-                reading = VictronReading(
-                    timestamp=timestamp,
-                    device_type=self._get_device_type(device_id),
-                    device_id=device_id,
-                    data=data
-                )
-                session.add(reading)
-                logger.debug(f"Logged Victron device: {device_id}")
+    async def _log_data(self):
+        """Log current sensor and Victron data to database (or the write stage)"""
+        sample = self._sample()
+        try:
+            if self.stage:
+                await self.stage.append(sample)
+                self._ingested(sample)
+                if self.stage.due():
+                    await self.stage.merge()
+            else:
+                async def log_readings(session: AsyncSession):
+                    await self._insert_samples(session, [sample])
+
+                await self._prepare_samples([sample])
+                await db_writer.write(log_readings)
+                self._ingested(sample)
+            logger.debug("Data logged successfully")
+        except Exception as e:
+            logger.error(f"Error logging data: {e}", exc_info=True)
+
+    def _sample(self) -> Dict[str, Any]:
+        """Current readings to log: {"t": timestamp, "sensors": {id: value}, "victron": {id: data}}"""
+        sensors = {}
+        if self.sensor_manager:
+            # Don't log the last known value of a sensor that has stopped reporting
+            readings = self.sensor_manager.get_all_readings(include_stale=False)
+
+            # Critical sensors always, optional sensors if available and non-zero
+            for sensor_id in self.critical_sensors:
+                if sensor_id in readings:
+                    sensors[sensor_id] = readings[sensor_id]
+            for sensor_id in self.optional_sensors:
+                if sensor_id in readings and readings[sensor_id] > 0:
+                    sensors[sensor_id] = readings[sensor_id]
+
+        victron = {}
+        if self.victron_manager:
+            victron = {device_id: data for device_id, data in self.victron_manager.get_all_data().items() if data}
+
+        return {"t": datetime.utcnow().isoformat(), "sensors": sensors, "victron": victron}
+
+    def _ingested(self, sample: Dict[str, Any]):
+        """Add a logged sample to the history cache and expire the responses that may include it"""
+        if history_cache:
+            history_cache.add(sample, {sensor_id: self._get_sensor_unit(sensor_id) for sensor_id in sample["sensors"]})
+        if response_cache:
+            response_cache.ingested()
+
+    def _sample_partition(self, sample: Dict[str, Any]) -> Optional[str]:
+        """History partition a sample's rows go to (None = main database)"""
+        return partition_name(datetime.fromisoformat(sample["t"])) if partition_manager else None
+
+    async def _prepare_samples(self, samples: List[Dict[str, Any]]):
+        """Make sure the history partitions of these samples exist (must run before the write)"""
+        if partition_manager:
+            await partition_manager.ensure({self._sample_partition(sample) for sample in samples})
+
+    async def _insert_samples(self, session: AsyncSession, samples: List[Dict[str, Any]]):
+        """Insert the rows of logged samples (into their month's partition when partitioning)"""
+        sensor_rows: Dict[Optional[str], List[dict]] = defaultdict(list)
+        victron_rows: Dict[Optional[str], List[dict]] = defaultdict(list)
+        for sample in samples:
+            timestamp = datetime.fromisoformat(sample["t"])
+            partition = self._sample_partition(sample)
+            for sensor_id, value in sample["sensors"].items():
+                sensor_rows[partition].append({
+                    "timestamp": timestamp,
+                    "sensor_type": sensor_id,
+                    "sensor_id": sensor_id,
+                    "value": value,
+                    "unit": self._get_sensor_unit(sensor_id),
+                })
+            for device_id, data in sample["victron"].items():
+                victron_rows[partition].append({
+                    "timestamp": timestamp,
+                    "device_type": self._get_device_type(device_id),
+                    "device_id": device_id,
+                    "data": data,
+                })
+        for partition, rows in sensor_rows.items():
+            await session.execute(insert(partition_table(SensorReading.__table__, partition)), rows)
+        for partition, rows in victron_rows.items():
+            await session.execute(insert(partition_table(VictronReading.__table__, partition)), rows)
 
     def _get_sensor_unit(self, sensor_id: str) -> str:
         """Get unit for sensor type"""
-        units = {
-            "engine_rpm": "RPM",
-            "oil_pressure": "PSI",
-            "coolant_temp": "°C",
-            "fuel_tank": "%",
-            "water_tank": "%",
-            "waste_tank": "%",
-        }
-        return units.get(sensor_id, "")
+        return sensor_registry.get_unit(sensor_id)
 
     def _get_device_type(self, device_id: str) -> str:
         """Get device type from device ID"""
@@ -161,7 +194,7 @@ class DataLogger:
         end_time: datetime = None
     ) -> Dict[str, Any]:
         """Get engine usage statistics"""
-        async with AsyncSessionLocal() as session:
+        async with ReadSessionLocal() as session:
             query = select(SensorReading).where(
                 SensorReading.sensor_type == "engine_rpm"
             )
@@ -205,7 +238,7 @@ class DataLogger:
         end_time: datetime = None
     ) -> Dict[str, Any]:
         """Get statistics for any sensor"""
-        async with AsyncSessionLocal() as session:
+        async with ReadSessionLocal() as session:
             query = select(SensorReading).where(
                 SensorReading.sensor_type == sensor_type
             )
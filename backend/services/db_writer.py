@@ -0,0 +1,193 @@
+"""
+Database writer - the single writer all mutations go through
+
+SQLite allows one writer at a time. Instead of every caller opening its own
+session and retrying on "database is locked", writes are queued to this
+actor, which applies them on the one writer connection and commits them
+together (group commit):
+
+    setting = await db_writer.write(upsert_setting("sensor_thresholds", thresholds))
+
+A write operation is `async def operation(session) -> result`. Each runs in
+its own savepoint, so a failing operation is rolled back (and its caller
+gets the exception) without affecting the others in the batch; the callers
+of a batch are resumed once its commit is durable.
+
+Operations must not await db_writer.write() themselves (the writer would
+wait for itself). Before start() and after stop() writes run directly in
+their own session.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import settings
+from database.database import AsyncSessionLocal
+from database.models import SystemSettings
+from services.metrics import DB_SECONDS, metrics
+
+logger = logging.getLogger(__name__)
+
+WriteOperation = Callable[[AsyncSession], Awaitable[Any]]
+
+BATCH_SIZE = metrics.histogram(
+    "boatmonitor_db_write_batch_size", "Write operations per group commit",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500)
+)
+WRITE_QUEUE_SECONDS = metrics.histogram(
+    "boatmonitor_db_write_queue_seconds", "Time write operations waited for the writer"
+)
+WRITES_FAILED = metrics.counter(
+    "boatmonitor_db_writes_failed_total", "Write operations that raised or whose commit failed", ("operation",)
+)
+WRITE_QUEUE_DEPTH = metrics.gauge("boatmonitor_db_write_queue_depth", "Write operations waiting")
+
+# (operation, future, name, time queued)
+_Item = Tuple[WriteOperation, asyncio.Future, str, float]
+
+
+class DatabaseWriter:
+    """Serializes all database writes through one connection with group commits"""
+
+    def __init__(self, max_batch: int = 200, max_delay: float = 0.01):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.running = False
+        self.batches = 0
+        self.operations = 0
+        self._queue: "asyncio.Queue[Optional[_Item]]" = asyncio.Queue()
+        self._insert_seconds = DB_SECONDS.labels("insert")
+        self._commit_seconds = DB_SECONDS.labels("commit")
+        WRITE_QUEUE_DEPTH.set_function(self._queue.qsize)
+
+    async def write(self, operation: WriteOperation, name: Optional[str] = None) -> Any:
+        """Run `operation(session)` in the next group commit; returns its result once committed"""
+        name = name or getattr(operation, "__name__", "write")
+        if not self.running:
+            return await self._write_now(operation, name)
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((operation, future, name, time.perf_counter()))
+        return await future
+
+    async def _write_now(self, operation: WriteOperation, name: str) -> Any:
+        async with AsyncSessionLocal() as session:
+            try:
+                result = await operation(session)
+                await session.commit()
+                return result
+            except Exception:
+                await session.rollback()
+                WRITES_FAILED.labels(name).inc()
+                raise
+
+    async def start(self):
+        """Apply queued writes until stopped (the queue is drained first)"""
+        self.running = True
+        logger.info(f"Database writer started (batches up to {self.max_batch}, {self.max_delay * 1000:g} ms window)")
+        while self.running or not self._queue.empty():
+            item = await self._queue.get()
+            if item is None:
+                continue  # Woken by stop()
+            batch = await self._collect(item)
+            try:
+                await self._commit(batch)
+            except Exception as e:
+                logger.error(f"Database writer batch failed: {e}", exc_info=True)
+        logger.info("Database writer stopped")
+
+    async def stop(self):
+        self.running = False
+        self._queue.put_nowait(None)
+
+    async def _collect(self, first: _Item) -> List[_Item]:
+        """Gather what else arrives within the batch window"""
+        batch = [first]
+        deadline = time.perf_counter() + self.max_delay
+        while len(batch) < self.max_batch:
+            if self._queue.empty():
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+            else:
+                item = self._queue.get_nowait()
+            if item is None:
+                break
+            batch.append(item)
+        return batch
+
+    async def _commit(self, batch: List[_Item]):
+        started = time.perf_counter()
+        outcomes = []
+        async with AsyncSessionLocal() as session:
+            for operation, future, name, queued in batch:
+                if future.done():
+                    continue  # Caller gave up (cancelled) before we got to it
+                WRITE_QUEUE_SECONDS.observe(started - queued)
+                try:
+                    async with session.begin_nested():
+                        result = await operation(session)
+                    outcomes.append((future, result, None))
+                except Exception as e:
+                    WRITES_FAILED.labels(name).inc()
+                    outcomes.append((future, None, e))
+            self._insert_seconds.since(started)
+
+            committed = time.perf_counter()
+            try:
+                await session.commit()
+            except Exception as e:
+                await session.rollback()
+                for operation, future, name, _ in batch:
+                    WRITES_FAILED.labels(name).inc()
+                    if not future.done():
+                        future.set_exception(e)
+                raise
+            self._commit_seconds.since(committed)
+
+        self.batches += 1
+        self.operations += len(outcomes)
+        BATCH_SIZE.observe(len(outcomes))
+        for future, result, error in outcomes:
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def status(self) -> dict:
+        return {
+            "running": self.running,
+            "queued": self._queue.qsize(),
+            "batches": self.batches,
+            "operations": self.operations,
+        }
+
+
+def upsert_setting(key: str, value: Any, description: Optional[str] = None) -> WriteOperation:
+    """Write operation that creates or replaces a system_settings row (`description` is set on creation)"""
+    async def save_setting(session: AsyncSession) -> SystemSettings:
+        result = await session.execute(select(SystemSettings).where(SystemSettings.key == key))
+        setting = result.scalar_one_or_none()
+        if setting:
+            setting.value = value
+        else:
+            setting = SystemSettings(key=key, value=value, description=description)
+            session.add(setting)
+        return setting
+    return save_setting
+
+
+# Shared by everything that writes (one per process)
+db_writer = DatabaseWriter(
+    max_batch=settings.DB_WRITE_MAX_BATCH,
+    max_delay=settings.DB_WRITE_BATCH_DELAY
+)
@@ -0,0 +1,352 @@
+"""
+Engine reports - the aggregation behind /api/engine, run by the analytics executor
+
+These are plain synchronous functions over a read-only sqlite3 connection, so
+they can run in a worker process (see services/analytics.py). Aggregation is
+done by SQLite instead of loading every row into Python objects; results
+have the same shape the endpoints always returned.
+
+Readings are read through database/partitions.py, so with monthly
+partitions each query runs once per group of partitions overlapping its
+range and the partial aggregates are combined here. Sealed months are
+decoded from their archive segments into an in-memory table and run
+through the same query.
+"""
+import json
+import sqlite3
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from database.partitions import TIMESTAMP_FORMAT, attached, history_groups
+
+DEFAULT_THRESHOLDS = {
+    "engine_rpm_max": 3000.0,
+    "oil_pressure_min": 20.0,
+    "oil_pressure_max": 80.0,
+    "coolant_temp_max": 95.0,
+}
+ALERT_SENSORS = ("engine_rpm", "oil_pressure", "coolant_temp")
+
+
+def _time_range(start: Optional[datetime], end: Optional[datetime]) -> Tuple[str, list]:
+    """SQL condition and parameters for an optional timestamp range"""
+    clauses = []
+    params = []
+    if start:
+        clauses.append("timestamp >= ?")
+        params.append(start.strftime(TIMESTAMP_FORMAT))
+    if end:
+        clauses.append("timestamp <= ?")
+        params.append(end.strftime(TIMESTAMP_FORMAT))
+    return "".join(f" AND {clause}" for clause in clauses), params
+
+
+def _fold(op: str, a: Any, b: Any) -> Any:
+    if a is None:
+        return b
+    if b is None:
+        return a
+    if op == "sum":
+        return a + b
+    return max(a, b) if op == "max" else min(a, b)
+
+
+def _archive_db(rows: List[tuple]) -> sqlite3.Connection:
+    """In-memory `sensor_readings` holding archived rows"""
+    db = sqlite3.connect(":memory:")
+    db.execute("CREATE TABLE sensor_readings (timestamp TEXT, sensor_type TEXT, sensor_id TEXT, value REAL, unit TEXT)")
+    db.executemany("INSERT INTO sensor_readings VALUES (?, ?, ?, ?, ?)", rows)
+    return db
+
+
+def _sources(
+    db: sqlite3.Connection,
+    start: Optional[datetime],
+    end: Optional[datetime],
+    sensor_types: Sequence[str]
+) -> Iterator[Tuple[sqlite3.Connection, str]]:
+    """
+    (connection, sensor_readings source) pairs covering [start, end], oldest
+    first: each partition group, then the group's sealed months. A pair is
+    only valid until the next one is taken.
+    """
+    for group in history_groups(db, start, end):
+        with attached(db, group):
+            yield db, group.table("sensor_readings")
+        if group.segments:
+            rows = group.archived(sensor_types, None, start, end + timedelta(microseconds=1) if end else None)
+            archived = _archive_db(rows)
+            try:
+                yield archived, "sensor_readings"
+            finally:
+                archived.close()
+
+
+def _aggregate(
+    db: sqlite3.Connection,
+    start: Optional[datetime],
+    end: Optional[datetime],
+    sensor_types: Sequence[str],
+    query: str,
+    params: list,
+    ops: Sequence[str]
+) -> tuple:
+    """
+    One row of aggregates over the readings of `sensor_types` in [start, end];
+    `query` reads `{sensor_readings}` and each column is combined across
+    sources with its op ("sum", "max" or "min")
+    """
+    totals: List[Any] = [None] * len(ops)
+    for connection, source in _sources(db, start, end, sensor_types):
+        # fetchall() finishes the statement, so the partitions can be detached
+        row, = connection.execute(query.format(sensor_readings=source), params).fetchall()
+        totals = [_fold(op, total, value) for op, total, value in zip(ops, totals, row)]
+    return tuple(totals)
+
+
+def _rows(
+    db: sqlite3.Connection,
+    start: Optional[datetime],
+    end: Optional[datetime],
+    sensor_types: Sequence[str],
+    query: str,
+    params: list,
+    stop: Optional[Callable[[list], bool]] = None
+) -> list:
+    """Rows of `query` (reading `{sensor_readings}`) over each source in turn, oldest first"""
+    rows: list = []
+    for connection, source in _sources(db, start, end, sensor_types):
+        rows.extend(connection.execute(query.format(sensor_readings=source), params).fetchall())
+        if stop and stop(rows):
+            break
+    return rows
+
+
+def _isoformat(timestamp: Optional[str]) -> Optional[str]:
+    return datetime.fromisoformat(timestamp).isoformat() if timestamp else None
+
+
+def sensor_stats(
+    db: sqlite3.Connection,
+    sensor_type: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+) -> Dict[str, Any]:
+    """Count, min, max and average of one sensor over a time range"""
+    condition, params = _time_range(start, end)
+    count, maximum, minimum, total, first, last = _aggregate(
+        db, start, end, [sensor_type],
+        "SELECT COUNT(*), MAX(value), MIN(value), TOTAL(value), MIN(timestamp), MAX(timestamp) "
+        f"FROM {{sensor_readings}} WHERE sensor_type = ?{condition}",
+        [sensor_type, *params],
+        ("sum", "max", "min", "sum", "min", "max")
+    )
+    if not count:
+        return {"error": "No data found"}
+
+    unit = _rows(
+        db, start, end, [sensor_type],
+        f"SELECT unit FROM {{sensor_readings}} WHERE sensor_type = ?{condition} LIMIT 1",
+        [sensor_type, *params],
+        stop=bool
+    )[0][0]
+    return {
+        "sensor_type": sensor_type,
+        "total_readings": count,
+        "max": maximum,
+        "min": minimum,
+        "avg": round(total / count, 2),
+        "unit": unit or "",
+        "start_time": _isoformat(first),
+        "end_time": _isoformat(last),
+    }
+
+
+def engine_usage(
+    db: sqlite3.Connection,
+    start: Optional[datetime],
+    end: Optional[datetime],
+    log_interval: float
+) -> Dict[str, Any]:
+    """Engine hours and RPM statistics over a time range"""
+    condition, params = _time_range(start, end)
+    total, running, maximum, running_total, minimum = _aggregate(
+        db, start, end, ["engine_rpm"],
+        "SELECT COUNT(*), COUNT(CASE WHEN value > 0 THEN 1 END), "
+        "MAX(CASE WHEN value > 0 THEN value END), TOTAL(CASE WHEN value > 0 THEN value END), "
+        "MIN(CASE WHEN value > 0 THEN value END) "
+        f"FROM {{sensor_readings}} WHERE sensor_type = 'engine_rpm'{condition}",
+        params,
+        ("sum", "sum", "max", "sum", "min")
+    )
+    if not total:
+        return {"total_readings": 0, "engine_hours": 0, "max_rpm": 0, "avg_rpm": 0}
+
+    return {
+        "total_readings": total,
+        "engine_running_readings": running,
+        "engine_hours": round(running * log_interval / 3600, 2),
+        "max_rpm": maximum or 0,
+        "avg_rpm": round(running_total / running, 1) if running else 0,
+        "min_rpm": minimum or 0,
+    }
+
+
+def load_thresholds(db: sqlite3.Connection) -> Dict[str, float]:
+    """Alert thresholds saved through /api/thresholds, or the defaults"""
+    row = db.execute("SELECT value FROM system_settings WHERE key = 'sensor_thresholds'").fetchone()
+    thresholds = json.loads(row[0]) if row and row[0] else None
+    return thresholds or DEFAULT_THRESHOLDS
+
+
+def threshold_violations(
+    db: sqlite3.Connection,
+    start: Optional[datetime],
+    end: Optional[datetime],
+    thresholds: Dict[str, float]
+) -> Dict[str, int]:
+    """How many readings exceeded the configured thresholds"""
+    condition, params = _time_range(start, end)
+    rpm_exceeded, oil_low, oil_high, temp_high = _aggregate(
+        db, start, end, ALERT_SENSORS,
+        "SELECT "
+        "COUNT(CASE WHEN sensor_type = 'engine_rpm' AND value > ? THEN 1 END), "
+        "COUNT(CASE WHEN sensor_type = 'oil_pressure' AND value < ? AND value > 0 THEN 1 END), "
+        "COUNT(CASE WHEN sensor_type = 'oil_pressure' AND value > ? THEN 1 END), "
+        "COUNT(CASE WHEN sensor_type = 'coolant_temp' AND value > ? THEN 1 END) "
+        "FROM {sensor_readings} "
+        f"WHERE sensor_type IN ('engine_rpm', 'oil_pressure', 'coolant_temp'){condition}",
+        [
+            thresholds["engine_rpm_max"], thresholds["oil_pressure_min"],
+            thresholds["oil_pressure_max"], thresholds["coolant_temp_max"], *params
+        ],
+        ("sum", "sum", "sum", "sum")
+    )
+    return {
+        "rpm_exceeded": rpm_exceeded,
+        "oil_low": oil_low,
+        "oil_high": oil_high,
+        "temp_high": temp_high,
+        "total": rpm_exceeded + oil_low + oil_high + temp_high,
+    }
+
+
+def engine_statistics(
+    db: sqlite3.Connection,
+    start: Optional[datetime],
+    end: Optional[datetime],
+    thresholds: Optional[Dict[str, float]],
+    log_interval: float
+) -> Dict[str, Any]:
+    """Everything /api/engine/statistics returns (thresholds default to the saved ones)"""
+    if thresholds is None:
+        thresholds = load_thresholds(db)
+    return {
+        "engine": engine_usage(db, start, end, log_interval),
+        "oil_pressure": sensor_stats(db, "oil_pressure", start, end),
+        "coolant_temperature": sensor_stats(db, "coolant_temp", start, end),
+        "thresholds": thresholds,
+        "violations": threshold_violations(db, start, end, thresholds),
+    }
+
+
+def usage_summary(db: sqlite3.Connection, start: datetime, end: datetime, days: int) -> Dict[str, Any]:
+    """Daily engine usage (readings, max/avg RPM, estimated hours) since `start`"""
+    by_day: Dict[str, list] = {}
+    for day, *values in _rows(
+        db, start, None, ["engine_rpm"],
+        "SELECT substr(timestamp, 1, 10) AS day, COUNT(*), "
+        "COUNT(CASE WHEN value > 0 THEN 1 END), "
+        "TOTAL(CASE WHEN value > 0 THEN value END), "
+        "MAX(CASE WHEN value > 0 THEN value END) "
+        "FROM {sensor_readings} WHERE sensor_type = 'engine_rpm' AND timestamp >= ? "
+        "GROUP BY day ORDER BY day",
+        [start.strftime(TIMESTAMP_FORMAT)]
+    ):
+        # A sealed month's days also have rows in its group (readings from before partitioning)
+        totals = by_day.get(day, [None] * len(values))
+        by_day[day] = [_fold(op, total, value) for op, total, value in zip(("sum", "sum", "sum", "max"), totals, values)]
+    rows = [(day, *values) for day, values in sorted(by_day.items())]
+
+    total_readings = sum(row[1] for row in rows)
+    if not total_readings:
+        return {
+            "days": days,
+            "total_readings": 0,
+            "engine_hours": 0,
+            "summary": "No engine usage recorded"
+        }
+
+    daily_usage = []
+    for day, _, running, total_rpm, max_rpm in rows:
+        usage = {
+            "date": day,
+            "readings": running,
+            "max_rpm": max_rpm or 0,
+            "avg_rpm": 0,
+            "total_rpm": total_rpm,
+        }
+        if running:
+            usage["avg_rpm"] = round(total_rpm / running, 1)
+            # Estimate hours (assuming 60-second logging interval)
+            usage["estimated_hours"] = round(running * 60 / 3600, 2)
+        daily_usage.append(usage)
+
+    return {
+        "days": days,
+        "start_date": start.isoformat(),
+        "end_date": end.isoformat(),
+        "total_readings": total_readings,
+        "daily_usage": daily_usage
+    }
+
+
+def engine_alerts(db: sqlite3.Connection, start: datetime, days: int) -> Dict[str, Any]:
+    """High RPM, low oil pressure and high coolant temperature events since `start`"""
+    since = start.strftime(TIMESTAMP_FORMAT)
+    high_rpm, max_rpm, low_oil, min_oil, high_temp, max_temp = _aggregate(
+        db, start, None, ALERT_SENSORS,
+        "SELECT "
+        "COUNT(CASE WHEN sensor_type = 'engine_rpm' AND value > 3000 THEN 1 END), "
+        "MAX(CASE WHEN sensor_type = 'engine_rpm' AND value > 3000 THEN value END), "
+        "COUNT(CASE WHEN sensor_type = 'oil_pressure' AND value < 20 AND value > 0 THEN 1 END), "
+        "MIN(CASE WHEN sensor_type = 'oil_pressure' AND value < 20 AND value > 0 THEN value END), "
+        "COUNT(CASE WHEN sensor_type = 'coolant_temp' AND value > 95 THEN 1 END), "
+        "MAX(CASE WHEN sensor_type = 'coolant_temp' AND value > 95 THEN value END) "
+        "FROM {sensor_readings} "
+        "WHERE sensor_type IN ('engine_rpm', 'oil_pressure', 'coolant_temp') AND timestamp >= ?",
+        [since],
+        ("sum", "max", "sum", "min", "sum", "max")
+    )
+
+    alerts = []
+    if high_rpm:
+        alerts.append({
+            "severity": "warning",
+            "type": "high_rpm",
+            "message": f"Engine RPM exceeded 3000 on {high_rpm} occasions",
+            "count": high_rpm,
+            "max_value": max_rpm
+        })
+    if low_oil:
+        alerts.append({
+            "severity": "critical",
+            "type": "low_oil_pressure",
+            "message": f"Low oil pressure detected on {low_oil} occasions",
+            "count": low_oil,
+            "min_value": min_oil
+        })
+    if high_temp:
+        alerts.append({
+            "severity": "warning",
+            "type": "high_temperature",
+            "message": f"Coolant temperature exceeded 95°C on {high_temp} occasions",
+            "count": high_temp,
+            "max_value": max_temp
+        })
+
+    return {
+        "days": days,
+        "total_alerts": len(alerts),
+        "alerts": alerts
+    }
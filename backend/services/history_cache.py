@@ -0,0 +1,182 @@
+"""
+History cache - the last HISTORY_CACHE_HOURS of sensor readings in memory
+
+The data logger adds every sample it logs to a per-sensor ring of
+timestamps (microseconds, array('q')) and values (array('d')), and warms
+the rings from the database when it starts. From then on the ring of a
+sensor holds all its readings since a known instant, so
+/api/history/sensors/{id} answers from memory whenever the requested page
+lies entirely after it: a start inside the window, or `limit` readings
+inside it. Anything older goes to the database as before.
+
+The cache lives in the process that runs the data logger; in acquisition
+mode (ACQUISITION_PROCESS) the web process's cache stays cold and every
+query reads the database.
+"""
+import logging
+import math
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import settings
+from database.archive import from_micros, to_micros
+from database.database import run_read
+from database.partitions import TIMESTAMP_FORMAT, attached, history_groups
+from services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+CACHE_REQUESTS = metrics.counter(
+    "boatmonitor_history_cache_requests_total", "Sensor history requests by cache result", ("result",)
+)
+CACHED_READINGS = metrics.gauge("boatmonitor_history_cache_readings", "Sensor readings held in the history cache")
+
+HOUR_US = 3600 * 1_000_000
+
+
+class _Ring:
+    """One sensor's readings in time order, complete from `since` (microseconds)"""
+
+    def __init__(self, since: int, unit: Optional[str]):
+        self.since = since
+        self.unit = unit
+        self.times = array("q")
+        self.values = array("d")
+
+    def add(self, timestamp: int, value: Optional[float]):
+        value = math.nan if value is None else value
+        if not self.times or timestamp >= self.times[-1]:
+            self.times.append(timestamp)
+            self.values.append(value)
+        else:
+            # Clock stepped back: keep the ring sorted
+            i = bisect_right(self.times, timestamp)
+            self.times.insert(i, timestamp)
+            self.values.insert(i, value)
+
+    def trim(self, cutoff: int):
+        """Forget readings before `cutoff`, in batches so appends stay cheap"""
+        stale = bisect_left(self.times, cutoff)
+        if stale and stale >= len(self.times) // 8:
+            del self.times[:stale]
+            del self.values[:stale]
+            self.since = max(self.since, cutoff)
+
+
+def _recent_readings(db, since: datetime) -> List[tuple]:
+    """(timestamp, sensor_type, value, unit) of the sensor readings since `since`, in time order"""
+    rows: List[tuple] = []
+    for group in history_groups(db, since):
+        with attached(db, group):
+            cursor = db.cursor()
+            try:
+                cursor.execute(
+                    f"SELECT timestamp, sensor_type, value, unit FROM {group.table('sensor_readings')} "
+                    "WHERE timestamp >= ? ORDER BY timestamp",
+                    [since.strftime(TIMESTAMP_FORMAT)]
+                )
+                rows.extend(cursor.fetchall())
+            finally:
+                cursor.close()
+        if group.segments:
+            rows.extend(
+                (timestamp, sensor_type, value, unit)
+                for timestamp, sensor_type, _, value, unit in group.archived(None, None, since)
+            )
+    rows.sort(key=lambda row: row[0])
+    return rows
+
+
+class HistoryCache:
+    """Per-sensor rings of recent readings, filled by the data logger"""
+
+    def __init__(self, hours: float):
+        self.window = int(hours * HOUR_US)
+        self.rings: Dict[str, _Ring] = {}
+        self.since: Optional[int] = None  # Complete from here for sensors without a ring; None = cold
+        CACHED_READINGS.set_function(lambda: sum(len(ring.times) for ring in self.rings.values()))
+
+    async def warm(self):
+        """Load the window from the database (before the data logger writes anything)"""
+        since = datetime.utcnow() - timedelta(microseconds=self.window)
+        rows = await run_read(_recent_readings, since)
+        self.rings.clear()
+        self.since = to_micros(since)
+        for timestamp, sensor_id, value, unit in rows:
+            self._add(sensor_id, to_micros(datetime.fromisoformat(timestamp)), value, unit)
+        logger.info(f"History cache warmed with {len(rows)} readings of {len(self.rings)} sensors")
+
+    def add(self, sample: Dict[str, Any], units: Dict[str, Optional[str]]):
+        """Add a logged sample ({"t": timestamp, "sensors": {id: value}}); ignored while cold"""
+        if self.since is None:
+            return
+        timestamp = to_micros(datetime.fromisoformat(sample["t"]))
+        for sensor_id, value in sample["sensors"].items():
+            self._add(sensor_id, timestamp, value, units.get(sensor_id))
+            self.rings[sensor_id].trim(timestamp - self.window)
+
+    def _add(self, sensor_id: str, timestamp: int, value: Optional[float], unit: Optional[str]):
+        ring = self.rings.get(sensor_id)
+        if ring is None:
+            ring = self.rings[sensor_id] = _Ring(self.since, unit)
+        elif ring.unit != unit:
+            # The sensor's unit changed: older readings (with the old unit) come from the database
+            ring = self.rings[sensor_id] = _Ring(timestamp, unit)
+        if timestamp >= ring.since:
+            ring.add(timestamp, value)
+
+    def latest(
+        self,
+        sensor_id: str,
+        start: Optional[datetime],
+        end: Optional[datetime],
+        limit: int
+    ) -> Optional[List[Tuple[datetime, Optional[float], Optional[str]]]]:
+        """
+        The newest `limit` readings of a sensor in [start, end], newest first,
+        or None when the answer may include readings older than the cache
+        """
+        if self.since is None or limit <= 0:
+            CACHE_REQUESTS.labels("miss").inc()
+            return None
+        ring = self.rings.get(sensor_id)
+        since = ring.since if ring else self.since
+        times = ring.times if ring else array("q")
+        low = bisect_left(times, to_micros(start)) if start else 0
+        high = bisect_right(times, to_micros(end)) if end else len(times)
+        low = max(low, high - limit)
+        if high - low < limit and (start is None or to_micros(start) < since):
+            CACHE_REQUESTS.labels("miss").inc()
+            return None
+        if high - low == limit and low > 0 and times[low - 1] == times[low]:
+            # The page would end between readings with the same timestamp: no timestamp cursor for the next one
+            CACHE_REQUESTS.labels("miss").inc()
+            return None
+
+        CACHE_REQUESTS.labels("hit").inc()
+        rows = []
+        for i in range(high - 1, low - 1, -1):
+            value = ring.values[i]
+            rows.append((from_micros(times[i]), None if math.isnan(value) else value, ring.unit))
+        return rows
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "hours": self.window / HOUR_US,
+            "warm": self.since is not None,
+            "sensors": len(self.rings),
+            "readings": sum(len(ring.times) for ring in self.rings.values()),
+        }
+
+
+def create_history_cache() -> Optional[HistoryCache]:
+    """Create the history cache from settings, if it is on"""
+    if settings.HISTORY_CACHE_HOURS <= 0:
+        return None
+    return HistoryCache(settings.HISTORY_CACHE_HOURS)
+
+
+# Filled by the data logger, read by the history API (None when off)
+history_cache = create_history_cache()
@@ -0,0 +1,114 @@
+"""
+History export - writes recorded readings as NDJSON, run by the analytics executor
+
+Produces the export format HistoryReplay reads (see services/replay.py), in
+timestamp order. Like the engine reports these are synchronous functions
+over a read-only sqlite3 connection; the export job calls export_chunk()
+once per time window so progress can be reported and other reports get a
+turn between chunks. Partition groups (database/partitions.py) are read
+oldest first, so the output stays in timestamp order; sealed months'
+sensor readings are merged in from their archive segments.
+"""
+import heapq
+import json
+import sqlite3
+from datetime import datetime
+from itertools import islice
+from typing import Iterable, List, Optional, Tuple
+
+from database.archive import from_micros, open_segment
+
+from database.partitions import TIMESTAMP_FORMAT, attached, history_groups
+
+
+def history_range(db: sqlite3.Connection) -> Tuple[Optional[str], Optional[str]]:
+    """First and last timestamp recorded in either table"""
+    firsts, lasts = [], []
+    for group in history_groups(db):
+        with attached(db, group):
+            (first, last), = db.execute(
+                "SELECT MIN(first), MAX(last) FROM ("
+                f"SELECT MIN(timestamp) AS first, MAX(timestamp) AS last FROM {group.table('sensor_readings')} "
+                f"UNION ALL SELECT MIN(timestamp), MAX(timestamp) FROM {group.table('victron_readings')})"
+            ).fetchall()  # fetchone() would leave the statement open and the partitions locked
+        firsts += [first] if first else []
+        lasts += [last] if last else []
+        for _, path in group.segments:
+            segment = open_segment(path)
+            if segment.first is not None:
+                firsts.append(from_micros(segment.first).strftime(TIMESTAMP_FORMAT))
+                lasts.append(from_micros(segment.last).strftime(TIMESTAMP_FORMAT))
+    return min(firsts, default=None), max(lasts, default=None)
+
+
+def export_chunk(
+    db: sqlite3.Connection,
+    path: str,
+    start: str,
+    end: str,
+    sensors: Optional[List[str]] = None,
+    victron: bool = True
+) -> int:
+    """Append readings with start <= timestamp < end to `path`; returns the number written"""
+    sensor_filter = ""
+    params: list = [start, end]
+    if sensors:
+        sensor_filter = f" AND sensor_id IN ({', '.join('?' * len(sensors))})"
+        params.extend(sensors)
+    query = (
+        "SELECT timestamp, 0, sensor_id, value, NULL FROM {sensor_readings} "
+        f"WHERE timestamp >= ? AND timestamp < ?{sensor_filter}"
+    )
+    if victron:
+        query += (
+            " UNION ALL SELECT timestamp, 1, device_id, NULL, data FROM {victron_readings} "
+            "WHERE timestamp >= ? AND timestamp < ?"
+        )
+        params.extend([start, end])
+    query += " ORDER BY 1, 2"
+
+    count = 0
+    start_time, end_time = datetime.fromisoformat(start), datetime.fromisoformat(end)
+    with open(path, "a") as f:
+        for group in history_groups(db, start_time, end_time):
+            with attached(db, group):
+                rows: Iterable[tuple] = db.execute(query.format(
+                    sensor_readings=group.table("sensor_readings"),
+                    victron_readings=group.table("victron_readings")
+                ), params)
+                if group.segments:
+                    archived = [
+                        (timestamp, 0, sensor_id, value, None)
+                        for timestamp, _, sensor_id, value, _ in group.archived(None, sensors, start_time, end_time)
+                    ]
+                    rows = heapq.merge(rows, archived, key=lambda row: row[:2])
+                count += _write_rows(f, rows)
+    return count
+
+
+def _write_rows(f, rows: Iterable[tuple]) -> int:
+    count = 0
+    dumps = json.dumps
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, 5000))
+        if not batch:
+            break
+        lines = []
+        for timestamp, kind, name, value, data in batch:
+            # Stored as "YYYY-MM-DD HH:MM:SS.ffffff"; the T makes it ISO 8601
+            timestamp = dumps(timestamp.replace(" ", "T", 1))
+            if kind == 0:
+                lines.append(
+                    f'{{"type": "sensor", "timestamp": {timestamp}, "sensor_id": {dumps(name)}, '
+                    f'"value": {dumps(value)}}}\n'
+                )
+            else:
+                # Victron data is already JSON text in the database
+                lines.append(
+                    f'{{"type": "victron", "timestamp": {timestamp}, "device_id": {dumps(name)}, '
+                    f'"data": {data or "{}"}}}\n'
+                )
+        f.writelines(lines)
+        count += len(batch)
+    return count
@@ -0,0 +1,281 @@
+"""
+Job handlers - the background job types behind /api/jobs
+
+- history_export: NDJSON export of recorded readings (the replay format)
+- engine_report: engine statistics, usage summary or alerts over any range
+- database_backup: consistent copy of the database while logging continues
+- partition_history: moves readings from before DB_PARTITIONING into the
+  monthly partitions
+
+Database-heavy steps run in the analytics executor with the job context as
+the cancellation source, so cancelling a job interrupts its query.
+"""
+import asyncio
+import os
+import sqlite3
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from sqlalchemy import text
+
+from config import settings
+from database import archive, partitions
+from database.database import run_read
+from database.models import SensorReading, VictronReading
+from database.partitions import TIMESTAMP_FORMAT
+from services import engine_reports, history_export
+from services.analytics import AnalyticsCancelled, database_path
+from services.db_writer import db_writer
+from services.jobs import JobCancelled, JobContext, job_handler
+from services.partitions import partition_manager
+
+EXPORT_CHUNK = timedelta(hours=6)  # One analytics call per window, progress reported in between
+BACKUP_PAGES_PER_STEP = 1024
+MIGRATE_CHUNK = timedelta(days=1)  # Rows moved per write, so the data logger keeps getting turns
+HISTORY_MODELS = (SensorReading, VictronReading)
+
+
+def _parse_date(value: Optional[str]) -> Optional[datetime]:
+    # Stored timestamps (and the defaults taken from them) are naive UTC
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+async def _analytics(ctx: JobContext, function, *args):
+    """Run a step in the analytics executor, cancelled with the job"""
+    if ctx.analytics is None:
+        raise RuntimeError("Analytics executor not available")
+    try:
+        return await ctx.analytics.run(function, *args, request=ctx, timeout=settings.JOB_TIMEOUT)
+    except AnalyticsCancelled as e:
+        if ctx.cancelled:
+            raise JobCancelled(f"Job {ctx.job_id} cancelled") from e
+        raise
+
+
+def _columns(model) -> str:
+    """Columns copied between databases (not the id: each file numbers its own rows)"""
+    return ", ".join(column.name for column in model.__table__.columns if column.name != "id")
+
+
+def _remove(path: str):
+    if os.path.exists(path):
+        os.remove(path)
+
+
+@job_handler("history_export", priority=5)
+async def export_history(
+    ctx: JobContext,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    sensors: Optional[List[str]] = None,
+    victron: bool = True
+) -> dict:
+    """NDJSON export of recorded readings, replayable with REPLAY_SOURCE"""
+    first, last = await _analytics(ctx, history_export.history_range)
+    start = _parse_date(start_date) or (datetime.fromisoformat(first) if first else datetime.utcnow())
+    # The end is exclusive, so step past the last recorded reading
+    end = _parse_date(end_date) or (datetime.fromisoformat(last) + timedelta(microseconds=1) if last else start)
+
+    os.makedirs(settings.EXPORT_DIR, exist_ok=True)
+    path = os.path.join(settings.EXPORT_DIR, f"history-{ctx.job_id}.ndjson")
+    partial = path + ".part"
+    _remove(partial)
+    open(partial, "w").close()
+
+    records = 0
+    total = max((end - start).total_seconds(), 1.0)
+    try:
+        window_start = start
+        while window_start < end:
+            ctx.check_cancelled()
+            window_end = min(window_start + EXPORT_CHUNK, end)
+            records += await _analytics(
+                ctx, history_export.export_chunk, partial,
+                window_start.strftime(TIMESTAMP_FORMAT), window_end.strftime(TIMESTAMP_FORMAT),
+                sensors, victron
+            )
+            window_start = window_end
+            ctx.progress((window_start - start).total_seconds() / total, f"{records} records exported")
+        os.replace(partial, path)
+    except BaseException:
+        _remove(partial)
+        raise
+
+    return {
+        "file": path,
+        "records": records,
+        "bytes": os.path.getsize(path),
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+    }
+
+
+@job_handler("engine_report", priority=10)
+async def engine_report(
+    ctx: JobContext,
+    report: str = "statistics",
+    days: Optional[int] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None
+) -> dict:
+    """Engine statistics, usage summary or alerts over any range"""
+    end = _parse_date(end_date) or datetime.utcnow()
+    start = _parse_date(start_date)
+    if start is None and (days or report != "statistics"):
+        start = end - timedelta(days=days or 7)
+
+    ctx.progress(0.0, f"Running {report}")
+    if report == "statistics":
+        return await _analytics(
+            ctx, engine_reports.engine_statistics, start, _parse_date(end_date), None, settings.HISTORY_SAVE_INTERVAL
+        )
+    if report == "usage_summary":
+        return await _analytics(ctx, engine_reports.usage_summary, start, end, days or 7)
+    if report == "alerts":
+        return await _analytics(ctx, engine_reports.engine_alerts, start, days or 7)
+    raise ValueError(f"Unknown engine report {report}")
+
+
+@job_handler("database_backup", keep_files=True, protected=True)
+async def database_backup(ctx: JobContext) -> dict:
+    """Consistent copy of the database file (history partitions merged in), made while logging continues"""
+    source = database_path(settings.DATABASE_URL)
+    os.makedirs(settings.BACKUP_DIR, exist_ok=True)
+    path = os.path.join(settings.BACKUP_DIR, f"boatmonitor-{datetime.utcnow():%Y%m%d-%H%M%S}.db")
+    partial = path + ".part"
+
+    def progress(status, remaining, total):
+        # Raising here aborts the backup
+        ctx.check_cancelled()
+        ctx.progress((total - remaining) / total if total else 1.0, f"{total - remaining} of {total} pages copied")
+
+    def copy():
+        source_db = sqlite3.connect(f"file:{source}?mode=ro", uri=True)
+        backup_db = sqlite3.connect(partial)
+        try:
+            # SQLite's online backup copies a consistent snapshot in small steps,
+            # so the data logger is never locked out for long
+            source_db.backup(backup_db, pages=BACKUP_PAGES_PER_STEP, progress=progress)
+            _merge_partitions(backup_db)
+        finally:
+            backup_db.close()
+            source_db.close()
+
+    _remove(partial)
+    try:
+        await asyncio.to_thread(copy)
+        os.replace(partial, path)
+    except BaseException:
+        _remove(partial)
+        raise
+
+    return {"file": path, "bytes": os.path.getsize(path)}
+
+
+def _merge_partitions(db: sqlite3.Connection):
+    """Copy the partitions' and archive segments' readings into a backup so it is one self-contained file"""
+    catalog = partitions.active_partitions(db)
+    sealed = partitions.sealed_segments(db)
+    for name, path in catalog:
+        schema = partitions.schema_name(name)
+        db.execute(f"ATTACH DATABASE ? AS {schema}", [path])
+        try:
+            with db:
+                for model in HISTORY_MODELS:
+                    columns = _columns(model)
+                    table = model.__tablename__
+                    condition = ""
+                    if name in sealed and model is SensorReading:
+                        condition = f" WHERE id > {sealed[name][1]}"  # The rest is in the segment
+                    db.execute(f"INSERT INTO main.{table} ({columns}) SELECT {columns} FROM {schema}.{table}{condition}")
+        finally:
+            db.execute(f"DETACH DATABASE {schema}")
+    for path, _ in sealed.values():
+        with db:
+            db.executemany(
+                "INSERT INTO main.sensor_readings (timestamp, sensor_type, sensor_id, value, unit) VALUES (?, ?, ?, ?, ?)",
+                (
+                    (archive.from_micros(timestamp).strftime(TIMESTAMP_FORMAT), sensor_type, sensor_id, value, unit)
+                    for timestamp, sensor_type, sensor_id, value, unit in archive.open_segment(path).samples()
+                )
+            )
+    if catalog or sealed:
+        with db:
+            db.execute("DELETE FROM history_partitions")
+            db.execute("DELETE FROM archive_segments")
+
+
+@job_handler("partition_history")
+async def partition_history(ctx: JobContext) -> dict:
+    """Move readings recorded before DB_PARTITIONING into the monthly partitions"""
+    if partition_manager is None:
+        raise ValueError("History partitioning is disabled (DB_PARTITIONING)")
+
+    def legacy_range(db) -> tuple:
+        # Main database tables only: no partitions are attached here
+        cursor = db.cursor()
+        try:
+            cursor.execute(
+                "SELECT MIN(first), MAX(last) FROM ("
+                "SELECT MIN(timestamp) AS first, MAX(timestamp) AS last FROM sensor_readings "
+                "UNION ALL SELECT MIN(timestamp), MAX(timestamp) FROM victron_readings)"
+            )
+            return cursor.fetchone()
+        finally:
+            cursor.close()
+
+    first, last = await run_read(legacy_range)
+    sealed = await run_read(partitions.sealed_segments)
+    if first is None:
+        return {"rows": 0, "partitions": []}
+    start = datetime.fromisoformat(first)
+    end = datetime.fromisoformat(last) + timedelta(microseconds=1)
+
+    moved = 0
+    names = []
+    total = max((end - start).total_seconds(), 1.0)
+    month = datetime(start.year, start.month, 1)
+    while month < end:
+        name = partitions.partition_name(month)
+        month_end = partitions.add_months(month, 1)
+        schema = partitions.schema_name(name)
+        # Sealed months only take Victron readings; their old sensor rows are still read from main
+        models = (VictronReading,) if name in sealed else HISTORY_MODELS
+        was_writable = name in partition_manager.writable
+        await partition_manager.ensure([name])
+        try:
+            chunk_start = max(month, start)
+            while chunk_start < min(month_end, end):
+                ctx.check_cancelled()
+                chunk_end = min(chunk_start + MIGRATE_CHUNK, month_end)
+                bounds = {"start": chunk_start.strftime(TIMESTAMP_FORMAT), "end": chunk_end.strftime(TIMESTAMP_FORMAT)}
+
+                async def move_rows(session) -> int:
+                    count = 0
+                    for model in models:
+                        columns = _columns(model)
+                        table = model.__tablename__
+                        condition = "timestamp >= :start AND timestamp < :end"
+                        await session.execute(text(
+                            f"INSERT INTO {schema}.{table} ({columns}) "
+                            f"SELECT {columns} FROM main.{table} WHERE {condition} ORDER BY timestamp"
+                        ), bounds)
+                        result = await session.execute(text(f"DELETE FROM main.{table} WHERE {condition}"), bounds)
+                        count += result.rowcount
+                    return count
+
+                moved += await db_writer.write(move_rows)
+                chunk_start = chunk_end
+                ctx.progress((chunk_start - start).total_seconds() / total, f"{moved} rows moved")
+        finally:
+            if not was_writable:
+                partition_manager.release(name)
+        names.append(name)
+        month = month_end
+
+    return {"rows": moved, "partitions": names}
@@ -0,0 +1,448 @@
+"""
+Background jobs - a persistent queue for work too slow for a request
+
+Exports, backups and long reports are submitted as jobs instead of running
+inside the HTTP request. Jobs are rows in the `jobs` table, so they survive
+a restart (jobs that were running are queued again), and a small pool of
+worker coroutines runs them highest priority first:
+
+- progress: handlers report a fraction and message, visible in /api/jobs
+- cancellation: DELETE /api/jobs/{id} stops a queued job, and interrupts a
+  running one (including its analytics query)
+- result reuse: submitting the same job type and parameters again returns
+  the job already queued or running, or a recent successful result
+
+Handlers are registered with @job_handler (see services/job_handlers.py):
+
+    @job_handler("database_backup")
+    async def database_backup(ctx: JobContext) -> dict:
+        ctx.progress(0.5, "Copying pages")
+        ...
+"""
+import asyncio
+import hashlib
+import inspect
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, select, update
+
+from config import settings
+from database.database import ReadSessionLocal
+from database.models import Job
+from services.db_writer import db_writer
+from services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+POLL_INTERVAL = 5.0  # Workers also look for jobs this often without being woken
+CLEANUP_INTERVAL = 3600.0
+
+JOBS_FINISHED = metrics.counter(
+    "boatmonitor_jobs_finished_total", "Background jobs finished", ("type", "status")
+)
+JOB_SECONDS = metrics.histogram(
+    "boatmonitor_job_seconds", "Background job run time", ("type",),
+    buckets=(0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0)
+)
+JOBS_RUNNING = metrics.gauge("boatmonitor_jobs_running", "Background jobs running")
+
+
+class JobCancelled(Exception):
+    """Raised inside a handler when its job has been cancelled"""
+
+
+class JobContext:
+    """What a running handler sees of its job: progress reporting and cancellation"""
+
+    def __init__(self, job_id: int, job_type: str, analytics=None):
+        self.job_id = job_id
+        self.job_type = job_type
+        self.analytics = analytics  # AnalyticsExecutor for database-heavy steps
+        self.fraction = 0.0
+        self.message: Optional[str] = None
+        self.cancelled = False
+        self.task: Optional[asyncio.Task] = None
+
+    def progress(self, fraction: float, message: Optional[str] = None):
+        """Report progress (0 - 1); cheap enough to call per chunk"""
+        self.fraction = min(max(fraction, 0.0), 1.0)
+        if message is not None:
+            self.message = message
+
+    def check_cancelled(self):
+        """Raise JobCancelled if the job has been cancelled"""
+        if self.cancelled:
+            raise JobCancelled(f"Job {self.job_id} cancelled")
+
+    async def is_disconnected(self) -> bool:
+        """Lets the context stand in for the request in analytics.run(), so cancelling interrupts the query"""
+        return self.cancelled
+
+    def cancel(self):
+        self.cancelled = True
+        if self.task and not self.task.done():
+            self.task.cancel()
+
+
+@dataclass
+class JobType:
+    """A registered kind of job"""
+    name: str
+    handler: Callable[..., Awaitable[Dict[str, Any]]]
+    priority: int = 0
+    keep_files: bool = False  # Result files survive job cleanup (backups)
+    description: str = ""
+    protected: bool = False  # Submitting it needs the settings password (backups)
+
+
+_job_types: Dict[str, JobType] = {}
+
+
+def job_handler(name: str, priority: int = 0, keep_files: bool = False, protected: bool = False):
+    """Register `async def handler(ctx, **params) -> dict` as job type `name`"""
+    def register(handler):
+        _job_types[name] = JobType(
+            name, handler, priority, keep_files, (handler.__doc__ or "").strip().split("\n")[0], protected
+        )
+        return handler
+    return register
+
+
+def requires_password(name: str, download: bool = False) -> bool:
+    """Whether submitting a job type (or downloading its result file) needs the settings password"""
+    job_type = _job_types.get(name)
+    if job_type is None:
+        return False
+    return job_type.protected or (download and job_type.keep_files)
+
+
+def job_types() -> List[Dict[str, Any]]:
+    """Registered job types and their parameters"""
+    return [
+        {
+            "type": job_type.name,
+            "description": job_type.description,
+            "priority": job_type.priority,
+            "protected": job_type.protected,
+            "params": list(inspect.signature(job_type.handler).parameters)[1:],
+        }
+        for job_type in _job_types.values()
+    ]
+
+
+def _params_hash(job_type: str, params: Dict[str, Any]) -> str:
+    canonical = json.dumps([job_type, params], sort_keys=True, default=str)
+    return hashlib.sha1(canonical.encode()).hexdigest()
+
+
+def _isoformat(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+class JobQueue:
+    """Persistent priority queue of background jobs with a worker pool"""
+
+    def __init__(self, workers: int = 1, result_ttl: float = 600.0, keep_days: float = 7.0, analytics=None):
+        self.workers = max(workers, 1)
+        self.analytics = analytics
+        self.result_ttl = result_ttl
+        self.keep_days = keep_days
+        self.running = False
+        self.stopping = False
+        self._active: Dict[int, JobContext] = {}
+        self._wake = asyncio.Event()
+        self._stop_requested = asyncio.Event()
+
+    async def start(self):
+        """Requeue interrupted jobs, then run the workers and periodic cleanup"""
+        self.running = True
+        self.stopping = False
+        self._stop_requested.clear()
+        async def requeue_interrupted(session) -> int:
+            result = await session.execute(
+                update(Job).where(Job.status == RUNNING).values(
+                    status=QUEUED, progress=0.0, started_at=None, message="Requeued after restart"
+                )
+            )
+            return result.rowcount
+
+        requeued = await db_writer.write(requeue_interrupted)
+        if requeued:
+            logger.info(f"Requeued {requeued} interrupted jobs")
+
+        logger.info(f"Job queue started with {self.workers} workers")
+        await asyncio.gather(
+            self._housekeeping(),
+            *(self._worker() for _ in range(self.workers))
+        )
+
+    async def stop(self):
+        """Stop taking jobs; running ones are interrupted and queued again for the next start"""
+        self.running = False
+        self.stopping = True
+        for ctx in list(self._active.values()):
+            ctx.cancel()
+        self._stop_requested.set()
+        self._wake.set()
+
+    async def submit(
+        self,
+        job_type: str,
+        params: Optional[Dict[str, Any]] = None,
+        priority: Optional[int] = None,
+        reuse: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Queue a job and return it.
+
+        With `reuse`, an identical job that is queued, running, or succeeded
+        less than JOB_RESULT_TTL ago is returned instead of a new one. Raises
+        ValueError for unknown job types or parameters.
+        """
+        if job_type not in _job_types:
+            raise ValueError(f"Unknown job type {job_type}")
+        registered = _job_types[job_type]
+        params = {key: value for key, value in (params or {}).items() if value is not None}
+        try:
+            inspect.signature(registered.handler).bind(None, **params)
+        except TypeError as e:
+            raise ValueError(f"Invalid parameters for {job_type}: {e}")
+
+        params_hash = _params_hash(job_type, params)
+
+        # Check and insert in one write, so two identical submissions can't both queue
+        async def queue_job(session) -> Tuple[Job, bool]:
+            if reuse:
+                existing = await self._reusable(session, job_type, params_hash)
+                if existing:
+                    return existing, False
+            job = Job(
+                job_type=job_type,
+                params=params,
+                params_hash=params_hash,
+                priority=registered.priority if priority is None else priority,
+                status=QUEUED,
+                progress=0.0,
+                created_at=datetime.utcnow()
+            )
+            session.add(job)
+            await session.flush()
+            return job, True
+
+        job, created = await db_writer.write(queue_job)
+        if not created:
+            logger.debug(f"Reusing job {job.id} for {job_type}")
+            return self._to_dict(job)
+
+        logger.info(f"Queued job {job.id} ({job_type})")
+        self._wake.set()
+        return self._to_dict(job)
+
+    async def _reusable(self, session, job_type: str, params_hash: str) -> Optional[Job]:
+        result = await session.execute(
+            select(Job).where(
+                Job.job_type == job_type,
+                Job.params_hash == params_hash,
+                Job.status.in_((QUEUED, RUNNING, SUCCEEDED))
+            ).order_by(Job.id.desc()).limit(1)
+        )
+        job = result.scalar_one_or_none()
+        if job is None or job.status != SUCCEEDED:
+            return job
+        if job.finished_at < datetime.utcnow() - timedelta(seconds=self.result_ttl):
+            return None
+        path = (job.result or {}).get("file")
+        if path and not os.path.exists(path):
+            return None
+        return job
+
+    async def get(self, job_id: int) -> Optional[Dict[str, Any]]:
+        async with ReadSessionLocal() as session:
+            job = await session.get(Job, job_id)
+            return self._to_dict(job) if job else None
+
+    async def list(self, status: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """Most recent jobs first"""
+        async with ReadSessionLocal() as session:
+            query = select(Job).order_by(Job.id.desc()).limit(limit)
+            if status:
+                query = query.where(Job.status == status)
+            result = await session.execute(query)
+            return [self._to_dict(job) for job in result.scalars().all()]
+
+    async def cancel(self, job_id: int) -> Optional[Dict[str, Any]]:
+        """Cancel a queued or running job (finished jobs are returned unchanged)"""
+        ctx = self._active.get(job_id)
+        if ctx:
+            ctx.cancel()
+        else:
+            async def cancel_queued(session):
+                await session.execute(
+                    update(Job).where(Job.id == job_id, Job.status == QUEUED).values(
+                        status=CANCELLED, finished_at=datetime.utcnow()
+                    )
+                )
+
+            await db_writer.write(cancel_queued)
+        return await self.get(job_id)
+
+    async def _worker(self):
+        while self.running:
+            self._wake.clear()
+            try:
+                job = await self._claim()
+                if job is not None:
+                    await self._execute(job)
+                    continue
+            except Exception as e:
+                # Database errors; keep the worker alive and retry after the poll interval
+                logger.error(f"Job worker error: {e}", exc_info=True)
+            try:
+                await asyncio.wait_for(self._wake.wait(), POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _claim(self) -> Optional[Job]:
+        """Take the highest priority queued job, or None"""
+        # Select and update in one write: writes are serialized, so no other worker can claim it in between
+        async def claim_next(session) -> Optional[Job]:
+            result = await session.execute(
+                select(Job).where(Job.status == QUEUED)
+                .order_by(Job.priority.desc(), Job.id).limit(1)
+            )
+            job = result.scalar_one_or_none()
+            if job is not None:
+                job.status = RUNNING
+                job.started_at = datetime.utcnow()
+                job.message = None
+                await session.flush()
+            return job
+
+        return await db_writer.write(claim_next)
+
+    async def _execute(self, job: Job):
+        registered = _job_types.get(job.job_type)
+        ctx = JobContext(job.id, job.job_type, self.analytics)
+        self._active[job.id] = ctx
+        JOBS_RUNNING.inc()
+        started = time.perf_counter()
+        values: Dict[str, Any] = {}
+        try:
+            if registered is None:
+                raise ValueError(f"Unknown job type {job.job_type}")
+            logger.info(f"Running job {job.id} ({job.job_type})")
+            ctx.task = asyncio.create_task(registered.handler(ctx, **(job.params or {})))
+            result = await ctx.task
+            values = {"status": SUCCEEDED, "result": result, "progress": 1.0}
+        except Exception as e:
+            if ctx.cancelled and self.stopping:
+                values = {"status": QUEUED, "progress": 0.0, "started_at": None, "message": "Requeued at shutdown"}
+            elif ctx.cancelled:
+                values = {"status": CANCELLED}
+            else:
+                logger.error(f"Job {job.id} ({job.job_type}) failed: {e}", exc_info=True)
+                values = {"status": FAILED, "error": str(e) or type(e).__name__}
+        except asyncio.CancelledError:
+            if not ctx.cancelled:
+                raise  # The worker itself is being cancelled; the job is requeued on the next start
+            values = {"status": QUEUED if self.stopping else CANCELLED}
+            if self.stopping:
+                values.update(progress=0.0, started_at=None, message="Requeued at shutdown")
+        finally:
+            del self._active[job.id]
+            JOBS_RUNNING.dec()
+
+        if values["status"] != QUEUED:
+            values["finished_at"] = datetime.utcnow()
+            values.setdefault("progress", ctx.fraction)
+            values.setdefault("message", ctx.message)
+            JOBS_FINISHED.labels(job.job_type, values["status"]).inc()
+            JOB_SECONDS.labels(job.job_type).since(started)
+            logger.info(f"Job {job.id} ({job.job_type}) {values['status']} in {time.perf_counter() - started:.1f}s")
+        async def record_outcome(session):
+            await session.execute(update(Job).where(Job.id == job.id).values(**values))
+
+        await db_writer.write(record_outcome)
+
+    async def _housekeeping(self):
+        while self.running:
+            try:
+                await self.cleanup()
+            except Exception as e:
+                logger.error(f"Job cleanup failed: {e}", exc_info=True)
+            try:
+                await asyncio.wait_for(self._stop_requested.wait(), CLEANUP_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    async def cleanup(self) -> int:
+        """Delete finished jobs older than JOB_HISTORY_DAYS, with their result files"""
+        cutoff = datetime.utcnow() - timedelta(days=self.keep_days)
+        async def delete_old_jobs(session) -> List[Job]:
+            result = await session.execute(
+                select(Job).where(Job.status.in_(FINISHED), Job.finished_at < cutoff)
+            )
+            old_jobs = result.scalars().all()
+            if old_jobs:
+                await session.execute(delete(Job).where(Job.id.in_([job.id for job in old_jobs])))
+            return old_jobs
+
+        old_jobs = await db_writer.write(delete_old_jobs)
+        for job in old_jobs:
+            registered = _job_types.get(job.job_type)
+            path = (job.result or {}).get("file")
+            if path and not (registered and registered.keep_files) and os.path.exists(path):
+                os.remove(path)
+        if old_jobs:
+            logger.info(f"Removed {len(old_jobs)} old jobs")
+        return len(old_jobs)
+
+    def _to_dict(self, job: Job) -> Dict[str, Any]:
+        ctx = self._active.get(job.id)
+        return {
+            "id": job.id,
+            "type": job.job_type,
+            "params": job.params or {},
+            "priority": job.priority,
+            "status": job.status,
+            # Running jobs report progress in memory; the row is written when they finish
+            "progress": round(ctx.fraction if ctx else job.progress or 0.0, 3),
+            "message": ctx.message if ctx else job.message,
+            "result": job.result,
+            "error": job.error,
+            "created_at": _isoformat(job.created_at),
+            "started_at": _isoformat(job.started_at),
+            "finished_at": _isoformat(job.finished_at),
+        }
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "running": [
+                {"id": ctx.job_id, "type": ctx.job_type, "progress": round(ctx.fraction, 3)}
+                for ctx in self._active.values()
+            ],
+        }
+
+
+def create_jobs(analytics=None) -> JobQueue:
+    """Create the job queue from settings"""
+    return JobQueue(
+        workers=settings.JOB_WORKERS,
+        result_ttl=settings.JOB_RESULT_TTL,
+        keep_days=settings.JOB_HISTORY_DAYS,
+        analytics=analytics
+    )
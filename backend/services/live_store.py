@@ -0,0 +1,187 @@
+"""
+Live value store - latest sensor and Victron values in fixed, array-backed slots
+
+Every key (a sensor id, or a flattened Victron field such as
+"smartshunt_leisure.voltage") gets a fixed slot index when first written.
+Values live in an array('d'), and every write bumps a global version
+counter. Readers get an immutable Snapshot that is built at most once per
+change and shared between all readers, or a "changed since version N"
+delta, instead of copying the dict on every call.
+"""
+from array import array
+from typing import Dict, List, Optional, Tuple, Union
+import logging
+import math
+import time
+
+from hardware.readings import Reading, QUALITY_GOOD
+
+logger = logging.getLogger(__name__)
+
+Value = Union[float, str]
+
+
+class ReadOnlyDict(dict):
+    """A dict that refuses mutation, so one snapshot can be shared by every reader"""
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("Live store snapshots are read-only")
+
+    __setitem__ = __delitem__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+
+class Snapshot:
+    """Immutable view of one group of keys at a given store version"""
+
+    __slots__ = ("version", "values", "records")
+
+    def __init__(self, version: int, values: ReadOnlyDict, records: ReadOnlyDict):
+        self.version = version
+        self.values = values
+        self.records = records
+
+
+class LiveStore:
+    """Fixed-index, versioned store of the latest value for every key"""
+
+    def __init__(self):
+        self.version = 0
+        self._index: Dict[str, int] = {}
+        self._keys: List[str] = []
+        self._groups: Dict[str, List[int]] = {}
+        self._group_versions: Dict[str, int] = {}
+        self._slot_groups: List[str] = []
+
+        self._values = array("d")
+        self._sample_times = array("d")
+        self._slot_versions = array("Q")
+        self._quality: List[str] = []
+        self._board_ids: List[Optional[str]] = []
+        self._text: Dict[int, str] = {}  # Non-numeric values (e.g. charger state)
+
+        self._snapshots: Dict[str, Snapshot] = {}
+
+    def register(self, key: str, group: str) -> int:
+        """Assign a fixed slot to a key (idempotent)"""
+        index = self._index.get(key)
+        if index is not None:
+            return index
+
+        index = len(self._keys)
+        self._index[key] = index
+        self._keys.append(key)
+        self._groups.setdefault(group, []).append(index)
+        self._group_versions.setdefault(group, 0)
+        self._slot_groups.append(group)
+        self._values.append(math.nan)
+        self._sample_times.append(0.0)
+        self._slot_versions.append(0)
+        self._quality.append(QUALITY_GOOD)
+        self._board_ids.append(None)
+        return index
+
+    def set(
+        self,
+        key: str,
+        value: Value,
+        group: str,
+        sample_time: Optional[float] = None,
+        board_id: Optional[str] = None,
+        quality: str = QUALITY_GOOD
+    ):
+        """Write a new value into a key's slot"""
+        index = self._index.get(key)
+        if index is None:
+            index = self.register(key, group)
+
+        if isinstance(value, str):
+            self._text[index] = value
+            self._values[index] = math.nan
+        else:
+            self._text.pop(index, None)
+            self._values[index] = value
+
+        self.version += 1
+        self._sample_times[index] = time.time() if sample_time is None else sample_time
+        self._slot_versions[index] = self.version
+        self._group_versions[self._slot_groups[index]] = self.version
+        self._quality[index] = quality
+        self._board_ids[index] = board_id
+
+    def set_quality(self, key: str, quality: str):
+        """Change a key's quality flag without touching its value"""
+        index = self._index.get(key)
+        if index is None or self._quality[index] == quality:
+            return
+        self.version += 1
+        self._quality[index] = quality
+        self._slot_versions[index] = self.version
+        self._group_versions[self._slot_groups[index]] = self.version
+
+    def _value_at(self, index: int) -> Optional[Value]:
+        text = self._text.get(index)
+        if text is not None:
+            return text
+        value = self._values[index]
+        return None if math.isnan(value) else value
+
+    def _record_at(self, index: int) -> Reading:
+        return Reading(
+            self._value_at(index),
+            sample_time=self._sample_times[index],
+            board_id=self._board_ids[index],
+            quality=self._quality[index]
+        )
+
+    def get(self, key: str) -> Optional[Value]:
+        """Latest value for a key"""
+        index = self._index.get(key)
+        return None if index is None else self._value_at(index)
+
+    def get_record(self, key: str) -> Optional[Reading]:
+        """Latest value for a key with its sample time, board and quality"""
+        index = self._index.get(key)
+        if index is None or self._slot_versions[index] == 0:
+            return None
+        return self._record_at(index)
+
+    def snapshot(self, group: str) -> Snapshot:
+        """
+        Immutable snapshot of a group's values and records.
+
+        Built at most once per change to the group; every reader in between
+        gets the same object. The snapshot's version is the store version of
+        the group's latest write.
+        """
+        version = self._group_versions.get(group, 0)
+        cached = self._snapshots.get(group)
+        if cached is not None and cached.version == version:
+            return cached
+
+        values = {}
+        records = {}
+        for index in self._groups.get(group, ()):
+            if self._slot_versions[index] == 0:
+                continue
+            key = self._keys[index]
+            values[key] = self._value_at(index)
+            records[key] = self._record_at(index)
+
+        snapshot = Snapshot(version, ReadOnlyDict(values), ReadOnlyDict(records))
+        self._snapshots[group] = snapshot
+        return snapshot
+
+    def changed_since(self, version: int, group: str) -> Tuple[int, Dict[str, Optional[Value]]]:
+        """Current version and the values in a group written after `version`"""
+        slot_versions = self._slot_versions
+        changed = {
+            self._keys[index]: self._value_at(index)
+            for index in self._groups.get(group, ())
+            if slot_versions[index] > version
+        }
+        return self.version, changed
+
+    def keys(self, group: str) -> List[str]:
+        """Keys registered in a group, in slot order"""
+        return [self._keys[index] for index in self._groups.get(group, ())]
@@ -0,0 +1,185 @@
+"""
+Logging pipeline - non-blocking, rate-limited, optionally structured
+
+Log calls on the event loop only format the record and put it on a
+bounded in-memory queue. A QueueListener thread does the actual I/O
+(console and, optionally, a rotating log file on the SD card), so a slow
+card or terminal can never stall sensor polling or WebSockets. When the
+queue is full, records are dropped and counted rather than blocking.
+
+Repetitive messages (same logger, level and call site - messages are often
+f-strings, so the text itself differs every time) are rate-limited; the
+next message that gets through reports how many were suppressed.
+LOG_FORMAT=json writes one JSON object per line, including any
+`extra={...}` fields.
+
+SQL statement logging is controlled by SQL_ECHO (not DEBUG) and goes
+through the same queue.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from config import settings
+from services.metrics import metrics
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+LOG_RECORDS_DROPPED = metrics.counter(
+    "boatmonitor_log_records_dropped_total", "Log records dropped because the log queue was full"
+)
+LOG_RECORDS_SUPPRESSED = metrics.counter(
+    "boatmonitor_log_records_suppressed_total", "Repetitive log records suppressed by rate limiting"
+)
+
+# Attributes every LogRecord has; anything else was passed via extra={...}
+_STANDARD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+# One record per statement/request by design; never rate-limited
+UNLIMITED_LOGGERS = ("sqlalchemy.engine", "uvicorn.access")
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class RateLimitFilter(logging.Filter):
+    """Let through at most `burst` records per log call site per `period` seconds"""
+
+    def __init__(self, burst: int = 10, period: float = 60.0, max_keys: int = 1000):
+        super().__init__()
+        self.burst = burst
+        self.period = period
+        self.max_keys = max_keys
+        # (logger, level, file, line) -> [window start, count in window, suppressed]
+        self._windows: Dict[Tuple[str, int, str, int], List] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.ERROR and record.exc_info:
+            return True  # Never hide a traceback
+        if record.name.startswith(UNLIMITED_LOGGERS):
+            return True
+
+        key = (record.name, record.levelno, record.pathname, record.lineno)
+        now = time.monotonic()
+        window = self._windows.get(key)
+        if window is None:
+            if len(self._windows) >= self.max_keys:
+                self._windows.clear()
+            self._windows[key] = [now, 1, 0]
+            return True
+
+        if now - window[0] >= self.period:
+            suppressed = window[2]
+            window[0], window[1], window[2] = now, 1, 0
+            if suppressed:
+                record.suppressed = suppressed  # Reported by the formatters; the message itself is left alone
+            return True
+
+        if window[1] < self.burst:
+            window[1] += 1
+            return True
+
+        window[2] += 1
+        LOG_RECORDS_SUPPRESSED.inc()
+        return False
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops (and counts) records when the queue is full instead of blocking"""
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+
+class TextFormatter(logging.Formatter):
+    """LOG_FORMAT lines, noting how many similar records were suppressed before this one"""
+
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        message = super().formatMessage(record)
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            message += f" (suppressed {suppressed} similar messages)"
+        return message
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with any extra={...} fields (including `suppressed`)"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for name, value in vars(record).items():
+            if name not in _STANDARD_ATTRIBUTES:
+                entry[name] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def _output_handlers() -> List[logging.Handler]:
+    """Handlers that do the I/O (run on the listener thread)"""
+    formatter = JsonFormatter() if settings.LOG_FORMAT == "json" else TextFormatter(LOG_FORMAT)
+
+    console = logging.StreamHandler(sys.stderr)
+    console.setFormatter(formatter)
+    handlers: List[logging.Handler] = [console]
+
+    if settings.LOG_FILE:
+        log_file = logging.handlers.RotatingFileHandler(
+            settings.LOG_FILE,
+            maxBytes=settings.LOG_FILE_MAX_BYTES,
+            backupCount=settings.LOG_FILE_BACKUPS
+        )
+        log_file.setFormatter(formatter)
+        handlers.append(log_file)
+    return handlers
+
+
+def setup_logging():
+    """Route all logging through the queue (safe to call more than once)"""
+    global _listener
+    if _listener is not None:
+        return
+
+    log_queue: queue.Queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+    queue_handler = DroppingQueueHandler(log_queue)
+    queue_handler.addFilter(RateLimitFilter(settings.LOG_RATE_LIMIT_BURST, settings.LOG_RATE_LIMIT_PERIOD))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(settings.LOG_LEVEL.upper())
+
+    # uvicorn installs its own (synchronous) handlers; send its records through the queue too
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers = []
+        uvicorn_logger.propagate = True
+
+    # SQL statement logging is opt-in and independent of DEBUG
+    logging.getLogger("sqlalchemy.engine").setLevel(logging.INFO if settings.SQL_ECHO else logging.WARNING)
+
+    _listener = logging.handlers.QueueListener(log_queue, *_output_handlers(), respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Flush queued records and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,268 @@
+"""
+Event loop monitor - lag sampling, stall capture and an on-demand sampling profiler
+
+Everything in BoatMonitor shares one asyncio loop, so any blocking call
+(synchronous I2C, SQL echo logging, a large JSON dump) freezes sensors,
+WebSockets and the kiosk UI together. This module makes that visible:
+
+- a sampler task measures how late the loop wakes it (loop lag)
+- a watchdog thread notices when the loop has not come back within the
+  stall threshold and captures the loop thread's stack *while it is
+  blocked*, plus the asyncio task that was running
+- the last incidents are kept in a bounded ring for /api/diagnostics
+- a sampling profiler can be switched on at runtime; it samples the loop
+  thread's stack from another thread and aggregates collapsed stacks
+  (flamegraph format)
+"""
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from config import settings
+from services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+LOOP_LAG_SECONDS = metrics.histogram(
+    "boatmonitor_event_loop_lag_seconds", "How late the event loop woke a sleeping task",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+LOOP_STALLS = metrics.counter(
+    "boatmonitor_event_loop_stalls_total", "Times the event loop was blocked longer than the stall threshold"
+)
+LOOP_MAX_LAG = metrics.gauge(
+    "boatmonitor_event_loop_max_lag_seconds", "Worst event loop lag since startup"
+)
+
+MAX_STACK_DEPTH = 40
+MAX_PROFILE_SECONDS = 300.0
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Samples one thread's stack at a fixed interval and counts collapsed stacks"""
+
+    def __init__(self, max_stacks: int = 5000):
+        self.max_stacks = max_stacks
+        self.stacks: Dict[str, int] = {}
+        self.samples = 0
+        self.dropped = 0
+        self.interval = 0.0
+        self.started: Optional[datetime] = None
+        self.stopped: Optional[datetime] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, thread_id: int, interval: float = 0.005, duration: float = 30.0):
+        """Start sampling `thread_id` (stops by itself after `duration` seconds)"""
+        if self.running:
+            raise RuntimeError("Profiler already running")
+        self.stacks = {}
+        self.samples = 0
+        self.dropped = 0
+        self.interval = interval
+        self.started = datetime.now()
+        self.stopped = None
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run,
+            args=(thread_id, interval, min(duration, MAX_PROFILE_SECONDS)),
+            name="loop-profiler",
+            daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=1.0)
+
+    def _run(self, thread_id: int, interval: float, duration: float):
+        deadline = time.monotonic() + duration
+        stacks = self.stacks
+        while not self._stop.is_set() and time.monotonic() < deadline:
+            frame = sys._current_frames().get(thread_id)
+            if frame is not None:
+                names = []
+                while frame is not None:
+                    names.append(_frame_name(frame))
+                    frame = frame.f_back
+                key = ";".join(reversed(names))
+                if key in stacks:
+                    stacks[key] += 1
+                elif len(stacks) < self.max_stacks:
+                    stacks[key] = 1
+                else:
+                    self.dropped += 1
+                self.samples += 1
+            self._stop.wait(interval)
+        self.stopped = datetime.now()
+
+    def report(self, limit: int = 50) -> Dict[str, Any]:
+        """Most frequent stacks, root first (';'-separated, flamegraph collapsed format)"""
+        # Copy first: the sampling thread keeps adding to the dict
+        top = sorted(list(self.stacks.items()), key=lambda item: item[1], reverse=True)[:limit]
+        return {
+            "running": self.running,
+            "started": self.started.isoformat() if self.started else None,
+            "stopped": self.stopped.isoformat() if self.stopped else None,
+            "interval": self.interval,
+            "samples": self.samples,
+            "distinct_stacks": len(self.stacks),
+            "dropped_samples": self.dropped,
+            "stacks": [
+                {"stack": stack, "count": count, "percent": round(100.0 * count / self.samples, 1)}
+                for stack, count in top
+            ],
+        }
+
+    def collapsed(self) -> str:
+        """All stacks in collapsed format, one "stack count" per line"""
+        return "".join(f"{stack} {count}\n" for stack, count in list(self.stacks.items()))
+
+
+class LoopMonitor:
+    """Measures event loop lag and records stalls with the blocking stack"""
+
+    def __init__(
+        self,
+        interval: float = 0.1,
+        threshold: float = 0.25,
+        max_incidents: int = 50
+    ):
+        self.interval = interval
+        self.threshold = threshold
+        self.incidents: deque = deque(maxlen=max_incidents)
+        self.running = False
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.stall_count = 0
+        self.profiler = SamplingProfiler()
+
+        self._heartbeat = time.monotonic()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._open_incident: Optional[Dict[str, Any]] = None
+        self._stop = threading.Event()
+        self._watchdog: Optional[threading.Thread] = None
+
+    async def start(self):
+        """Start the lag sampler and the stall watchdog"""
+        self.running = True
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stop.clear()
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+        logger.info(f"Loop monitor started (stall threshold {self.threshold}s)")
+        await self._sample_loop()
+
+    async def stop(self):
+        """Stop monitoring (and any running profile)"""
+        self.running = False
+        self._stop.set()
+        self.profiler.stop()
+        logger.info("Loop monitor stopped")
+
+    async def _sample_loop(self):
+        """Sleep for a fixed interval and record how late the loop wakes us"""
+        while self.running:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._heartbeat = now
+
+            lag = max(0.0, now - expected)
+            self.last_lag = lag
+            LOOP_LAG_SECONDS.observe(lag)
+            if lag > self.max_lag:
+                self.max_lag = lag
+                LOOP_MAX_LAG.set(lag)
+
+            incident = self._open_incident
+            if incident is not None:
+                # The loop is back: record how long the stall really lasted
+                self._open_incident = None
+                incident["duration"] = round(lag, 3)
+                incident["ongoing"] = False
+                logger.warning(
+                    f"Event loop blocked for {lag:.2f}s in task {incident['task']}: "
+                    f"{incident['stack'][-1].strip() if incident['stack'] else '?'}"
+                )
+
+    def _watch(self):
+        """Watchdog thread: capture the loop thread's stack while it is blocked"""
+        check_every = max(self.threshold / 4, 0.01)
+        while not self._stop.wait(check_every):
+            blocked = time.monotonic() - self._heartbeat - self.interval
+            if blocked < self.threshold or self._open_incident is not None:
+                continue
+
+            frame = sys._current_frames().get(self._loop_thread_id)
+            # Innermost frames, innermost last like a traceback
+            stack = traceback.format_stack(frame, limit=MAX_STACK_DEPTH) if frame else []
+            task = asyncio.current_task(self._loop)
+
+            incident = {
+                "started": (datetime.now() - timedelta(seconds=blocked)).isoformat(timespec="milliseconds"),
+                "duration": round(blocked, 3),
+                "ongoing": True,
+                "task": task.get_name() if task else None,
+                "coroutine": repr(task.get_coro()) if task else None,
+                "stack": stack,
+            }
+            self._open_incident = incident
+            self.incidents.append(incident)
+            self.stall_count += 1
+            LOOP_STALLS.inc()
+
+    def start_profiler(self, interval: float = 0.005, duration: float = 30.0):
+        """Start sampling the event loop thread"""
+        if self._loop_thread_id is None:
+            raise RuntimeError("Loop monitor not running")
+        self.profiler.start(self._loop_thread_id, interval, duration)
+
+    def status(self) -> Dict[str, Any]:
+        """Lag statistics and the recent stalls (newest first)"""
+        lag = LOOP_LAG_SECONDS.to_dict()
+        return {
+            "running": self.running,
+            "interval": self.interval,
+            "stall_threshold": self.threshold,
+            "last_lag": round(self.last_lag, 4),
+            "max_lag": round(self.max_lag, 4),
+            "lag": lag[0] if lag else None,
+            "stalls": self.stall_count,
+            "incidents": list(reversed(self.incidents)),
+            "profiler_running": self.profiler.running,
+        }
+
+    def clear_incidents(self):
+        self.incidents.clear()
+
+
+def create_loop_monitor() -> Optional[LoopMonitor]:
+    """Create the loop monitor from settings, if enabled"""
+    if not settings.LOOP_MONITOR_ENABLED:
+        return None
+    return LoopMonitor(
+        interval=settings.LOOP_MONITOR_INTERVAL,
+        threshold=settings.LOOP_STALL_THRESHOLD,
+        max_incidents=settings.LOOP_INCIDENT_HISTORY
+    )
@@ -0,0 +1,349 @@
+"""
+Metrics - in-process counters, gauges and histograms for the hot paths
+
+Everything runs on the event loop thread, so metric updates are plain
+attribute increments: no locks, no allocation per observation. Rendered as
+Prometheus text or JSON by /api/metrics.
+
+    from services.metrics import metrics
+    READ_SECONDS = metrics.histogram("boatmonitor_board_read_seconds", "Board read latency", ("board",))
+    READ_SECONDS.labels("board-1").observe(0.004)
+"""
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+import time
+
+# Seconds, from sub-millisecond reads to multi-second stalls
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value != value:
+        return "NaN"
+    if value in (float("inf"), float("-inf")):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(value)
+
+
+class _CounterValue:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+
+class _GaugeValue:
+    __slots__ = ("value", "function")
+
+    def __init__(self):
+        self.value = 0.0
+        self.function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float):
+        self.value = value
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def dec(self, amount: float = 1):
+        self.value -= amount
+
+    def set_function(self, function: Callable[[], float]):
+        """Read the value from `function` at collection time"""
+        self.function = function
+
+    def get(self) -> float:
+        if self.function is not None:
+            try:
+                return self.function()
+            except Exception:
+                return float("nan")
+        return self.value
+
+
+class _HistogramValue:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def since(self, started: float):
+        """Observe the time elapsed since a time.perf_counter() reading"""
+        self.observe(time.perf_counter() - started)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate a quantile by interpolating within its bucket"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for upper, count in zip(self.buckets, self.counts):
+            if count and seen + count >= rank:
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+            lower = upper
+        return self.buckets[-1]  # In the +Inf bucket
+
+
+class _Metric:
+    """A metric family: one value per label combination"""
+
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        if not self.label_names:
+            self._default = self.labels()
+
+    def _new_value(self):
+        raise NotImplementedError
+
+    def labels(self, *values: Any):
+        """Value for one label combination (created on first use)"""
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.label_names):
+                raise ValueError(f"{self.name} expects labels {self.label_names}")
+            child = self._children[key] = self._new_value()
+        return child
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_value(self):
+        return _CounterValue()
+
+    def inc(self, amount: float = 1):
+        self._default.inc(amount)
+
+    def samples(self) -> List[Tuple[str, Tuple[str, ...], str, float]]:
+        return [(self.name, key, "", child.value) for key, child in self._children.items()]
+
+    def to_dict(self) -> List[Dict[str, Any]]:
+        return [
+            {"labels": dict(zip(self.label_names, key)), "value": child.value}
+            for key, child in self._children.items()
+        ]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_value(self):
+        return _GaugeValue()
+
+    def set(self, value: float):
+        self._default.set(value)
+
+    def inc(self, amount: float = 1):
+        self._default.inc(amount)
+
+    def dec(self, amount: float = 1):
+        self._default.dec(amount)
+
+    def set_function(self, function: Callable[[], float]):
+        self._default.set_function(function)
+
+    def samples(self) -> List[Tuple[str, Tuple[str, ...], str, float]]:
+        return [(self.name, key, "", child.get()) for key, child in self._children.items()]
+
+    def to_dict(self) -> List[Dict[str, Any]]:
+        return [
+            {"labels": dict(zip(self.label_names, key)), "value": child.get()}
+            for key, child in self._children.items()
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help_text, label_names)
+
+    def _new_value(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float):
+        self._default.observe(value)
+
+    def samples(self) -> List[Tuple[str, Tuple[str, ...], str, float]]:
+        samples = []
+        for key, child in self._children.items():
+            cumulative = 0
+            for upper, count in zip(self.buckets + (float("inf"),), child.counts):
+                cumulative += count
+                samples.append((f"{self.name}_bucket", key, f'le="{_format_value(upper)}"', cumulative))
+            samples.append((f"{self.name}_sum", key, "", child.sum))
+            samples.append((f"{self.name}_count", key, "", child.count))
+        return samples
+
+    def to_dict(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "labels": dict(zip(self.label_names, key)),
+                "count": child.count,
+                "sum": child.sum,
+                "mean": child.sum / child.count if child.count else None,
+                "p50": child.quantile(0.5),
+                "p95": child.quantile(0.95),
+                "p99": child.quantile(0.99),
+            }
+            for key, child in self._children.items()
+        ]
+
+
+class MetricsRegistry:
+    """All metrics of the process"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _get_or_create(self, cls, name: str, help_text: str, label_names: Sequence[str], **kwargs):
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics[name] = cls(name, help_text, label_names, **kwargs)
+        elif not isinstance(metric, cls) or metric.label_names != tuple(label_names):
+            raise ValueError(f"Metric {name} already registered with a different type or labels")
+        return metric
+
+    def counter(self, name: str, help_text: str, label_names: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, help_text, label_names)
+
+    def gauge(self, name: str, help_text: str, label_names: Sequence[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, help_text, label_names)
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._get_or_create(Histogram, name, help_text, label_names, buckets=buckets)
+
+    def render_prometheus(self) -> str:
+        """Prometheus text exposition format (0.0.4)"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for sample_name, key, extra, value in metric.samples():
+                lines.append(f"{sample_name}{_format_labels(metric.label_names, key, extra)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON view, with quantiles estimated from the histogram buckets"""
+        return {
+            metric.name: {"type": metric.kind, "help": metric.help, "values": metric.to_dict()}
+            for metric in self._metrics.values()
+        }
+
+
+metrics = MetricsRegistry()
+
+# Shared hot-path metrics
+LOOP_SECONDS = metrics.histogram(
+    "boatmonitor_loop_iteration_seconds", "Duration of one background loop iteration (excluding sleep)", ("loop",)
+)
+BOARD_READ_SECONDS = metrics.histogram(
+    "boatmonitor_board_read_seconds", "Latency of one board input read", ("board", "input", "channel")
+)
+BOARD_READ_ERRORS = metrics.counter(
+    "boatmonitor_board_read_errors_total", "Board input reads that returned no value", ("board", "input", "channel")
+)
+DB_SECONDS = metrics.histogram(
+    "boatmonitor_db_operation_seconds", "Data logger database latency", ("operation",)
+)
+PROCESS_WRITE_BYTES = metrics.gauge(
+    "boatmonitor_process_write_bytes", "Bytes the process has written (/proc/self/io)", ("layer",)
+)
+WEBSOCKET_CLIENTS = metrics.gauge(
+    "boatmonitor_websocket_clients", "Connected WebSocket clients", ("endpoint",)
+)
+WEBSOCKET_SEND_SECONDS = metrics.histogram(
+    "boatmonitor_websocket_send_seconds", "Latency of one WebSocket message send", ("endpoint",)
+)
+HTTP_SECONDS = metrics.histogram(
+    "boatmonitor_http_request_seconds", "HTTP request latency per route", ("method", "route", "status")
+)
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing each HTTP request, labelled by route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # The router records the matched route in the scope
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            HTTP_SECONDS.labels(scope["method"], path, status[0]).since(started)
+
+
+def process_io(field: str) -> int:
+    """A counter from /proc/self/io, 0 where unavailable (not Linux)"""
+    try:
+        with open("/proc/self/io") as f:
+            for line in f:
+                name, _, value = line.partition(":")
+                if name == field:
+                    return int(value)
+    except OSError:
+        pass
+    return 0
+
+
+# write() calls (SQLite pages, journal records, logs) and what reached the block device
+PROCESS_WRITE_BYTES.labels("syscall").set_function(lambda: process_io("wchar"))
+PROCESS_WRITE_BYTES.labels("storage").set_function(lambda: process_io("write_bytes"))
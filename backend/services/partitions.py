@@ -0,0 +1,336 @@
+"""
+Partition manager - creates, attaches and retires the monthly history files
+
+The write side of database/partitions.py (DB_PARTITIONING):
+
+- ensure(): creates a month's file and catalog row before rows are written
+  to it, and keeps it attached to the writer connection (attachments are
+  synced whenever the writer checks its connection out of the pool, since
+  SQLite can't attach inside a transaction)
+- a supervised loop prepares next month's file ahead of the rollover,
+  detaches old months and applies DB_RETENTION_MONTHS: expired months are
+  marked in the catalog (so readers stop using them), then moved to
+  DB_ARCHIVE_DIR or deleted - one file operation however many rows
+- months older than DB_SEAL_AFTER_MONTHS are sealed: their sensor readings
+  are written to an archive segment (database/archive.py), registered in
+  the catalog, then deleted from the partition file. A sealed month still
+  takes late rows (staged samples replayed after a long outage, moved
+  legacy history); readers find them in the partition, above the segment's
+  last_id
+"""
+import asyncio
+import logging
+import os
+import shutil
+import sqlite3
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import create_engine, event, select
+
+from config import settings
+from database import archive, partitions as layout
+from database.database import Base, ReadSessionLocal, engine
+from database.models import ArchiveSegment, HistoryPartition, SensorReading, StagingMark, VictronReading
+from services.db_writer import db_writer
+from services.metrics import metrics
+from services.response_cache import response_cache
+
+logger = logging.getLogger(__name__)
+
+HOUSEKEEPING_INTERVAL = 3600.0
+
+ACTIVE_PARTITIONS = metrics.gauge("boatmonitor_history_partitions", "Active monthly history partitions")
+PARTITIONS_RETIRED = metrics.counter(
+    "boatmonitor_history_partitions_retired_total", "History partitions archived or dropped by retention", ("action",)
+)
+SEAL_SECONDS = metrics.histogram("boatmonitor_history_seal_seconds", "Time to seal a month into an archive segment")
+
+
+PARTITION_TABLES = [SensorReading.__table__, VictronReading.__table__, StagingMark.__table__]
+
+
+def _create_partition_file(path: str):
+    """Empty partition with the readings tables and their indexes, in the configured journal mode"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    file_engine = create_engine(f"sqlite:///{path}")
+    try:
+        Base.metadata.create_all(file_engine, tables=PARTITION_TABLES)
+    finally:
+        file_engine.dispose()
+    db = sqlite3.connect(path)
+    try:
+        db.execute(f"PRAGMA journal_mode = {settings.DB_JOURNAL_MODE}")
+    finally:
+        db.close()
+
+
+def _upgrade_partition_file(path: str):
+    """Add the tables a partition file is missing"""
+    file_engine = create_engine(f"sqlite:///{path}")
+    try:
+        Base.metadata.create_all(file_engine, tables=PARTITION_TABLES)
+    finally:
+        file_engine.dispose()
+
+
+def _retire_file(path: str, archive_dir: str) -> str:
+    """Fold the WAL into the file and move it to the archive (or delete it); returns the action"""
+    if os.path.exists(path):
+        db = sqlite3.connect(path, timeout=settings.DB_BUSY_TIMEOUT)
+        try:
+            db.execute("PRAGMA journal_mode = DELETE")
+        except sqlite3.Error as e:
+            logger.warning(f"Could not checkpoint {path} before retiring it: {e}")
+        finally:
+            db.close()
+    for suffix in ("-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    return _move_or_remove(path, archive_dir)
+
+
+def _move_or_remove(path: str, archive_dir: str) -> str:
+    if not os.path.exists(path):
+        return layout.DROPPED
+    if archive_dir:
+        os.makedirs(archive_dir, exist_ok=True)
+        shutil.move(path, os.path.join(archive_dir, os.path.basename(path)))
+        return layout.ARCHIVED
+    os.remove(path)
+    return layout.DROPPED
+
+
+def _seal_file(partition: str, segment: str) -> Dict[str, int]:
+    """Write a partition's sensor readings (up to the highest id, returned as last_id) to an archive segment"""
+    db = sqlite3.connect(f"file:{partition}?mode=ro", uri=True)
+    try:
+        last_id = db.execute("SELECT COALESCE(MAX(id), 0) FROM sensor_readings").fetchone()[0]
+        cursor = db.execute(
+            "SELECT timestamp, sensor_type, sensor_id, value, unit FROM sensor_readings "
+            "WHERE timestamp IS NOT NULL AND id <= ? ORDER BY sensor_type, sensor_id, unit, timestamp",
+            [last_id]
+        )
+        stats = archive.write_segment(segment, (
+            (archive.to_micros(datetime.fromisoformat(timestamp)), sensor_type, sensor_id, value, unit)
+            for timestamp, sensor_type, sensor_id, value, unit in cursor
+        ))
+        return {**stats, "last_id": last_id}
+    finally:
+        db.close()
+
+
+def _drop_sealed_rows(path: str, last_id: int):
+    """Delete the sensor readings a segment now holds and give the space back"""
+    db = sqlite3.connect(path, timeout=settings.DB_BUSY_TIMEOUT)
+    try:
+        with db:
+            # The row at last_id stays (readers skip it): new rows get ids above the highest
+            # one left, and must not reuse the segment's ids once the table is empty
+            db.execute("DELETE FROM sensor_readings WHERE id < ?", [last_id])
+        db.execute("VACUUM")
+    finally:
+        db.close()
+
+
+class PartitionManager:
+    """Monthly history files: creation, writer attachments and retention"""
+
+    def __init__(self, retention_months: int = 0, archive_dir: str = "", seal_after_months: int = 0):
+        self.retention_months = retention_months
+        self.archive_dir = archive_dir
+        self.seal_after_months = seal_after_months
+        self.running = False
+        self.writable: Set[str] = set()
+        self._ready: Set[str] = set()
+        self._wake = asyncio.Event()
+        event.listen(engine.sync_engine, "checkout", self._sync_attachments)
+
+    def _sync_attachments(self, dbapi_connection, connection_record, connection_proxy):
+        """Attach the writable partitions to the writer connection (and detach the others)"""
+        attached: Set[str] = connection_record.info.setdefault("partitions", set())
+        cursor = dbapi_connection.cursor()
+        try:
+            for name in attached - self.writable:
+                cursor.execute(f"DETACH DATABASE {layout.schema_name(name)}")
+                attached.discard(name)
+            for name in self.writable - attached:
+                schema = layout.schema_name(name)
+                cursor.execute(f"ATTACH DATABASE ? AS {schema}", [layout.partition_path(name)])
+                cursor.execute(f"PRAGMA {schema}.synchronous = {settings.DB_SYNCHRONOUS}")
+                attached.add(name)
+        finally:
+            cursor.close()
+
+    async def ensure(self, names: Iterable[str]):
+        """Create these partitions if needed and keep them attached for writing"""
+        for name in set(names) - self.writable:
+            if name not in self._ready:
+                await self._create(name)
+            self.writable.add(name)
+
+    def release(self, name: str):
+        """Stop writing to a partition (detached at the writer's next transaction)"""
+        self.writable.discard(name)
+
+    async def _create(self, name: str):
+        path = layout.partition_path(name)
+        if not os.path.exists(path):
+            await asyncio.to_thread(_create_partition_file, path)
+            logger.info(f"Created history partition {name}")
+        else:
+            # Files from older versions lack the staging mark table
+            await asyncio.to_thread(_upgrade_partition_file, path)
+        start, end = layout.month_bounds(name)
+
+        async def register_partition(session):
+            partition = await session.get(HistoryPartition, name)
+            if partition is None:
+                session.add(HistoryPartition(name=name, path=path, start=start, end=end, status=layout.ACTIVE))
+            elif partition.status != layout.ACTIVE:
+                # Late rows for a retired month start a new file
+                partition.path = path
+                partition.status = layout.ACTIVE
+                partition.retired_at = None
+
+        await db_writer.write(register_partition)
+        self._ready.add(name)
+
+    async def start(self):
+        """Prepare upcoming months and apply retention, hourly"""
+        self.running = True
+        self._wake.clear()
+        while self.running:
+            try:
+                await self._housekeeping()
+            except Exception as e:
+                logger.error(f"Partition housekeeping failed: {e}", exc_info=True)
+            try:
+                await asyncio.wait_for(self._wake.wait(), HOUSEKEEPING_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    async def stop(self):
+        self.running = False
+        self._wake.set()
+
+    async def _housekeeping(self):
+        now = datetime.utcnow()
+        month = datetime(now.year, now.month, 1)
+        current = layout.partition_name(month)
+        upcoming = layout.partition_name(layout.add_months(month, 1))
+        previous = layout.partition_name(layout.add_months(month, -1))
+
+        # Created ahead, so the rollover doesn't wait for file creation
+        await self.ensure([current, upcoming])
+        # Late rows (staged samples, clock corrections) may still go to last month
+        for name in self.writable - {previous, current, upcoming}:
+            self.release(name)
+
+        await self.seal_months(now)
+        await self.apply_retention(now)
+        async with ReadSessionLocal() as session:
+            result = await session.execute(
+                select(HistoryPartition.name).where(HistoryPartition.status == layout.ACTIVE)
+            )
+            ACTIVE_PARTITIONS.set(len(result.all()))
+
+    async def seal_months(self, now: Optional[datetime] = None) -> List[str]:
+        """Seal the months older than DB_SEAL_AFTER_MONTHS into archive segments; returns their names"""
+        if self.seal_after_months <= 0:
+            return []
+        now = now or datetime.utcnow()
+        cutoff = layout.add_months(datetime(now.year, now.month, 1), -self.seal_after_months)
+        async with ReadSessionLocal() as session:
+            result = await session.execute(
+                select(HistoryPartition).where(
+                    HistoryPartition.status == layout.ACTIVE, HistoryPartition.end <= cutoff,
+                    HistoryPartition.name.not_in(select(ArchiveSegment.name))
+                ).order_by(HistoryPartition.start)
+            )
+            unsealed = result.scalars().all()
+
+        sealed = []
+        for partition in unsealed:
+            if partition.name in self.writable:
+                continue
+            started = time.perf_counter()
+            path = layout.segment_path(partition.name)
+            stats = await asyncio.to_thread(_seal_file, partition.path, path)
+
+            # From here readers take the month's sensor readings from the segment
+            async def register_segment(session, name=partition.name, path=path, stats=stats):
+                session.add(ArchiveSegment(
+                    name=name, path=path, last_id=stats["last_id"], samples=stats["samples"], bytes=stats["bytes"]
+                ))
+
+            await db_writer.write(register_segment)
+            try:
+                await asyncio.to_thread(_drop_sealed_rows, partition.path, stats["last_id"])
+            except sqlite3.Error as e:
+                logger.warning(f"Could not drop the sealed rows of {partition.name}: {e}")
+            SEAL_SECONDS.observe(time.perf_counter() - started)
+            logger.info(f"Sealed history partition {partition.name} ({stats['samples']} readings, {stats['bytes']} bytes)")
+            sealed.append(partition.name)
+        return sealed
+
+    async def apply_retention(self, now: Optional[datetime] = None) -> List[str]:
+        """Archive or drop the months older than DB_RETENTION_MONTHS; returns their names"""
+        if self.retention_months <= 0:
+            return []
+        now = now or datetime.utcnow()
+        cutoff = layout.add_months(datetime(now.year, now.month, 1), -self.retention_months)
+        async with ReadSessionLocal() as session:
+            result = await session.execute(
+                select(HistoryPartition).where(
+                    HistoryPartition.status == layout.ACTIVE, HistoryPartition.end <= cutoff
+                ).order_by(HistoryPartition.start)
+            )
+            expired = result.scalars().all()
+
+        retired = []
+        for partition in expired:
+            self.release(partition.name)
+            self._ready.discard(partition.name)
+
+            # Readers stop attaching it once the catalog says so; this write also detaches it from the writer
+            async def mark_retiring(session, name=partition.name) -> Optional[str]:
+                row = await session.get(HistoryPartition, name)
+                row.status = layout.ARCHIVED if self.archive_dir else layout.DROPPED
+                row.retired_at = datetime.utcnow()
+                segment = await session.get(ArchiveSegment, name)
+                if segment is None:
+                    return None
+                await session.delete(segment)
+                return segment.path
+
+            segment_path = await db_writer.write(mark_retiring)
+            action = await asyncio.to_thread(_retire_file, partition.path, self.archive_dir)
+            if segment_path:
+                await asyncio.to_thread(_move_or_remove, segment_path, self.archive_dir)
+            PARTITIONS_RETIRED.labels(action).inc()
+            logger.info(f"History partition {partition.name} {action} (retention {self.retention_months} months)")
+            retired.append(partition.name)
+        if retired and response_cache:
+            response_cache.clear()
+        return retired
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "writable": sorted(self.writable),
+            "retention_months": self.retention_months,
+            "seal_after_months": self.seal_after_months,
+            "archive_dir": self.archive_dir or None,
+        }
+
+
+def create_partition_manager() -> Optional[PartitionManager]:
+    """Create the partition manager from settings, if partitioning is on"""
+    if not settings.DB_PARTITIONING:
+        return None
+    return PartitionManager(settings.DB_RETENTION_MONTHS, settings.DB_ARCHIVE_DIR, settings.DB_SEAL_AFTER_MONTHS)
+
+
+# Shared by the data logger and the housekeeping task (one per process; None when off)
+partition_manager = create_partition_manager()
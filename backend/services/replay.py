@@ -0,0 +1,265 @@
+"""
+History Replay - feeds recorded sensor and Victron data back through the live pipeline
+
+Reads `sensor_readings` and `victron_readings` from a BoatMonitor database
+file (and its monthly history partitions), or from an NDJSON export, and pushes them into the SensorManager and
+VictronManager in original timestamp order. The original spacing between
+samples is kept, divided by the replay speed (1x - 1000x), so alerts,
+rollups and WebSockets see the same bursts they saw on the boat.
+
+NDJSON export format (one record per line):
+    {"type": "sensor", "timestamp": "2026-06-01T10:00:00", "sensor_id": "engine_rpm", "value": 1800.0}
+    {"type": "victron", "timestamp": "2026-06-01T10:00:00", "device_id": "mppt_solar", "data": {...}}
+
+Enable with REPLAY_SOURCE=<path> (takes precedence over simulation and hardware).
+"""
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import aiosqlite
+
+from config import settings
+from database import partitions
+
+logger = logging.getLogger(__name__)
+
+MAX_REPLAY_SPEED = 1000.0
+
+# (epoch seconds, "sensor" | "victron", sensor_id | device_id, value | data)
+ReplayEvent = Tuple[float, str, str, Any]
+
+
+def _parse_timestamp(value: str) -> float:
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
+class HistoryReplay:
+    """Streams recorded readings into the managers at 1x - 1000x speed"""
+
+    def __init__(
+        self,
+        source: str,
+        speed: float = 1.0,
+        loop: bool = False,
+        max_gap: Optional[float] = None
+    ):
+        self.source = source
+        self.speed = min(max(speed, 0.001), MAX_REPLAY_SPEED)
+        self.loop = loop
+        self.max_gap = max_gap
+        self.running = False
+        self.events_replayed = 0
+        self.position: Optional[float] = None  # Original timestamp of the last event
+        self.max_lag = 0.0  # Worst delay behind the replay schedule (seconds)
+
+        if speed != self.speed:
+            logger.warning(f"Replay speed {speed}x clamped to {self.speed}x")
+
+    async def start(self, sensor_manager, victron_manager):
+        """Start replaying"""
+        self.running = True
+        self.sensor_manager = sensor_manager
+        self.victron_manager = victron_manager
+        logger.info(f"Replaying {self.source} at {self.speed}x")
+
+        try:
+            while self.running:
+                await self._replay_once()
+                if not self.loop:
+                    break
+                logger.info("Replay finished, starting again")
+        except Exception as e:
+            logger.error(f"Error in history replay: {e}", exc_info=True)
+        finally:
+            self.running = False
+            logger.info(f"Replay stopped after {self.events_replayed} events")
+
+    async def stop(self):
+        """Stop replaying"""
+        self.running = False
+
+    def status(self) -> Dict[str, Any]:
+        """Replay progress"""
+        return {
+            "source": self.source,
+            "speed": self.speed,
+            "running": self.running,
+            "events_replayed": self.events_replayed,
+            "position": datetime.fromtimestamp(self.position).isoformat() if self.position else None,
+            "max_lag": round(self.max_lag, 4),
+        }
+
+    async def _replay_once(self):
+        """Replay the whole source once, keeping the original sample spacing"""
+        start_wall = None
+        start_ts = None
+        previous_ts = None
+
+        async for ts, kind, key, value in self._events():
+            if not self.running:
+                return
+
+            if start_wall is None:
+                start_wall = time.monotonic()
+                start_ts = ts
+            elif self.max_gap and ts - previous_ts > self.max_gap:
+                # Skip long quiet periods (boat switched off) instead of waiting them out
+                start_ts += ts - previous_ts - self.max_gap
+            previous_ts = ts
+
+            # Schedule against the start of the replay so sleep overshoot doesn't accumulate
+            delay = start_wall + (ts - start_ts) / self.speed - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            elif -delay > self.max_lag:
+                self.max_lag = -delay
+
+            if kind == "sensor":
+                self.sensor_manager.ingest_replay(key, value)
+            else:
+                self.victron_manager.ingest_replay(key, value)
+            self.events_replayed += 1
+            self.position = ts
+
+    def _events(self) -> AsyncIterator[ReplayEvent]:
+        if self.source.endswith((".ndjson", ".jsonl")):
+            return self._export_events()
+        return self._database_events()
+
+    async def _export_events(self) -> AsyncIterator[ReplayEvent]:
+        """Events from an NDJSON export (expected in timestamp order)"""
+        with open(self.source) as f:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                    ts = _parse_timestamp(record["timestamp"])
+                    if record["type"] == "sensor":
+                        yield ts, "sensor", record["sensor_id"], record["value"]
+                    else:
+                        yield ts, "victron", record["device_id"], record["data"]
+                except (KeyError, TypeError, ValueError) as e:
+                    logger.warning(f"Skipping bad replay record on line {line_number}: {e}")
+
+                # Let the event loop breathe between large runs of same-timestamp records
+                if line_number % 1000 == 0:
+                    await asyncio.sleep(0)
+
+    async def _database_events(self) -> AsyncIterator[ReplayEvent]:
+        """Events from a database file, merging both tables in timestamp order"""
+        uri = f"file:{os.path.abspath(self.source)}?mode=ro"
+        async with aiosqlite.connect(uri, uri=True) as db:
+            try:
+                async with db.execute(
+                    "SELECT name, path FROM history_partitions WHERE status = ?", [partitions.ACTIVE]
+                ) as cursor:
+                    catalog = await cursor.fetchall()
+            except sqlite3.OperationalError:
+                catalog = []  # Database from before partitioning
+            try:
+                async with db.execute("SELECT name, path, last_id FROM archive_segments") as cursor:
+                    sealed = {name: (path, last_id or 0) for name, path, last_id in await cursor.fetchall()}
+            except sqlite3.OperationalError:
+                sealed = {}
+
+            # Partition groups in time order (see database/partitions.py)
+            for group in partitions.plan_groups(catalog, sealed=sealed):
+                for name, path in group.partitions:
+                    await db.execute(f"ATTACH DATABASE ? AS {partitions.schema_name(name)}", [f"file:{path}?mode=ro"])
+                try:
+                    async for event in self._group_events(db, group):
+                        yield event
+                finally:
+                    for name, _ in group.partitions:
+                        await db.execute(f"DETACH DATABASE {partitions.schema_name(name)}")
+
+    async def _group_events(self, db, group: partitions.HistoryGroup) -> AsyncIterator[ReplayEvent]:
+        sensors = await db.execute(
+            f"SELECT timestamp, sensor_id, value FROM {group.table('sensor_readings')} "
+            "WHERE timestamp IS NOT NULL ORDER BY timestamp, id"
+        )
+        victron = await db.execute(
+            f"SELECT timestamp, device_id, data FROM {group.table('victron_readings')} "
+            "WHERE timestamp IS NOT NULL ORDER BY timestamp, id"
+        )
+        # Sealed months' sensor readings come from their archive segments
+        archived = [
+            (timestamp, sensor_id, value)
+            for timestamp, _, sensor_id, value, _ in await asyncio.to_thread(group.archived)
+        ] if group.segments else []
+        try:
+            sensor_rows = _merge_rows(_fetch_rows(sensors), archived)
+            victron_rows = _fetch_rows(victron)
+            sensor_row = await _next_row(sensor_rows)
+            victron_row = await _next_row(victron_rows)
+            while sensor_row or victron_row:
+                # Timestamps are ISO strings, so they compare in time order
+                if victron_row is None or (sensor_row and sensor_row[0] <= victron_row[0]):
+                    ts, sensor_id, value = sensor_row
+                    yield _parse_timestamp(ts), "sensor", sensor_id, value
+                    sensor_row = await _next_row(sensor_rows)
+                else:
+                    ts, device_id, data = victron_row
+                    yield _parse_timestamp(ts), "victron", device_id, json.loads(data) if data else {}
+                    victron_row = await _next_row(victron_rows)
+        finally:
+            # Finished statements, so the group's partitions can be detached
+            await sensors.close()
+            await victron.close()
+
+
+async def _fetch_rows(cursor, batch_size: int = 500) -> AsyncIterator[tuple]:
+    """Rows from a cursor, fetched in batches to keep thread hand-offs down"""
+    while True:
+        rows = await cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        for row in rows:
+            yield row
+
+
+async def _merge_rows(rows: AsyncIterator[tuple], other: List[tuple]) -> AsyncIterator[tuple]:
+    """Rows from a cursor merged with another list, both in timestamp order"""
+    i = 0
+    async for row in rows:
+        while i < len(other) and other[i][0] < row[0]:
+            yield other[i]
+            i += 1
+        yield row
+    for row in other[i:]:
+        yield row
+
+
+async def _next_row(rows: AsyncIterator[tuple]) -> Optional[tuple]:
+    try:
+        return await rows.__anext__()
+    except StopAsyncIteration:
+        return None
+
+
+def create_replay() -> Optional[HistoryReplay]:
+    """Create the replay source from settings, if replay mode is enabled"""
+    if not settings.REPLAY_SOURCE:
+        return None
+
+    if not os.path.exists(settings.REPLAY_SOURCE):
+        logger.error(f"Replay source {settings.REPLAY_SOURCE} not found, replay disabled")
+        return None
+
+    database_path = settings.DATABASE_URL.split(":///", 1)[-1]
+    if os.path.abspath(database_path) == os.path.abspath(settings.REPLAY_SOURCE):
+        logger.warning("Replaying the live database - replayed samples will be logged into it again")
+
+    return HistoryReplay(
+        settings.REPLAY_SOURCE,
+        speed=settings.REPLAY_SPEED,
+        loop=settings.REPLAY_LOOP,
+        max_gap=settings.REPLAY_MAX_GAP or None
+    )
@@ -0,0 +1,203 @@
+"""
+Response cache - computed history and report responses, revalidated with ETags
+
+Kiosk screens and phones ask for the same engine statistics and history
+pages over and over. Responses are kept by normalized query (LRU, bounded
+by RESPONSE_CACHE_ENTRIES and RESPONSE_CACHE_MB) and stay valid until:
+
+- closed ranges (ending before the ingest frontier: the oldest timestamp a
+  future write can still carry, allowing for the logging interval and the
+  write stage) - RESPONSE_CACHE_MAX_AGE, or until cleared because older
+  history changed (thresholds, retention)
+- ranges touching now - the next ingest tick: the data logger calls
+  ingested() after every sample it logs. When the logger runs in the
+  acquisition process ticks aren't seen here, so these also expire after
+  one HISTORY_SAVE_INTERVAL
+
+Every response carries an ETag (hash of the body) and Last-Modified (when
+the body last changed); If-None-Match / If-Modified-Since get a 304.
+"""
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from config import settings
+from services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+CACHE_RESULTS = metrics.counter(
+    "boatmonitor_response_cache_requests_total", "Cacheable API requests by result", ("result",)
+)
+CACHE_BYTES = metrics.gauge("boatmonitor_response_cache_bytes", "Bytes of cached response bodies")
+
+
+@dataclass
+class _Entry:
+    body: bytes
+    etag: str
+    last_modified: datetime
+    stored_at: float
+    generation: Optional[int]  # Ingest tick the body was computed at; None = closed range
+
+
+def _utc(timestamp: Optional[datetime]) -> Optional[datetime]:
+    """Naive UTC, like the stored timestamps"""
+    if timestamp is None or timestamp.tzinfo is None:
+        return timestamp
+    return timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+class ResponseCache:
+    """LRU of JSON response bodies, invalidated by ingest ticks"""
+
+    def __init__(self, max_entries: int, max_bytes: int, max_age: float, tick_interval: float, ingest_lag: float):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.tick_interval = tick_interval
+        self.ingest_lag = timedelta(seconds=ingest_lag)
+        self.generation = 0
+        self.bytes = 0
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        CACHE_BYTES.set_function(lambda: self.bytes)
+
+    def ingested(self):
+        """New readings were logged: responses for ranges touching now are stale"""
+        self.generation += 1
+
+    def clear(self):
+        """Older history changed (thresholds, retention): drop everything"""
+        self._entries.clear()
+        self.bytes = 0
+
+    def closed(self, end: Optional[datetime]) -> bool:
+        """Whether no future write can land in a range ending at `end`"""
+        end = _utc(end)
+        return end is not None and end < datetime.utcnow() - self.ingest_lag
+
+    def _get(self, key: Hashable) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        age = time.monotonic() - entry.stored_at
+        if entry.generation is not None and (entry.generation != self.generation or age >= self.tick_interval):
+            return None
+        if age >= self.max_age:
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _put(self, key: Hashable, entry: _Entry):
+        self._discard(key)
+        if len(entry.body) > self.max_bytes:
+            return
+        self._entries[key] = entry
+        self.bytes += len(entry.body)
+        while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.bytes -= len(evicted.body)
+
+    def _discard(self, key: Hashable):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= len(entry.body)
+
+    async def respond(
+        self,
+        request: Request,
+        key: Hashable,
+        end: Optional[datetime],
+        compute: Callable[[], Awaitable[Any]]
+    ) -> Response:
+        """The cached response for `key` (a range ending at `end`), computing it on a miss"""
+        entry = self._get(key)
+        if entry is None:
+            CACHE_RESULTS.labels("miss").inc()
+            generation = None if self.closed(end) else self.generation
+            started = time.monotonic()
+            body = JSONResponse(jsonable_encoder(await compute())).body
+            etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+            previous = self._entries.get(key)
+            # Unchanged bodies keep their Last-Modified, so If-Modified-Since still matches
+            last_modified = (
+                previous.last_modified if previous and previous.etag == etag
+                else datetime.now(timezone.utc).replace(microsecond=0)
+            )
+            entry = _Entry(body, etag, last_modified, started, generation)
+            self._put(key, entry)
+        else:
+            CACHE_RESULTS.labels("hit").inc()
+
+        headers = {
+            "ETag": entry.etag,
+            "Last-Modified": format_datetime(entry.last_modified, usegmt=True),
+            "Cache-Control": "no-cache",  # Clients may keep it, but revalidate every time
+        }
+        if _not_modified(request, entry):
+            CACHE_RESULTS.labels("not_modified").inc()
+            return Response(status_code=304, headers=headers)
+        return Response(entry.body, media_type="application/json", headers=headers)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "generation": self.generation,
+        }
+
+
+def _not_modified(request: Request, entry: _Entry) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return entry.etag in tags or "*" in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return entry.last_modified <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def create_response_cache() -> Optional[ResponseCache]:
+    """Create the response cache from settings, if it is on"""
+    if settings.RESPONSE_CACHE_ENTRIES <= 0:
+        return None
+    # Samples reach the database up to one logging interval (plus the staging merge interval) after their timestamp
+    lag = 2 * settings.HISTORY_SAVE_INTERVAL + (settings.DB_STAGING_MERGE_INTERVAL if settings.DB_STAGING else 0)
+    return ResponseCache(
+        settings.RESPONSE_CACHE_ENTRIES,
+        int(settings.RESPONSE_CACHE_MB * 1024 * 1024),
+        settings.RESPONSE_CACHE_MAX_AGE,
+        settings.HISTORY_SAVE_INTERVAL,
+        lag
+    )
+
+
+# Shared by the history and engine endpoints (None when off)
+response_cache = create_response_cache()
+
+
+async def cached_response(
+    request: Request,
+    key: Hashable,
+    end: Optional[datetime],
+    compute: Callable[[], Awaitable[Any]]
+) -> Any:
+    """`compute()`'s result through the response cache (straight through when it is off)"""
+    if response_cache is None:
+        return await compute()
+    return await response_cache.respond(request, key, end, compute)
@@ -0,0 +1,251 @@
+"""
+Shared live store - the live value store mirrored into a memory-mapped block
+
+In multi-process mode (ACQUISITION_PROCESS=true) the acquisition process owns
+a SharedLiveStore: a normal LiveStore that also writes every slot into a
+fixed-layout mmap file (in /dev/shm on the Pi). Web processes open a
+SharedStoreReader on the same file and get the full LiveStore read API
+(snapshots, deltas, records) without any IPC round trip.
+
+Consistency uses a seqlock: the single writer makes the sequence counter odd,
+writes, then makes it even again. A reader that sees an odd counter, or a
+counter that changed while it copied the block, retries. Readers only copy
+and decode the block when the store version in the header has changed, so
+repeated reads of an unchanged store cost one 8-byte header read.
+
+Layout: a 64-byte header, then `capacity` fixed 160-byte slots.
+"""
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import time
+from typing import Optional
+
+from hardware.readings import QUALITY_GOOD
+from services.live_store import LiveStore
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"BMLIVE01"
+
+# magic, sequence, version, slot count, capacity, heartbeat, writer pid
+HEADER = struct.Struct("<8sQQIIdI")
+HEADER_SIZE = 64
+SEQUENCE_OFFSET = 8
+VERSION_OFFSET = 16
+HEARTBEAT_OFFSET = 32
+
+# value, sample time, slot version, quality, group, key, board id, text value
+SLOT = struct.Struct("<ddQ16s16s56s24s24s")
+SLOT_SIZE = 160
+
+MAX_READ_RETRIES = 1000
+
+
+def default_path() -> str:
+    """Shared block location: RAM-backed /dev/shm when available"""
+    directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(directory, "boatmonitor-live")
+
+
+def open_block(path: str, capacity: int) -> mmap.mmap:
+    """Open (creating or resizing) the shared block file and map it"""
+    size = HEADER_SIZE + capacity * SLOT_SIZE
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        if os.fstat(fd).st_size != size:
+            os.ftruncate(fd, size)
+        return mmap.mmap(fd, size)
+    finally:
+        os.close(fd)
+
+
+def _encode(text: Optional[str], size: int) -> bytes:
+    data = (text or "").encode()
+    if len(data) > size:
+        logger.warning(f"Shared store field truncated to {size} bytes: {text!r}")
+        data = data[:size]
+    return data
+
+
+def _decode(data: bytes) -> str:
+    return data.rstrip(b"\0").decode(errors="replace")
+
+
+class SharedLiveStore(LiveStore):
+    """LiveStore that mirrors every write into the shared block (single writer)"""
+
+    def __init__(self, path: Optional[str] = None, capacity: int = 1024):
+        super().__init__()
+        self.path = path or default_path()
+        self.capacity = capacity
+        self._block = open_block(self.path, capacity)
+
+        # Carry on from the previous writer's version, so readers' deltas stay valid
+        magic, _, version, _, old_capacity, _, _ = HEADER.unpack_from(self._block, 0)
+        if magic == MAGIC and old_capacity == capacity:
+            self.version = version
+        self._sequence = 0
+        self._write_header()
+
+    def _write_header(self):
+        HEADER.pack_into(
+            self._block, 0, MAGIC, self._sequence, self.version,
+            min(len(self._keys), self.capacity), self.capacity, time.time(), os.getpid()
+        )
+
+    def _write_slot(self, index: int):
+        """Write one slot and the header inside a seqlock section"""
+        if index >= self.capacity:
+            return
+        text = self._text.get(index)
+        self._sequence += 1  # Odd: write in progress
+        self._write_header()
+        SLOT.pack_into(
+            self._block, HEADER_SIZE + index * SLOT_SIZE,
+            self._values[index],
+            self._sample_times[index],
+            self._slot_versions[index],
+            _encode(self._quality[index], 16),
+            _encode(self._slot_groups[index], 16),
+            _encode(self._keys[index], 56),
+            _encode(self._board_ids[index], 24),
+            _encode(text, 24),
+        )
+        self._sequence += 1  # Even: consistent again
+        struct.pack_into("<Q", self._block, SEQUENCE_OFFSET, self._sequence)
+
+    def register(self, key: str, group: str) -> int:
+        known = key in self._index
+        index = super().register(key, group)
+        if not known:
+            if index >= self.capacity:
+                logger.error(f"Shared store full ({self.capacity} slots), {key} is not shared")
+            self._write_slot(index)
+        return index
+
+    def set(self, key: str, value, group: str, sample_time=None, board_id=None, quality: str = QUALITY_GOOD):
+        super().set(key, value, group, sample_time=sample_time, board_id=board_id, quality=quality)
+        self._write_slot(self._index[key])
+
+    def set_quality(self, key: str, quality: str):
+        version = self.version
+        super().set_quality(key, quality)
+        if self.version != version:
+            self._write_slot(self._index[key])
+
+    def heartbeat(self):
+        """Tell readers the writer is alive"""
+        struct.pack_into("<d", self._block, HEARTBEAT_OFFSET, time.time())
+
+    def close(self):
+        self._block.close()
+
+
+class SharedStoreReader(LiveStore):
+    """Read-only LiveStore view of a shared block written by another process"""
+
+    def __init__(self, path: Optional[str] = None, capacity: int = 1024):
+        self._version = 0
+        super().__init__()
+        self.path = path or default_path()
+        # Mapping read-write only so the reader works before the writer has started
+        self._block = open_block(self.path, capacity)
+        self._loaded_version = -1
+
+    @property
+    def version(self) -> int:
+        self._refresh()
+        return self._version
+
+    @version.setter
+    def version(self, value: int):
+        self._version = value
+
+    def _read_block(self) -> bytes:
+        """Copy header and used slots under the seqlock"""
+        block = self._block
+        for attempt in range(MAX_READ_RETRIES):
+            sequence = struct.unpack_from("<Q", block, SEQUENCE_OFFSET)[0]
+            if sequence % 2 == 0:
+                count = struct.unpack_from("<I", block, 24)[0]
+                data = block[:HEADER_SIZE + count * SLOT_SIZE]
+                if struct.unpack_from("<Q", block, SEQUENCE_OFFSET)[0] == sequence:
+                    return data
+            if attempt > 10:
+                time.sleep(0.0001)
+        raise RuntimeError("Shared store writer did not finish a write")
+
+    def _refresh(self):
+        """Reload the slots if the writer has published a new version"""
+        if struct.unpack_from("<Q", self._block, VERSION_OFFSET)[0] == self._loaded_version:
+            return
+
+        data = self._read_block()
+        magic, _, version, count, _, _, _ = HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            return  # Writer has not initialised the block yet
+
+        snapshots = self._snapshots
+        LiveStore.__init__(self)
+        for index in range(count):
+            value, sample_time, slot_version, quality, group, key, board_id, text = SLOT.unpack_from(
+                data, HEADER_SIZE + index * SLOT_SIZE
+            )
+            key = _decode(key)
+            group = _decode(group)
+            super().register(key, group)
+            self._values[index] = value
+            self._sample_times[index] = sample_time
+            self._slot_versions[index] = slot_version
+            self._quality[index] = _decode(quality)
+            self._board_ids[index] = _decode(board_id) or None
+            if text.rstrip(b"\0"):
+                self._text[index] = _decode(text)
+            if slot_version > self._group_versions[group]:
+                self._group_versions[group] = slot_version
+
+        # Snapshots of groups that did not change stay valid (they are keyed by group version)
+        self._snapshots = snapshots
+        self._version = version
+        self._loaded_version = version
+
+    def register(self, key: str, group: str) -> int:
+        """Keys are registered by the writer; return the slot if it exists"""
+        self._refresh()
+        return self._index.get(key, -1)
+
+    def set(self, *args, **kwargs):
+        raise TypeError("Shared store readers are read-only")
+
+    set_quality = set
+
+    def get(self, key: str):
+        self._refresh()
+        return super().get(key)
+
+    def get_record(self, key: str):
+        self._refresh()
+        return super().get_record(key)
+
+    def snapshot(self, group: str):
+        self._refresh()
+        return super().snapshot(group)
+
+    def changed_since(self, version: int, group: str):
+        self._refresh()
+        return super().changed_since(version, group)
+
+    def keys(self, group: str):
+        self._refresh()
+        return super().keys(group)
+
+    def heartbeat_age(self) -> Optional[float]:
+        """Seconds since the writer last reported in (None before it started)"""
+        heartbeat = struct.unpack_from("<d", self._block, HEARTBEAT_OFFSET)[0]
+        return time.time() - heartbeat if heartbeat else None
+
+    def close(self):
+        self._block.close()
@@ -0,0 +1,287 @@
+"""
+Write staging - keep logged samples in RAM and an append-only journal
+
+Committing every logged sample to SQLite rewrites whole database and WAL
+pages (plus checkpoints) each time, which wears out SD cards. With
+DB_STAGING on, the data logger hands samples to a WriteStage instead:
+
+- each sample is appended to a small journal file as one checksummed,
+  compressed record (a single append + fdatasync per sample)
+- every DB_STAGING_MERGE_INTERVAL seconds, or after DB_STAGING_MAX_SAMPLES,
+  the staged samples are merged into SQLite in one transaction; the journal
+  is emptied once that transaction is on disk (with synchronous=NORMAL a
+  WAL commit isn't, so the touched files are checkpointed first)
+- on start, records still in the journal (power loss) are replayed; a torn
+  record at the end is dropped
+
+Each database file the merge writes to (the main database, and with
+DB_PARTITIONING each month's partition) gets the highest record number it
+now holds in its `staging_marks` table, in the same transaction as the rows:
+WAL commits aren't atomic across attached files, so one mark in the main
+database could survive a crash its partition's rows didn't. A crash between
+the merge and emptying the journal therefore doesn't insert samples twice
+(or lose them). History reads lag by up to the merge interval.
+
+Record layout: <u32 payload length><u32 crc32 of payload><zlib(JSON)>
+"""
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import struct
+import time
+import zlib
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import settings
+from database.database import ReadSessionLocal, checkpoint
+from database.models import StagingMark
+from database.partitions import partition_path, partition_table
+from services.db_writer import db_writer
+from services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+HEADER = struct.Struct("<II")
+
+JOURNAL_BYTES = metrics.counter(
+    "boatmonitor_staging_journal_bytes_total", "Bytes appended to the staging journal"
+)
+STAGED_SAMPLES = metrics.gauge("boatmonitor_staging_samples", "Samples waiting to be merged into the database")
+MERGE_SECONDS = metrics.histogram(
+    "boatmonitor_staging_merge_seconds", "Duration of one staging merge into the database",
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+
+Sample = Dict[str, Any]
+InsertSamples = Callable[[AsyncSession, List[Sample]], Awaitable[None]]
+PrepareSamples = Callable[[List[Sample]], Awaitable[None]]
+PartitionOf = Callable[[Sample], Optional[str]]  # Partition a sample's rows go to (None = main database)
+
+
+def encode_record(sample: Sample) -> bytes:
+    payload = zlib.compress(json.dumps(sample, separators=(",", ":")).encode())
+    return HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def read_journal(path: str) -> Tuple[List[Sample], int]:
+    """Records of a journal file and the offset after the last intact one"""
+    samples: List[Sample] = []
+    if not os.path.exists(path):
+        return samples, 0
+    with open(path, "rb") as f:
+        data = f.read()
+    offset = 0
+    while offset + HEADER.size <= len(data):
+        length, crc = HEADER.unpack_from(data, offset)
+        payload = data[offset + HEADER.size:offset + HEADER.size + length]
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            break
+        try:
+            samples.append(json.loads(zlib.decompress(payload)))
+        except (zlib.error, ValueError):
+            break
+        offset += HEADER.size + length
+    return samples, offset
+
+
+def read_partition_mark(name: str) -> int:
+    """Staging mark of a partition file (0 if it has none)"""
+    path = partition_path(name)
+    if not os.path.exists(path):
+        return 0
+    db = sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=settings.DB_BUSY_TIMEOUT)
+    try:
+        row = db.execute("SELECT seq FROM staging_marks WHERE id = 1").fetchone()
+        return row[0] if row else 0
+    except sqlite3.OperationalError:
+        return 0  # File from before staging marks
+    finally:
+        db.close()
+
+
+def commits_durable() -> bool:
+    """Whether a commit is on disk when it returns (not so for WAL with synchronous below FULL)"""
+    return settings.DB_JOURNAL_MODE.upper() != "WAL" or settings.DB_SYNCHRONOUS.upper() in ("FULL", "EXTRA", "2", "3")
+
+
+class WriteStage:
+    """Stages samples in RAM and a journal, merges them into the database in batches"""
+
+    def __init__(
+        self,
+        insert: InsertSamples,
+        path: str,
+        prepare: Optional[PrepareSamples] = None,
+        partition_of: Optional[PartitionOf] = None,
+        merge_interval: float = 900.0,
+        max_samples: int = 1000,
+        fsync: bool = True
+    ):
+        self.insert = insert
+        self.prepare = prepare
+        self.partition_of = partition_of or (lambda sample: None)
+        self.path = path
+        self.merge_interval = merge_interval
+        self.max_samples = max_samples
+        self.fsync = fsync
+        self.merges = 0
+        self._pending: List[Sample] = []
+        self._seq = 0
+        self._file = None
+        self._last_merge = time.monotonic()
+        self._file_lock = asyncio.Lock()
+        self._merge_lock = asyncio.Lock()
+        STAGED_SAMPLES.set_function(lambda: len(self._pending))
+
+    async def recover(self):
+        """Replay what the journal still holds (after a crash or power loss) into the database"""
+        samples, valid = await asyncio.to_thread(read_journal, self.path)
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        if valid < size:
+            logger.warning(f"Dropping {size - valid} bytes of torn records at the end of {self.path}")
+
+        # The main database's mark is the highest record number merged anywhere
+        async with ReadSessionLocal() as session:
+            result = await session.execute(select(StagingMark.seq).where(StagingMark.id == 1))
+            merged = result.scalar_one_or_none() or 0
+        marks: Dict[Optional[str], int] = {None: merged}
+        for name in {self.partition_of(sample) for sample in samples} - {None}:
+            marks[name] = await asyncio.to_thread(read_partition_mark, name)
+
+        self._pending = [sample for sample in samples if sample["n"] > marks[self.partition_of(sample)]]
+        self._seq = max([merged] + [sample["n"] for sample in samples])
+        await self._rewrite_journal(self._pending)
+        if self._pending:
+            logger.info(f"Replaying {len(self._pending)} staged samples from {self.path}")
+            await self.merge()
+
+    async def append(self, sample: Sample):
+        """Stage one sample; returns once its journal record is on disk"""
+        async with self._file_lock:
+            self._seq += 1
+            sample = {**sample, "n": self._seq}
+            record = encode_record(sample)
+            await asyncio.to_thread(self._append, record)
+            self._pending.append(sample)
+            JOURNAL_BYTES.inc(len(record))
+
+    def _append(self, record: bytes):
+        if self._file is None:
+            self._file = open(self.path, "ab", buffering=0)
+        self._file.write(record)
+        if self.fsync:
+            os.fdatasync(self._file.fileno())
+
+    def due(self) -> bool:
+        return bool(self._pending) and (
+            len(self._pending) >= self.max_samples
+            or time.monotonic() - self._last_merge >= self.merge_interval
+        )
+
+    async def merge(self) -> int:
+        """Write the staged samples to the database in one transaction, then empty the journal"""
+        async with self._merge_lock:
+            batch = list(self._pending)
+            self._last_merge = time.monotonic()
+            if not batch:
+                return 0
+            # Mark of each file written to; the main database's also numbers the records after a restart
+            marks: Dict[Optional[str], int] = {None: batch[-1]["n"]}
+            for sample in batch:
+                marks[self.partition_of(sample)] = sample["n"]
+
+            async def merge_staged(session: AsyncSession):
+                await self.insert(session, batch)
+                for partition, seq in marks.items():
+                    table = partition_table(StagingMark.__table__, partition)
+                    await session.execute(delete(table))
+                    await session.execute(insert(table), [{"id": 1, "seq": seq}])
+
+            started = time.perf_counter()
+            if self.prepare:
+                await self.prepare(batch)
+            await db_writer.write(merge_staged)
+            durable = await self._sync(marks)
+            MERGE_SECONDS.observe(time.perf_counter() - started)
+
+            # Samples appended while the merge ran stay staged (and in the journal)
+            async with self._file_lock:
+                self._pending = self._pending[len(batch):]
+                if durable:
+                    await self._rewrite_journal(self._pending)
+                else:
+                    logger.warning("Merged samples are not on disk yet; keeping them in the journal until the next merge")
+            self.merges += 1
+            logger.debug(f"Merged {len(batch)} staged samples")
+            return len(batch)
+
+    async def _sync(self, marks: Dict[Optional[str], int]) -> bool:
+        """Get the merge onto disk by checkpointing the files it wrote; False if a checkpoint was incomplete"""
+        if commits_durable():
+            return True
+        durable = True
+        for partition in marks:
+            try:
+                result = await checkpoint("FULL", partition_path(partition) if partition else None)
+            except sqlite3.Error as e:
+                logger.warning(f"Checkpoint after the staging merge failed: {e}")
+                return False
+            durable = durable and not (result and result["busy"])
+        return durable
+
+    async def _rewrite_journal(self, samples: List[Sample]):
+        def rewrite():
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if not samples:
+                if os.path.exists(self.path):
+                    os.truncate(self.path, 0)
+                return
+            temporary = f"{self.path}.tmp"
+            with open(temporary, "wb") as f:
+                f.write(b"".join(encode_record(sample) for sample in samples))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporary, self.path)
+
+        await asyncio.to_thread(rewrite)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "staged": len(self._pending),
+            "merges": self.merges,
+            "journal_bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+        }
+
+
+def create_write_stage(
+    insert: InsertSamples,
+    prepare: Optional[PrepareSamples] = None,
+    partition_of: Optional[PartitionOf] = None
+) -> Optional[WriteStage]:
+    """Create the write stage from settings, if staging is on"""
+    if not settings.DB_STAGING:
+        return None
+    directory = os.path.dirname(settings.DB_STAGING_JOURNAL)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    return WriteStage(
+        insert,
+        settings.DB_STAGING_JOURNAL,
+        prepare=prepare,
+        partition_of=partition_of,
+        merge_interval=settings.DB_STAGING_MERGE_INTERVAL,
+        max_samples=settings.DB_STAGING_MAX_SAMPLES,
+        fsync=settings.DB_STAGING_FSYNC
+    )
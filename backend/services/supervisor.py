@@ -0,0 +1,202 @@
+"""
+Task supervisor - keeps the background loops running and shuts them down cleanly
+
+Every long-running loop (sensor polling, Victron, data logger, replay, loop
+monitor) is started through the supervisor, which keeps the task handle,
+restarts a loop that crashed (with exponential backoff) and, at shutdown,
+waits for the loops to finish their last iteration within a deadline before
+cancelling whatever is left.
+
+Under systemd (Type=notify) it also reports READY/STOPPING and feeds the
+service watchdog from the event loop, so a hung loop gets the process
+restarted.
+"""
+import asyncio
+import logging
+import os
+import socket
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from config import settings
+from services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+TASK_RESTARTS = metrics.counter(
+    "boatmonitor_task_restarts_total", "Background task restarts after a crash", ("task",)
+)
+TASK_RUNNING = metrics.gauge(
+    "boatmonitor_task_running", "Whether a supervised background task is running", ("task",)
+)
+
+# A task that ran this long before crashing starts over with the initial backoff
+HEALTHY_RUN_SECONDS = 60.0
+
+
+def sd_notify(message: str) -> bool:
+    """Send a state message to systemd (no-op when not started by systemd)"""
+    address = os.environ.get("NOTIFY_SOCKET")
+    if not address:
+        return False
+    if address.startswith("@"):
+        address = "\0" + address[1:]  # Abstract namespace socket
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+            sock.connect(address)
+            sock.sendall(message.encode())
+        return True
+    except OSError as e:
+        logger.warning(f"sd_notify failed: {e}")
+        return False
+
+
+def watchdog_interval() -> Optional[float]:
+    """How often to ping the systemd watchdog (half its timeout), if enabled"""
+    # WATCHDOG_PID is not checked: with uvicorn reload the app runs in a child
+    # process, which systemd accepts with NotifyAccess=all
+    usec = os.environ.get("WATCHDOG_USEC")
+    if not usec:
+        return None
+    try:
+        return int(usec) / 1e6 / 2
+    except ValueError:
+        return None
+
+
+class SupervisedTask:
+    """One supervised loop and its restart history"""
+
+    def __init__(self, name: str, factory: Callable[[], Awaitable[Any]], restart: bool):
+        self.name = name
+        self.factory = factory
+        self.restart = restart
+        self.task: Optional[asyncio.Task] = None
+        self.state = "starting"
+        self.restarts = 0
+        self.last_error: Optional[str] = None
+        self.started_at: Optional[float] = None
+
+    def status(self) -> Dict[str, Any]:
+        running = self.state == "running" and self.started_at is not None
+        return {
+            "state": self.state,
+            "restarts": self.restarts,
+            "last_error": self.last_error,
+            "uptime": round(time.monotonic() - self.started_at, 1) if running else None,
+        }
+
+
+class TaskSupervisor:
+    """Starts, restarts and stops the background tasks"""
+
+    def __init__(
+        self,
+        backoff: float = 1.0,
+        max_backoff: float = 60.0,
+        shutdown_timeout: float = 10.0
+    ):
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.shutdown_timeout = shutdown_timeout
+        self.tasks: Dict[str, SupervisedTask] = {}
+        self.stopping = False
+        self._watchdog_task: Optional[asyncio.Task] = None
+
+    def supervise(self, name: str, factory: Callable[[], Awaitable[Any]], restart: bool = True):
+        """Run `factory()` as a task named `name`, restarting it if it raises"""
+        if name in self.tasks:
+            raise ValueError(f"Task {name} already supervised")
+        supervised = SupervisedTask(name, factory, restart)
+        supervised.task = asyncio.create_task(self._run(supervised), name=name)
+        self.tasks[name] = supervised
+
+    async def _run(self, supervised: SupervisedTask):
+        """Run one task, restarting it with backoff until it returns or we shut down"""
+        running = TASK_RUNNING.labels(supervised.name)
+        delay = self.backoff
+        while True:
+            supervised.state = "running"
+            supervised.started_at = time.monotonic()
+            running.set(1)
+            try:
+                await supervised.factory()
+                supervised.state = "finished"
+                return
+            except asyncio.CancelledError:
+                supervised.state = "cancelled"
+                raise
+            except Exception as e:
+                supervised.last_error = f"{type(e).__name__}: {e}"
+                if self.stopping or not supervised.restart:
+                    supervised.state = "failed"
+                    logger.error(f"Task {supervised.name} failed: {e}", exc_info=True)
+                    return
+                if time.monotonic() - supervised.started_at >= HEALTHY_RUN_SECONDS:
+                    delay = self.backoff
+                supervised.state = "restarting"
+                logger.error(f"Task {supervised.name} crashed, restarting in {delay:.1f}s: {e}", exc_info=True)
+            finally:
+                running.set(0)
+
+            await asyncio.sleep(delay)
+            if self.stopping:
+                supervised.state = "stopped"
+                return
+            delay = min(delay * 2, self.max_backoff)
+            supervised.restarts += 1
+            TASK_RESTARTS.labels(supervised.name).inc()
+
+    def ready(self):
+        """Tell systemd startup is complete and start feeding its watchdog"""
+        sd_notify(f"READY=1\nSTATUS=Running {len(self.tasks)} tasks")
+        interval = watchdog_interval()
+        if interval:
+            self._watchdog_task = asyncio.create_task(self._feed_watchdog(interval), name="systemd-watchdog")
+            logger.info(f"Feeding systemd watchdog every {interval:.1f}s")
+
+    async def _feed_watchdog(self, interval: float):
+        """Ping the watchdog while the loop is responsive (a blocked loop stops the pings)"""
+        while not self.stopping:
+            failing = [name for name, t in self.tasks.items() if t.state == "restarting"]
+            status = f"Restarting: {', '.join(failing)}" if failing else f"Running {len(self.tasks)} tasks"
+            sd_notify(f"WATCHDOG=1\nSTATUS={status}")
+            await asyncio.sleep(interval)
+
+    def stop(self):
+        """Stop restarting tasks (call before telling the components to stop)"""
+        self.stopping = True
+        sd_notify("STOPPING=1")
+        if self._watchdog_task:
+            self._watchdog_task.cancel()
+
+    async def join(self, timeout: Optional[float] = None):
+        """Wait for the stopped tasks to finish their last iteration, then cancel the rest"""
+        self.stopping = True
+        timeout = self.shutdown_timeout if timeout is None else timeout
+        pending = [t.task for t in self.tasks.values() if t.task and not t.task.done()]
+        if not pending:
+            return
+        _, pending = await asyncio.wait(pending, timeout=timeout)
+        for task in pending:
+            logger.warning(f"Task {task.get_name()} did not stop within {timeout}s, cancelling")
+            task.cancel()
+        if pending:
+            await asyncio.wait(pending, timeout=1.0)
+
+    def status(self) -> Dict[str, Any]:
+        """State of every supervised task"""
+        return {name: t.status() for name, t in self.tasks.items()}
+
+    def healthy(self) -> bool:
+        """No task is crashed (waiting for a restart or given up)"""
+        return all(t.state not in ("restarting", "failed") for t in self.tasks.values())
+
+
+def create_supervisor() -> TaskSupervisor:
+    """Create the task supervisor from settings"""
+    return TaskSupervisor(
+        backoff=settings.TASK_RESTART_BACKOFF,
+        max_backoff=settings.TASK_RESTART_BACKOFF_MAX,
+        shutdown_timeout=settings.SHUTDOWN_TIMEOUT
+    )
@@ -3,9 +3,14 @@ Victron Device Manager - Handles BLE and VE.Direct communication
 """
 import asyncio
 import logging
-from typing import Dict, Any, Optional, List
+import time
+from typing import Dict, Any, Optional, List, Tuple
 from datetime import datetime
 from config import settings
+from hardware.readings import QUALITY_GOOD, QUALITY_REPLAY
+from hardware.simulator import get_simulator, simulation_interval
+from services.live_store import LiveStore, ReadOnlyDict
+from services.metrics import LOOP_SECONDS
 
 logger = logging.getLogger(__name__)
 
@@ -13,11 +18,20 @@ logger = logging.getLogger(__name__)
 class VictronManager:
     """Manages Victron device connections and data"""
 
-    def __init__(self):
+    STORE_GROUP = "victron"
+
+    def __init__(self, store: Optional[LiveStore] = None, replay_mode: bool = False):
         self.running = False
         self.devices: Dict[str, Any] = {}
-        self.current_data: Dict[str, Dict[str, Any]] = {}
+        self.store = store or LiveStore()
         self.simulation_mode = settings.SIMULATION_MODE
+        self.replay_mode = replay_mode  # A history replay was created and feeds the data
+        self.poll_interval = settings.VICTRON_POLL_INTERVAL
+        if self.simulation_mode:
+            self.poll_interval = simulation_interval(settings.VICTRON_POLL_INTERVAL)
+        self._nested_version = -1
+        self._loop_seconds = LOOP_SECONDS.labels("victron")
+        self._nested: Dict[str, Dict[str, Any]] = {}
 
     async def start(self):
         """Start Victron device polling"""
@@ -38,58 +52,36 @@ class VictronManager:
         """Main polling loop for Victron devices"""
         while self.running:
             try:
+                started = time.perf_counter()
                 await self._read_all_devices()
-                await asyncio.sleep(settings.VICTRON_POLL_INTERVAL)
+                self._loop_seconds.since(started)
+                await asyncio.sleep(self.poll_interval)
             except Exception as e:
                 logger.error(f"Error in Victron poll loop: {e}", exc_info=True)
                 await asyncio.sleep(1)
 
     async def _read_all_devices(self):
         """Read all connected Victron devices"""
+        if self.replay_mode:
+            return  # Data is pushed in by the history replay
         if self.simulation_mode:
             await self._simulate_devices()
         else:
             await self._read_hardware_devices()
 
     async def _simulate_devices(self):
-        """Simulate Victron device data for development"""
-        import random
-
-        # SmartShunt - Leisure Battery
-        self.current_data["smartshunt_leisure"] = {
-            "voltage": random.uniform(12.0, 14.4),
-            "current": random.uniform(-5, 30),
-            "soc": random.uniform(60, 100),  # State of charge %
-            "power": random.uniform(-60, 420),
-            "consumed_ah": random.uniform(0, 40),
-        }
-
-        # SmartShunt - Starter Battery
-        self.current_data["smartshunt_starter"] = {
-            "voltage": random.uniform(12.5, 14.2),
-            "current": random.uniform(-2, 10),
-            "soc": random.uniform(80, 100),
-            "power": random.uniform(-24, 140),
-            "consumed_ah": random.uniform(0, 10),
-        }
-
-        # SmartSolar MPPT
-        self.current_data["mppt_solar"] = {
-            "battery_voltage": random.uniform(12.0, 14.4),
-            "battery_current": random.uniform(0, 20),
-            "solar_voltage": random.uniform(0, 22),
-            "solar_power": random.uniform(0, 300),
-            "yield_today": random.uniform(0, 2.5),  # kWh
-            "state": random.choice(["Off", "Bulk", "Absorption", "Float"]),
-        }
-
-        # Multiplus II / Phoenix Inverter
-        self.current_data["inverter"] = {
-            "state": random.choice(["Off", "On", "Inverting", "Charging"]),
-            "ac_voltage": random.uniform(220, 240),
-            "ac_current": random.uniform(0, 5),
-            "ac_power": random.uniform(0, 1200),
-        }
+        """Read Victron device data from the shared boat simulator"""
+        for device_id, data in get_simulator().victron_data().items():
+            self._update_device(device_id, data)
+
+    def _update_device(self, device_id: str, data: Dict[str, Any], quality: str = QUALITY_GOOD):
+        """Write a device's fields into the live store as "device.field" keys"""
+        for field, value in data.items():
+            self.store.set(f"{device_id}.{field}", value, self.STORE_GROUP, quality=quality)
+
+    def ingest_replay(self, device_id: str, data: Dict[str, Any]):
+        """Accept recorded device data from history replay"""
+        self._update_device(device_id, data, quality=QUALITY_REPLAY)
 
     async def _read_hardware_devices(self):
         """Read actual Victron hardware"""
@@ -108,8 +100,20 @@ class VictronManager:
 
     def get_device_data(self, device_id: str) -> Optional[Dict[str, Any]]:
         """Get current data for a device"""
-        return self.current_data.get(device_id)
+        return self.get_all_data().get(device_id)
 
     def get_all_data(self) -> Dict[str, Dict[str, Any]]:
-        """Get all current device data"""
-        return self.current_data.copy()
+        """Get all current device data (rebuilt at most once per store version)"""
+        snapshot = self.store.snapshot(self.STORE_GROUP)
+        if snapshot.version != self._nested_version:
+            nested: Dict[str, Dict[str, Any]] = {}
+            for key, value in snapshot.values.items():
+                device_id, field = key.split(".", 1)
+                nested.setdefault(device_id, {})[field] = value
+            self._nested = ReadOnlyDict({k: ReadOnlyDict(v) for k, v in nested.items()})
+            self._nested_version = snapshot.version
+        return self._nested
+
+    def get_changed_fields(self, since_version: int) -> Tuple[int, Dict[str, Any]]:
+        """Get the current store version and the flattened fields changed after `since_version`"""
+        return self.store.changed_since(since_version, self.STORE_GROUP)
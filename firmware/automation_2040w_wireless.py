@@ -6,7 +6,9 @@ Setup:
 1. Flash MicroPython to the Automation 2040W
 2. Copy this file as main.py to the board
 3. Edit WIFI_SSID and WIFI_PASSWORD below
-4. Board will connect to WiFi and start HTTP server
+4. Optionally copy backend/config/sensors.json to the board as sensors.json
+   (entries whose "board" matches BOARD_ID replace SENSOR_CHANNELS below)
+5. Board will connect to WiFi and start HTTP server
 """
 
 import network
@@ -25,13 +27,37 @@ WIFI_SSID = "BoatMonitor"  # Your Pi's WiFi AP name
 WIFI_PASSWORD = "boatpass123"  # Your Pi's WiFi password
 HTTP_PORT = 80
 
-# Sensor channel mapping (customize per board)
+# Sensor channel mapping (fallback when no sensors.json is on the board)
 SENSOR_CHANNELS = {
     "engine_rpm": {"type": "frequency", "channel": 1},
     "oil_pressure": {"type": "analog", "channel": 1},
     "coolant_temp": {"type": "analog", "channel": 2},
     "fuel_tank": {"type": "analog", "channel": 3},
 }
+SENSOR_CONFIG_FILE = "sensors.json"
+
+
+def load_sensor_channels():
+    """Load this board's sensors from the shared sensor registry file"""
+    try:
+        with open(SENSOR_CONFIG_FILE) as f:
+            sensors = json.load(f).get("sensors", {})
+        channels = {}
+        for name, config in sensors.items():
+            if config.get("board") == BOARD_ID:
+                channels[name] = {"type": config.get("type", "analog"), "channel": config["channel"]}
+    except OSError:
+        return SENSOR_CHANNELS
+    except (ValueError, KeyError, AttributeError) as e:
+        # A truncated or malformed file must not keep the board from starting
+        print(f"Invalid {SENSOR_CONFIG_FILE} ({e}), using the built-in channels")
+        return SENSOR_CHANNELS
+
+    print(f"Loaded {len(channels)} sensors from {SENSOR_CONFIG_FILE}")
+    return channels
+
+
+SENSOR_CHANNELS = load_sensor_channels()
 
 # Relay mapping (customize per board)
 RELAY_CHANNELS = {
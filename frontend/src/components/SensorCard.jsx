@@ -2,7 +2,7 @@ import { useState, useEffect } from 'react'
 import axios from 'axios'
 import { getStatusColor, getColorClasses, getWarningIcon } from '../utils/thresholds'
 
-const SensorCard = ({ id, title, value, unit, icon, color, type }) => {
+const SensorCard = ({ id, title, value, unit, icon, color, type, stale = false }) => {
   const [thresholds, setThresholds] = useState(null)
 
   useEffect(() => {
@@ -36,7 +36,10 @@ const SensorCard = ({ id, title, value, unit, icon, color, type }) => {
       className={`h-full bg-gradient-to-br ${getColorClasses(
         status,
         color
-      )} rounded-lg p-4 shadow-xl hover:scale-105 transition-transform cursor-move relative`}
+      )} rounded-lg p-4 shadow-xl hover:scale-105 transition-transform cursor-move relative ${
+        stale ? 'grayscale opacity-50' : ''
+      }`}
+      title={stale ? 'No recent data from this sensor' : undefined}
     >
       {/* Drag Handle */}
       <div className="drag-handle absolute top-2 right-2 text-white/50 hover:text-white cursor-grab active:cursor-grabbing">
@@ -10,7 +10,7 @@ import WeatherTimeCard from '../components/WeatherTimeCard'
 import { useSensorStore } from '../utils/store'
 
 const Dashboard = () => {
-  const { sensors, victronData } = useSensorStore()
+  const { sensors, sensorQuality, victronData } = useSensorStore()
   const containerRef = useRef(null)
   const [containerWidth, setContainerWidth] = useState(1200)
 
@@ -55,11 +55,18 @@ const Dashboard = () => {
     return () => window.removeEventListener('resize', updateWidth)
   }, [])
 
+  // Grey out gauges whose sensor has stopped reporting or failed its last read
+  const isStale = (sensorId) => {
+    const quality = sensorQuality[sensorId]?.quality
+    return quality === 'stale' || quality === 'error'
+  }
+
   const widgets = [
     {
       id: 'engine_rpm',
       title: 'Engine RPM',
       value: sensors.engine_rpm || 0,
+      stale: isStale('engine_rpm'),
       unit: 'RPM',
       icon: '🚤',
       color: 'water',
@@ -68,6 +75,7 @@ const Dashboard = () => {
       id: 'oil_pressure',
       title: 'Oil Pressure',
       value: sensors.oil_pressure || 0,
+      stale: isStale('oil_pressure'),
       unit: 'PSI',
       icon: '🛢️',
       color: 'sun',
@@ -76,6 +84,7 @@ const Dashboard = () => {
       id: 'coolant_temp',
       title: 'Coolant Temp',
       value: sensors.coolant_temp || 0,
+      stale: isStale('coolant_temp'),
       unit: '°C',
       icon: '🌡️',
       color: 'sun',
@@ -84,6 +93,7 @@ const Dashboard = () => {
       id: 'fuel-tank',
       title: 'Fuel Tank',
       value: sensors.fuel_tank || 0,
+      stale: isStale('fuel_tank'),
       unit: '%',
       icon: '⛽',
       color: 'sun',
@@ -93,6 +103,7 @@ const Dashboard = () => {
       id: 'water-tank',
       title: 'Water Tank',
       value: sensors.water_tank || 0,
+      stale: isStale('water_tank'),
       unit: '%',
       icon: '💧',
       color: 'water',
@@ -102,6 +113,7 @@ const Dashboard = () => {
       id: 'waste-tank',
       title: 'Waste Tank',
       value: sensors.waste_tank || 0,
+      stale: isStale('waste_tank'),
       unit: '%',
       icon: '🚽',
       color: 'nature',
@@ -2,10 +2,11 @@ import { create } from 'zustand'
 
 export const useSensorStore = create((set) => ({
   sensors: {},
+  sensorQuality: {},
   victronData: {},
 
-  updateSensors: (newSensors) => set({ sensors: newSensors }),
+  updateSensors: (newSensors, newQuality = {}) => set({ sensors: newSensors, sensorQuality: newQuality }),
   updateVictron: (newVictronData) => set({ victronData: newVictronData }),
 
-  reset: () => set({ sensors: {}, victronData: {} }),
+  reset: () => set({ sensors: {}, sensorQuality: {}, victronData: {} }),
 }))
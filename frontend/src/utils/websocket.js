@@ -31,7 +31,7 @@ export const useWebSocket = (url, options = {}) => {
             const message = JSON.parse(event.data)
 
             if (message.type === 'sensor_update') {
-              updateSensors(message.data)
+              updateSensors(message.data, message.quality)
             } else if (message.type === 'victron_update') {
               updateVictron(message.data)
             }